@@ -1,3 +1,4 @@
+from apscheduler.events import EVENT_JOB_MISSED
 from flask import Flask, render_template
 from flask.wrappers import Request, Response
 from importlib import import_module
@@ -18,10 +19,24 @@ from eNMS.main import (
 )
 from eNMS.admin.helpers import configure_instance_id
 from eNMS.admin.models import User
+from eNMS.automation.helpers import (
+    connection_pool,
+    run_events,
+    run_states,
+    scheduler_job_missed,
+)
+from eNMS.automation.models import migrate_job_logs
 from eNMS.base.default import create_default, create_examples
-from eNMS.base.helpers import fetch
+from eNMS.base.helpers import (
+    counters,
+    create_table_indexes,
+    fetch,
+    secret_cache,
+)
 from eNMS.base.rest import configure_rest_api
+from eNMS.inventory.models import migrate_device_configurations
 from eNMS.logs.models import SyslogServer
+from eNMS.scheduling.models import scheduler_election
 
 
 def register_extensions(app: Flask) -> None:
@@ -59,14 +74,46 @@ def configure_login_manager(app: Flask) -> None:
 def configure_vault_client(app: Flask) -> None:
     vault_client.url = app.config["VAULT_ADDR"]
     vault_client.token = app.config["VAULT_TOKEN"]
+    secret_cache.ttl = app.config["VAULT_CACHE_TTL"]
     if vault_client.sys.is_sealed() and app.config["UNSEAL_VAULT"]:
         keys = [app.config[f"UNSEAL_VAULT_KEY{i}"] for i in range(1, 6)]
         vault_client.sys.submit_unseal_keys(filter(None, keys))
 
 
+def configure_connection_pool(app: Flask) -> None:
+    connection_pool.idle_timeout = app.config["CONNECTION_POOL_IDLE_TIMEOUT"]
+    connection_pool.max_per_device = app.config["CONNECTION_POOL_MAX_PER_DEVICE"]
+    connection_pool.max_size = app.config["CONNECTION_POOL_MAX_SIZE"]
+    connection_pool.start()
+
+
+def configure_counters(app: Flask) -> None:
+    counters.ttl = app.config["COUNTER_CACHE_TTL"]
+
+
+def configure_run_states(app: Flask) -> None:
+    run_states.flush_interval = app.config["RUN_STATE_FLUSH_INTERVAL"]
+    run_states.start(app)
+    run_events.poll_interval = app.config["RUN_STATE_FLUSH_INTERVAL"]
+    run_events.keepalive = app.config["JOB_EVENTS_KEEPALIVE"]
+    run_events.start(app)
+
+
+def configure_scheduler(app: Flask) -> None:
+    scheduler_election.lease_duration = app.config["SCHEDULER_LEASE_DURATION"]
+    scheduler_election.poll_interval = app.config["SCHEDULER_POLL_INTERVAL"]
+    scheduler.add_listener(scheduler_job_missed, EVENT_JOB_MISSED)
+    scheduler_election.start(app)
+
+
 def configure_syslog_server(app: Flask) -> None:
     server = SyslogServer(app.config["SYSLOG_ADDR"], app.config["SYSLOG_PORT"])
-    server.start()
+    app.syslog_server = server
+    server.start(
+        app.config["SYSLOG_BUFFER_SIZE"],
+        app.config["SYSLOG_BATCH_SIZE"],
+        app.config["SYSLOG_BATCH_INTERVAL"],
+    )
 
 
 def configure_database(app: Flask) -> None:
@@ -79,6 +126,9 @@ def configure_database(app: Flask) -> None:
     @app.before_first_request
     def initialize_database() -> None:
         db.create_all()
+        create_table_indexes()
+        migrate_job_logs()
+        migrate_device_configurations()
         configure_instance_id()
         create_default(app)
         if app.config["CREATE_EXAMPLES"]:
@@ -126,6 +176,10 @@ def create_app(path: Path, config_class: Type[Config]) -> Flask:
     configure_rest_api(app)
     configure_logs(app)
     configure_errors(app)
+    configure_connection_pool(app)
+    configure_counters(app)
+    configure_run_states(app)
+    configure_scheduler(app)
     if USE_VAULT:
         configure_vault_client(app)
     if USE_SYSLOG:
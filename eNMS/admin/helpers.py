@@ -6,8 +6,9 @@ from os.path import exists
 from uuid import getnode
 from yaml import dump, load
 
+from eNMS.main import db
 from eNMS.base.default import create_default
-from eNMS.base.helpers import delete_all, export, factory
+from eNMS.base.helpers import delete_all, export, factory, pool_batch
 
 
 def configure_instance_id() -> None:
@@ -38,35 +39,37 @@ def migrate_import(app: Flask, request: dict) -> str:
     edges: list = []
     if request.get("empty_database_before_import", False):
         delete_all(*types)
-    for cls in types:
-        path = app.path / "migrations" / request["name"] / f"{cls}.yaml"
-        with open(path, "r") as migration_file:
-            objects = load(migration_file)
-            if cls == "Workflow":
-                workflows = deepcopy(objects)
-            if cls == "WorkflowEdge":
-                edges = deepcopy(objects)
-                continue
-            for obj in objects:
-                obj_cls = obj.pop("type") if cls == "Service" else cls
-                # 1) We cannot import workflow edges before workflow, because a
-                # workflow edge is defined by the workflow it belongs to.
-                # Therefore, we import workflow before workflow edges but
-                # strip off the edges, because they do not exist at this stage.
-                # Edges will be defined later on upon importing workflow edges.
-                # 2) At this stage, we cannot import jobs, because if workflows
-                # A (ID 1) and B (ID 2) are created, and B is added to A as a
-                # subworkflow, we won't be able to create A as B is one of its
-                # jobs and does not exist yet. To work around this, we will
-                # strip off the jobs at this stage, and reimport workflows a
-                # second time at the end.
+    with pool_batch():
+        for cls in types:
+            path = app.path / "migrations" / request["name"] / f"{cls}.yaml"
+            with open(path, "r") as migration_file:
+                objects = load(migration_file)
                 if cls == "Workflow":
-                    obj["edges"], obj["jobs"] = [], []
-                try:
-                    factory(obj_cls, **obj)
-                except Exception as e:
-                    info(f"{str(obj)} could not be imported ({str(e)})")
-                    status = "Partial import (see logs)."
+                    workflows = deepcopy(objects)
+                if cls == "WorkflowEdge":
+                    edges = deepcopy(objects)
+                    continue
+                for obj in objects:
+                    obj_cls = obj.pop("type") if cls == "Service" else cls
+                    # 1) We cannot import workflow edges before workflow, because a
+                    # workflow edge is defined by the workflow it belongs to.
+                    # Therefore, we import workflow before workflow edges but
+                    # strip off the edges, because they do not exist at this stage.
+                    # Edges will be defined later on upon importing workflow edges.
+                    # 2) At this stage, we cannot import jobs, because if workflows
+                    # A (ID 1) and B (ID 2) are created, and B is added to A as a
+                    # subworkflow, we won't be able to create A as B is one of its
+                    # jobs and does not exist yet. To work around this, we will
+                    # strip off the jobs at this stage, and reimport workflows a
+                    # second time at the end.
+                    if cls == "Workflow":
+                        obj["edges"], obj["jobs"] = [], []
+                    try:
+                        factory(obj_cls, **obj)
+                    except Exception as e:
+                        info(f"{str(obj)} could not be imported ({str(e)})")
+                        status = "Partial import (see logs)."
+    db.session.commit()
     for workflow in workflows:
         workflow["edges"] = []
         try:
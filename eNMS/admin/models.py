@@ -17,6 +17,9 @@ from eNMS.inventory.helpers import database_filtering
 class User(Base, UserMixin):
 
     __tablename__ = type = "User"
+    # the passwords of the users are used to authenticate them: a password
+    # changed by another process must be taken into account at once
+    cache_secrets = False
     id = Column(Integer, primary_key=True)
     email = Column(String)
     jobs = relationship("Job", back_populates="creator")
@@ -74,6 +77,12 @@ class Parameters(Base):
     slack_token = Column(String)
     slack_channel = Column(String)
     pool_filter = Column(String)
+    # incremented whenever a log rule is modified, so that the log rules
+    # compiled by the Syslog server are reloaded in every process
+    log_rules_version = Column(Integer, default=0)
+    # incremented whenever a secret is written to the Vault, so that the
+    # secrets cached by every process are read again from the Vault
+    secrets_version = Column(Integer, default=0)
 
     def update(self, **kwargs: Any) -> None:
         self.gotty_port_index = -1
@@ -22,6 +22,8 @@ from eNMS.admin.forms import (
     MigrationsForm,
 )
 from eNMS.admin.helpers import migrate_export, migrate_import
+from eNMS.automation.helpers import run_states
+from eNMS.automation.models import JobResult
 from eNMS.base.helpers import fetch_all, get, get_one, post, factory, fetch, serialize
 from eNMS.base.properties import instance_table_properties, user_table_properties
 
@@ -30,7 +32,7 @@ from eNMS.base.properties import instance_table_properties, user_table_propertie
 def user_management() -> dict:
     return dict(
         fields=user_table_properties,
-        users=serialize("User"),
+        users=serialize("User", relation_ids=True),
         form=AddUser(request.form),
     )
 
@@ -56,7 +58,7 @@ def database() -> dict:
 def instance_management() -> dict:
     return dict(
         fields=instance_table_properties,
-        instances=serialize("Instance"),
+        instances=serialize("Instance", relation_ids=True),
         form=AddInstance(request.form),
     )
 
@@ -168,18 +170,16 @@ def get_cluster_status() -> dict:
 @post(bp, "/clear_logs", "Admin")
 def clear_logs() -> bool:
     clear_date = datetime.strptime(request.form["clear_logs_date"], "%d/%m/%Y %H:%M:%S")
-    for job in fetch_all("Job"):
-        job.logs = {
-            date: log
-            for date, log in job.logs.items()
-            if datetime.strptime(date, "%Y-%m-%d-%H:%M:%S.%f") > clear_date
-        }
+    JobResult.query.filter(
+        JobResult.runtime < clear_date.strftime("%Y-%m-%d-%H:%M:%S.%f")
+    ).delete(synchronize_session=False)
     db.session.commit()
     return True
 
 
 @post(bp, "/reset_status", "Admin")
 def reset_status() -> bool:
+    run_states.reset()
     for job in fetch_all("Job"):
         job.status = "Idle"
     db.session.commit()
@@ -21,9 +21,9 @@ from eNMS.base.properties import (
     boolean_properties,
     service_import_properties,
 )
-from eNMS.automation.models import Job, Service, Workflow, WorkflowEdge
+from eNMS.automation.models import Job, JobRun, Service, Workflow, WorkflowEdge
 
-add_classes(Job, Service, Workflow, WorkflowEdge)
+add_classes(Job, JobRun, Service, Workflow, WorkflowEdge)
 
 
 def create_service_classes() -> None:
@@ -21,6 +21,9 @@ class JobForm(FlaskForm):
     devices = MultipleObjectField("Device")
     multiprocessing = BooleanField()
     max_processes = IntegerField("Maximum number of processes", default=50)
+    execution_engine = SelectField(
+        choices=(("threadpool", "Thread pool"), ("asyncio", "Asyncio event loop"))
+    )
     credentials = SelectField(
         choices=(("device", "Device Credentials"), ("user", "User Credentials"))
     )
@@ -42,6 +45,19 @@ class JobForm(FlaskForm):
     operating_system = StringField()
 
 
+class WorkflowForm(JobForm):
+    execution_engine = SelectField(
+        choices=(
+            ("threadpool", "Thread pool"),
+            ("asyncio", "Asyncio event loop"),
+            ("pipeline", "Device pipeline"),
+        )
+    )
+    max_parallel_jobs = IntegerField(
+        "Maximum number of jobs running in parallel", default=1
+    )
+
+
 class CompareLogsForm(FlaskForm):
     display = SelectField(choices=())
     compare_with = SelectField(choices=())
@@ -1,11 +1,28 @@
+from apscheduler.events import JobExecutionEvent
+from collections import Counter, defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime
+from flask import Flask
 from git import Repo
 from git.exc import GitCommandError
+from json import dumps
+from logging import info
+from math import floor
 from napalm._SUPPORTED_DRIVERS import SUPPORTED_DRIVERS
 from netmiko.ssh_dispatcher import CLASS_MAPPER, FILE_TRANSFER_MAP
 from pathlib import Path
-from typing import Optional, Set
+from queue import Empty, Queue
+from requests import get as rest_get, post as rest_post
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from threading import Condition, Lock, Thread
+from time import sleep, time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 from eNMS.main import db, scheduler
+from eNMS.base.classes import classes
 from eNMS.base.helpers import fetch, get_one, str_dict
 from eNMS.inventory.models import Device
 
@@ -14,15 +31,368 @@ NETMIKO_SCP_DRIVERS = sorted((driver, driver) for driver in FILE_TRANSFER_MAP)
 NAPALM_DRIVERS = sorted((driver, driver) for driver in SUPPORTED_DRIVERS[1:])
 
 
+class ConnectionPool:
+    def __init__(
+        self, idle_timeout: float = 60, max_per_device: int = 5, max_size: int = 1000
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self.max_per_device = max_per_device
+        self.max_size = max_size
+        self.condition = Condition()
+        # idle connections, from least to most recently used:
+        # id(connection) -> (key, connection, close function, release time)
+        self.idle: OrderedDict = OrderedDict()
+        self.opened: Counter = Counter()
+        self.sweeper: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self.sweeper:
+            return
+        self.sweeper = Thread(target=self.sweep)
+        self.sweeper.daemon = True
+        self.sweeper.start()
+
+    def sweep(self) -> None:
+        while True:
+            sleep(max(self.idle_timeout / 2, 1))
+            with self.condition:
+                expired = self.evict_expired()
+            self.close_all(expired)
+
+    def close(self, key: tuple, connection: Any, close: Callable) -> None:
+        # connections are closed without holding the lock: a slow or hung
+        # teardown only blocks the thread that closes the connection
+        try:
+            close(connection)
+        except Exception:
+            pass
+        with self.condition:
+            self.opened[key[0]] -= 1
+            if not self.opened[key[0]]:
+                del self.opened[key[0]]
+            self.condition.notify_all()
+
+    def close_all(self, connections: List[Tuple[tuple, Any, Callable]]) -> None:
+        for key, connection, close in connections:
+            self.close(key, connection, close)
+
+    def evict(self, connection_id: int) -> Tuple[tuple, Any, Callable]:
+        key, connection, close, _ = self.idle.pop(connection_id)
+        return key, connection, close
+
+    def evict_expired(self) -> List[Tuple[tuple, Any, Callable]]:
+        now, expired = time(), []
+        for connection_id, (*_, release_time) in list(self.idle.items()):
+            if now - release_time < self.idle_timeout:
+                break
+            expired.append(self.evict(connection_id))
+        return expired
+
+    def evict_device(self, device_id: int) -> Optional[Tuple[tuple, Any, Callable]]:
+        for connection_id, (key, *_) in self.idle.items():
+            if key[0] == device_id:
+                return self.evict(connection_id)
+        return None
+
+    def acquire(
+        self, key: tuple, create: Callable, is_alive: Callable, close: Callable
+    ) -> Any:
+        while True:
+            connection, opened = None, False
+            with self.condition:
+                evicted = self.evict_expired()
+                for connection_id in reversed(self.idle):
+                    if self.idle[connection_id][0] == key:
+                        _, connection, *_ = self.idle.pop(connection_id)
+                        break
+                if not connection:
+                    if self.opened[key[0]] < self.max_per_device:
+                        self.opened[key[0]] += 1
+                        opened = True
+                    else:
+                        device_connection = self.evict_device(key[0])
+                        if device_connection:
+                            evicted.append(device_connection)
+                        elif not evicted:
+                            self.condition.wait()
+            # the device slots freed by the evicted connections are only
+            # available once they are closed: the loop tries again after that
+            self.close_all(evicted)
+            if opened:
+                break
+            if not connection:
+                continue
+            try:
+                if is_alive(connection):
+                    return connection
+            except Exception:
+                pass
+            self.close(key, connection, close)
+        try:
+            return create()
+        except Exception:
+            self.close(key, None, lambda connection: None)
+            raise
+
+    def release(self, key: tuple, connection: Any, close: Callable) -> None:
+        if not self.idle_timeout:
+            self.close(key, connection, close)
+            return
+        with self.condition:
+            self.idle[id(connection)] = (key, connection, close, time())
+            evicted = [
+                self.evict(next(iter(self.idle)))
+                for _ in range(len(self.idle) - self.max_size)
+            ]
+            self.condition.notify_all()
+        self.close_all(evicted)
+
+    @contextmanager
+    def connection(
+        self, key: tuple, create: Callable, is_alive: Callable, close: Callable
+    ) -> Iterator[Any]:
+        connection = self.acquire(key, create, is_alive, close)
+        try:
+            yield connection
+        except Exception:
+            self.close(key, connection, close)
+            raise
+        self.release(key, connection, close)
+
+
+connection_pool = ConnectionPool()
+
+
+class RunEventBroadcaster:
+    def __init__(self, poll_interval: float = 1, keepalive: float = 15) -> None:
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.lock = Lock()
+        # event streams open in this process: job id -> queues of the streams
+        self.subscribers: Dict[int, List[Queue]] = defaultdict(list)
+        # last state read from the database for the jobs that are watched but
+        # run in another process: job id -> {"status": status, "state": state}
+        self.snapshots: Dict[int, dict] = {}
+        self.app: Optional[Flask] = None
+        self.watcher: Optional[Thread] = None
+
+    def start(self, app: Flask) -> None:
+        self.app = app
+        if self.watcher:
+            return
+        self.watcher = Thread(target=self.watch_periodically)
+        self.watcher.daemon = True
+        self.watcher.start()
+
+    def watch_periodically(self) -> None:
+        while True:
+            sleep(self.poll_interval)
+            try:
+                with self.app.app_context():
+                    self.watch()
+            except Exception as e:
+                info(f"Job events watch failed ({str(e)})")
+
+    @staticmethod
+    def message(event: str, data: Any) -> str:
+        return f"event: {event}\ndata: {dumps(data, default=str)}\n\n"
+
+    def subscribe(self, job_id: int) -> Queue:
+        queue: Queue = Queue()
+        with self.lock:
+            self.subscribers[job_id].append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: int, queue: Queue) -> None:
+        with self.lock:
+            self.subscribers[job_id].remove(queue)
+            if not self.subscribers[job_id]:
+                del self.subscribers[job_id]
+                self.snapshots.pop(job_id, None)
+
+    def publish(self, job_id: int, event: str, data: Any) -> None:
+        with self.lock:
+            queues = list(self.subscribers.get(job_id, ()))
+        if not queues:
+            return
+        message = self.message(event, data)
+        for queue in queues:
+            queue.put(message)
+
+    def stream(self, job_id: int, live_state: dict) -> Iterator[str]:
+        queue = self.subscribe(job_id)
+        try:
+            local_state = run_states.get(job_id)
+            if local_state:
+                live_state = local_state
+            else:
+                with self.lock:
+                    self.snapshots.setdefault(job_id, live_state)
+            yield self.message("state", live_state)
+            while True:
+                try:
+                    yield queue.get(timeout=self.keepalive)
+                except Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(job_id, queue)
+
+    def watch(self) -> None:
+        with self.lock:
+            job_ids = list(self.subscribers)
+        job_ids = [job_id for job_id in job_ids if not run_states.is_local(job_id)]
+        if not job_ids:
+            return
+        Job = classes["Job"]
+        rows = db.session.query(Job.id, Job.status, Job.state).filter(
+            Job.id.in_(job_ids)
+        )
+        for job_id, status, state in rows.all():
+            live_state = {"status": status, "state": state or {}}
+            with self.lock:
+                if job_id not in self.subscribers:
+                    continue
+                previous = self.snapshots.get(job_id)
+                self.snapshots[job_id] = live_state
+            if live_state == previous:
+                continue
+            self.publish(job_id, "state", live_state)
+            if previous and previous["status"] == "Running" and status != "Running":
+                last_run = fetch("Job", id=job_id).get_last_run()
+                if last_run:
+                    self.publish(job_id, "results", last_run)
+        db.session.remove()
+
+
+run_events = RunEventBroadcaster()
+
+
+class RunStateStore:
+    def __init__(self, flush_interval: float = 1) -> None:
+        self.flush_interval = flush_interval
+        self.lock = Lock()
+        # live status and state of the jobs running in this process:
+        # job id -> {"status": status, "state": state}
+        self.runs: Dict[int, dict] = {}
+        self.dirty: Set[int] = set()
+        self.app: Optional[Flask] = None
+        self.flusher: Optional[Thread] = None
+
+    def start(self, app: Flask) -> None:
+        self.app = app
+        if self.flusher:
+            return
+        self.flusher = Thread(target=self.flush_periodically)
+        self.flusher.daemon = True
+        self.flusher.start()
+
+    def flush_periodically(self) -> None:
+        while True:
+            sleep(self.flush_interval)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                info(f"Job status flush failed ({str(e)})")
+
+    def run_started(self, job_id: int) -> None:
+        with self.lock:
+            self.runs[job_id] = {"status": "Running", "state": {}}
+            self.dirty.add(job_id)
+        run_events.publish(job_id, "status", {"status": "Running"})
+
+    def run_done(self, job_id: int) -> None:
+        with self.lock:
+            self.runs[job_id] = {"status": "Idle", "state": {}}
+            self.dirty.add(job_id)
+        run_events.publish(job_id, "status", {"status": "Idle"})
+
+    def update(self, job_id: int, key: str, value: Any) -> None:
+        with self.lock:
+            run = self.runs.setdefault(job_id, {"status": "Running", "state": {}})
+            run["state"][key] = value
+            self.dirty.add(job_id)
+        run_events.publish(job_id, "update", {"key": key, "value": value})
+
+    def record(self, job_id: int, key: str, entry: Any, value: Any) -> None:
+        with self.lock:
+            run = self.runs.setdefault(job_id, {"status": "Running", "state": {}})
+            run["state"].setdefault(key, {})[entry] = value
+            self.dirty.add(job_id)
+        run_events.publish(
+            job_id, "record", {"key": key, "entry": entry, "value": value}
+        )
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self.lock:
+            return deepcopy(self.runs.get(job_id))
+
+    def is_local(self, job_id: int) -> bool:
+        with self.lock:
+            return job_id in self.runs
+
+    def reset(self) -> None:
+        with self.lock:
+            self.runs.clear()
+            self.dirty.clear()
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            flushed = {job_id: deepcopy(self.runs[job_id]) for job_id in self.dirty}
+            self.dirty.clear()
+        Job = classes["Job"]
+        for job_id, run in flushed.items():
+            Job.query.filter_by(id=job_id).update(run, synchronize_session=False)
+        db.session.commit()
+        with self.lock:
+            for job_id, run in flushed.items():
+                if run["status"] == "Idle" and job_id not in self.dirty:
+                    self.runs.pop(job_id, None)
+
+
+run_states = RunStateStore()
+
+
+def execute_run(
+    job: Any, targets: Optional[Set[Device]], run: Any = None, cluster: bool = False
+) -> dict:
+    # runs a job and keeps the status of its run (if any) up to date
+    if run:
+        run.status, run.start_time = "Running", str(datetime.now())
+        db.session.commit()
+    try:
+        if cluster:
+            results, now = job.cluster_run(targets)
+        else:
+            results, now = job.try_run(targets=targets)
+    except Exception:
+        if run:
+            run.status, run.end_time = "Failed", str(datetime.now())
+            db.session.commit()
+        raise
+    if run:
+        run.status, run.success = "Completed", results["success"]
+        run.runtime, run.end_time = now, str(datetime.now())
+        db.session.commit()
+    return results
+
+
 def scheduler_job(
-    job_id: int, aps_job_id: Optional[str] = None, targets: Optional[Set[Device]] = None
+    job_id: int,
+    aps_job_id: Optional[str] = None,
+    targets: Optional[Set[Device]] = None,
+    run_id: Optional[str] = None,
+    cluster: bool = False,
 ) -> None:
     with scheduler.app.app_context():
         task = fetch("Task", creation_time=aps_job_id)
         job = fetch("Job", id=job_id)
+        run = fetch("JobRun", name=run_id) if run_id else None
         if targets:
-            targets = {fetch("Device", id=device_id) for device_id in targets}
-        results, now = job.try_run(targets=targets)
+            targets = set(Device.query.filter(Device.id.in_(targets)))
+        results = execute_run(job, targets, run, cluster)
         parameters = get_one("Parameters")
         if job.push_to_git and parameters.git_automation:
             path_git_folder = Path.cwd() / "git" / "automation"
@@ -38,3 +408,106 @@ def scheduler_job(
         if task and not task.frequency:
             task.is_active = False
         db.session.commit()
+
+
+def scheduler_job_missed(event: JobExecutionEvent) -> None:
+    # a job dropped by the scheduler never reaches scheduler_job: the REST run
+    # it was added for would otherwise stay pending forever
+    with scheduler.app.app_context():
+        run = fetch("JobRun", name=event.job_id)
+        if run and run.status == "Pending":
+            run.status, run.end_time = "Failed", str(datetime.now())
+            db.session.commit()
+
+
+def fetch_targets(payload: dict) -> Set[Device]:
+    names, ip_addresses, pool_names = (
+        set(payload.get(property, []))
+        for property in ("devices", "ip_addresses", "pools")
+    )
+    criteria = [Device.name.in_(names)] if names else []
+    if ip_addresses:
+        criteria.append(Device.ip_address.in_(ip_addresses))
+    targets = set(Device.query.filter(or_(*criteria))) if criteria else set()
+    unknown = (names - {device.name for device in targets}) | (
+        ip_addresses - {device.ip_address for device in targets}
+    )
+    Pool, pools = classes["Pool"], []
+    if pool_names:
+        query = Pool.query.filter(Pool.name.in_(pool_names))
+        pools = query.options(selectinload(Pool.devices)).all()
+        unknown |= pool_names - {pool.name for pool in pools}
+    if unknown:
+        raise ValueError(f"Unknown devices or pools: {', '.join(sorted(unknown))}")
+    for pool in pools:
+        targets |= set(pool.devices)
+    return targets
+
+
+def cluster_instances() -> List[Any]:
+    parameters, Instance = get_one("Parameters"), classes["Instance"]
+    instances = Instance.query.filter(Instance.weight > 0).all()
+    urls = [
+        f"{parameters.cluster_scan_protocol}://{instance.ip_address}/rest/is_alive"
+        for instance in instances
+    ]
+
+    def heartbeat(url: str) -> Optional[dict]:
+        try:
+            return rest_get(url, timeout=parameters.cluster_scan_timeout).json()
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(urls) or 1) as executor:
+        heartbeats = list(executor.map(heartbeat, urls))
+    healthy_instances = []
+    for instance, heartbeat in zip(instances, heartbeats):
+        instance.status = "Up" if heartbeat else "down"
+        if heartbeat:
+            instance.cpu_load = heartbeat["cpu_load"]
+            healthy_instances.append(instance)
+    db.session.commit()
+    return healthy_instances
+
+
+def cluster_shards(
+    targets: Set[Device], instances: List[Any]
+) -> List[Tuple[Any, List[Device]]]:
+    # the capacity of an instance is its weight, scaled down by its CPU load
+    capacities = [
+        instance.weight * max(1 - (instance.cpu_load or 0) / 100, 0.05)
+        for instance in instances
+    ]
+    if not sum(capacities):
+        raise ValueError("No instance of the cluster is available.")
+    devices = sorted(targets, key=lambda device: device.name)
+    quotas = [len(devices) * capacity / sum(capacities) for capacity in capacities]
+    sizes = [floor(quota) for quota in quotas]
+    # the devices left over are given to the largest remainders
+    remainders = sorted(range(len(quotas)), key=lambda i: sizes[i] - quotas[i])
+    for index in remainders[: len(devices) - sum(sizes)]:
+        sizes[index] += 1
+    shards, start = [], 0
+    for instance, size in zip(instances, sizes):
+        if size:
+            shards.append((instance, devices[start : start + size]))
+        start += size
+    return shards
+
+
+def run_shard(url: str, auth: Tuple[str, str], payload: dict, timeout: float) -> dict:
+    run = rest_post(f"{url}/run_job", json=payload, auth=auth, timeout=timeout)
+    run.raise_for_status()
+    if not isinstance(run.json(), dict):
+        raise ValueError(run.json())
+    run_id, deadline = run.json()["name"], time() + timeout
+    while True:
+        status = rest_get(f"{url}/run/{run_id}", auth=auth, timeout=timeout).json()
+        if status["status"] not in ("Pending", "Running"):
+            break
+        if time() > deadline:
+            raise TimeoutError(f"Run {run_id} still running after {timeout}s")
+        sleep(1)
+    if status["status"] != "Completed":
+        raise ValueError(f"Run {run_id} {status['status'].lower()}")
+    return rest_get(f"{url}/run/{run_id}/result", auth=auth, timeout=timeout).json()
@@ -1,5 +1,13 @@
+from asyncio import gather, get_event_loop, new_event_loop, Semaphore
+from collections import deque
+from concurrent.futures import as_completed, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
+from flask import current_app, Flask
+from hashlib import sha256
+from inspect import iscoroutinefunction
+from json import dumps
 from logging import info
 from multiprocessing.pool import ThreadPool
 from napalm import get_network_driver
@@ -9,23 +17,52 @@ from os import environ
 from paramiko import SSHClient
 from re import compile, search
 from scp import SCPClient
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, PickleType, String
+from threading import Lock
+from sqlalchemy import (
+    Boolean,
+    Column,
+    event,
+    ForeignKey,
+    inspect,
+    Integer,
+    PickleType,
+    select,
+    String,
+)
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.mutable import MutableDict
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy.orm import backref, relationship, Session
+from sqlalchemy.sql import column, table
 from time import sleep
-from typing import Any, List, Optional, Set, Tuple
-
-from eNMS.main import db
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from eNMS.main import db, USE_VAULT
+from eNMS.automation.helpers import (
+    cluster_instances,
+    cluster_shards,
+    connection_pool,
+    run_events,
+    run_shard,
+    run_states,
+)
 from eNMS.base.associations import (
     job_device_table,
     job_log_rule_table,
     job_pool_table,
     job_workflow_table,
 )
-from eNMS.base.helpers import fetch
+from eNMS.base.helpers import fetch, get_one, secret_cache
 from eNMS.base.models import Base
+from eNMS.base.properties import private_properties
 from eNMS.inventory.models import Device
 
+session_lock = Lock()
+
+
+def credentials_digest(*values: Any) -> str:
+    # the keys of the connection pool only contain a hash of the credentials
+    return sha256(dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
 
 class Job(Base):
 
@@ -38,10 +75,16 @@ class Job(Base):
     description = Column(String)
     multiprocessing = Column(Boolean, default=False)
     max_processes = Column(Integer, default=50)
+    execution_engine = Column(String, default="threadpool")
     number_of_retries = Column(Integer, default=0)
     time_between_retries = Column(Integer, default=10)
     positions = Column(MutableDict.as_mutable(PickleType), default={})
-    logs = Column(MutableDict.as_mutable(PickleType), default={})
+    results = relationship(
+        "JobResult", back_populates="job", cascade="all, delete-orphan", lazy="dynamic"
+    )
+    runs = relationship(
+        "JobRun", back_populates="job", cascade="all, delete-orphan", lazy="dynamic"
+    )
     status = Column(String, default="Idle")
     state = Column(MutableDict.as_mutable(PickleType), default={})
     credentials = Column(String, default="device")
@@ -64,11 +107,22 @@ class Job(Base):
     send_notification_method = Column(String, default="mail_feedback_notification")
     display_only_failed_nodes = Column(Boolean, default=True)
     mail_recipient = Column(String, default="")
+    # execution engine -> method running the job on its targets
+    execution_engines = {"threadpool": "threadpool_run", "asyncio": "asyncio_run"}
 
     @property
     def creator_name(self) -> str:
         return self.creator.name if self.creator else "None"
 
+    def get_properties(self, export: bool = False) -> dict:
+        properties = super().get_properties(export)
+        if not export:
+            properties.update(run_states.get(self.id) or {})
+        return properties
+
+    def get_live_state(self) -> dict:
+        return run_states.get(self.id) or {"status": self.status, "state": self.state}
+
     def compute_targets(self) -> Set[Device]:
         targets = set(self.devices)
         for pool in self.pools:
@@ -114,11 +168,58 @@ class Job(Base):
         summary.append(f"Logs: {logs_url}")
         return "\n\n".join(summary)
 
+    def get_runtimes(self, page: int = 0) -> List[str]:
+        page_size = current_app.config["JOB_RESULTS_PAGE_SIZE"]
+        return [
+            result.runtime
+            for result in self.results.with_entities(JobResult.runtime)
+            .order_by(JobResult.id.desc())
+            .limit(page_size)
+            .offset(page * page_size)
+        ]
+
+    def get_result(self, runtime: str) -> Optional[dict]:
+        job_result = self.results.filter_by(runtime=runtime).first()
+        return job_result.result if job_result else None
+
+    def get_last_run(self) -> Optional[dict]:
+        last_run = (
+            self.results.with_entities(JobResult.runtime, JobResult.success)
+            .order_by(JobResult.id.desc())
+            .first()
+        )
+        return dict(zip(("runtime", "success"), last_run)) if last_run else None
+
+    def clean_results(self) -> None:
+        retention = current_app.config["JOB_RESULTS_RETENTION"]
+        if not retention:
+            return
+        expired = [
+            result.id
+            for result in self.results.with_entities(JobResult.id)
+            .order_by(JobResult.id.desc())
+            .offset(retention)
+        ]
+        if expired:
+            JobResult.query.filter(JobResult.id.in_(expired)).delete(
+                synchronize_session=False
+            )
+        expired_runs = [
+            run.id
+            for run in self.runs.with_entities(JobRun.id)
+            .order_by(JobRun.id.desc())
+            .offset(retention)
+        ]
+        if expired_runs:
+            JobRun.query.filter(JobRun.id.in_(expired_runs)).delete(
+                synchronize_session=False
+            )
+
     def notify(self, results: dict, time: str) -> None:
         fetch("Job", name=self.send_notification_method).try_run(
             {
                 "job": self.serialized,
-                "logs": self.logs,
+                "logs": results,
                 "runtime": time,
                 "result": self.build_notification(results, time),
             }
@@ -130,12 +231,10 @@ class Job(Base):
         targets: Optional[Set[Device]] = None,
         from_workflow: bool = False,
     ) -> Tuple[dict, str]:
-        self.status, self.state = "Running", {}
+        run_states.run_started(self.id)
         if not payload:
             payload = {}
         info(f"{self.name}: starting.")
-        if not from_workflow:
-            db.session.commit()
         failed_attempts, now = {}, str(datetime.now()).replace(" ", "-")
         for i in range(self.number_of_retries + 1):
             info(f"Running job {self.name}, attempt {i}")
@@ -146,25 +245,141 @@ class Job(Base):
                 failed_attempts[f"Attempts {i + 1}"] = results
                 sleep(self.time_between_retries)
         results["failed_attempts"] = failed_attempts
-        self.logs[now] = results
+        self.store_results(results, now, commit=not from_workflow)
         info(f"{self.name}: finished.")
-        self.status, self.state = "Idle", {}
-        if not from_workflow:
-            db.session.commit()
-            if self.send_notification:
-                self.notify(results, now)
+        if not from_workflow and self.send_notification:
+            self.notify(results, now)
         return results, now
 
+    def cluster_run(self, targets: Optional[Set[Device]] = None) -> Tuple[dict, str]:
+        shards = cluster_shards(targets or self.compute_targets(), cluster_instances())
+        run_states.run_started(self.id)
+        info(f"{self.name}: dispatching to {len(shards)} instances.")
+        now = str(datetime.now()).replace(" ", "-")
+        results: dict = {"result": {"devices": {}}, "instances": {}}
+        config = current_app.config
+        protocol = get_one("Parameters").cluster_scan_protocol
+        auth = (config["CLUSTER_REST_USERNAME"], config["CLUSTER_REST_PASSWORD"])
+        with ThreadPoolExecutor(max_workers=len(shards) or 1) as executor:
+            runs = {
+                executor.submit(
+                    run_shard,
+                    f"{protocol}://{instance.ip_address}/rest",
+                    auth,
+                    {
+                        "name": self.name,
+                        "devices": [device.name for device in devices],
+                        "async": True,
+                    },
+                    config["CLUSTER_RUN_TIMEOUT"],
+                ): (instance.name, devices)
+                for instance, devices in shards
+            }
+            for shard in as_completed(runs):
+                instance, devices = runs[shard]
+                try:
+                    shard_results = shard.result()
+                    shard_devices = shard_results["result"]["devices"]
+                except Exception as e:
+                    error = f"Run on instance {instance} failed ({str(e)})"
+                    shard_results = {"success": False, "result": error}
+                    shard_devices = {}
+                missing = {"success": False, "result": shard_results["result"]}
+                for device in devices:
+                    device_results = shard_devices.get(device.name, missing)
+                    results["result"]["devices"][device.name] = device_results
+                    run_states.record(
+                        self.id, "devices", device.name, device_results["success"]
+                    )
+                results["instances"][instance] = {
+                    "devices": len(devices),
+                    "success": shard_results["success"],
+                }
+        results["success"] = all(
+            device["success"] for device in results["result"]["devices"].values()
+        )
+        self.store_results(results, now)
+        info(f"{self.name}: finished on the cluster.")
+        return results, now
+
+    def store_results(self, results: dict, now: str, commit: bool = True) -> None:
+        with session_lock:
+            self.results.append(
+                JobResult(runtime=now, success=results["success"], result=results)
+            )
+        if commit:
+            db.session.flush()
+            self.clean_results()
+            db.session.commit()
+        run_states.run_done(self.id)
+        run_events.publish(
+            self.id, "results", {"runtime": now, "success": results["success"]}
+        )
+
     def get_results(self, payload: dict, device: Optional[Device] = None) -> dict:
         try:
             return self.job(payload, device) if device else self.job(payload)
         except Exception as e:
             return {"success": False, "result": str(e)}
 
+    async def async_get_results(self, payload: dict, device: Device) -> dict:
+        # get_results for the services whose job is a coroutine
+        try:
+            return await self.job(payload, device)
+        except Exception as e:
+            return {"success": False, "result": str(e)}
+
     def device_run(self, args: Tuple[Device, dict, dict]) -> None:
         device, results, payload = args
         device_result = self.get_results(payload, device)
         results["result"]["devices"][device.name] = device_result
+        run_states.record(self.id, "devices", device.name, device_result["success"])
+
+    async def async_device_run(
+        self,
+        semaphore: Semaphore,
+        executor: ThreadPoolExecutor,
+        args: Tuple[Device, dict, dict],
+    ) -> None:
+        device, results, payload = args
+        async with semaphore:
+            if iscoroutinefunction(self.job):
+                device_result = await self.async_get_results(payload, device)
+            else:
+                device_result = await get_event_loop().run_in_executor(
+                    executor, self.get_results, payload, device
+                )
+        results["result"]["devices"][device.name] = device_result
+        run_states.record(self.id, "devices", device.name, device_result["success"])
+
+    async def async_devices_run(
+        self, processes: int, arguments: List[Tuple[Device, dict, dict]]
+    ) -> None:
+        semaphore = Semaphore(processes)
+        with ThreadPoolExecutor(max_workers=processes) as executor:
+            await gather(
+                *(
+                    self.async_device_run(semaphore, executor, args)
+                    for args in arguments
+                )
+            )
+
+    def threadpool_run(
+        self, processes: int, arguments: List[Tuple[Device, dict, dict]]
+    ) -> None:
+        pool = ThreadPool(processes=processes)
+        pool.map(self.device_run, arguments)
+        pool.close()
+        pool.join()
+
+    def asyncio_run(
+        self, processes: int, arguments: List[Tuple[Device, dict, dict]]
+    ) -> None:
+        loop = new_event_loop()
+        try:
+            loop.run_until_complete(self.async_devices_run(processes, arguments))
+        finally:
+            loop.close()
 
     def run(
         self, payload: dict, targets: Optional[Set[Device]] = None
@@ -172,19 +387,25 @@ class Job(Base):
         if not targets and getattr(self, "use_workflow_targets", True):
             targets = self.compute_targets()
         if targets:
+            if USE_VAULT and self.credentials == "device":
+                secret_cache.prefetch(
+                    device.secret_path(property)
+                    for device in targets
+                    for property in private_properties
+                )
             results: dict = {"result": {"devices": {}}}
             if self.multiprocessing:
+                engine = self.execution_engine or "threadpool"
+                if engine not in self.execution_engines:
+                    error = f"Unknown execution engine: {engine}"
+                    return {"success": False, "result": error}, targets
                 processes = min(len(targets), self.max_processes)
-                pool = ThreadPool(processes=processes)
-                pool.map(
-                    self.device_run, [(device, results, payload) for device in targets]
+                getattr(self, self.execution_engines[engine])(
+                    processes, [(device, results, payload) for device in targets]
                 )
-                pool.close()
-                pool.join()
             else:
-                results["result"]["devices"] = {
-                    device.name: self.get_results(payload, device) for device in targets
-                }
+                for device in targets:
+                    self.device_run((device, results, payload))
             remaining_targets = {
                 device
                 for device in targets
@@ -196,6 +417,85 @@ class Job(Base):
             return self.get_results(payload), None
 
 
+class JobResult(Base):
+
+    __tablename__ = type = "JobResult"
+    id = Column(Integer, primary_key=True)
+    runtime = Column(String, index=True)
+    success = Column(Boolean, index=True)
+    result = Column(PickleType)
+    job_id = Column(Integer, ForeignKey("Job.id"), index=True)
+    job = relationship("Job", back_populates="results")
+
+    def __repr__(self) -> str:
+        return self.runtime
+
+
+def migrate_job_logs() -> None:
+    # databases created before the JobResult table keep the runs of each job
+    # in a pickled "logs" column of the Job table: they are moved to JobResult
+    columns = inspect(db.engine).get_columns("Job")
+    if "logs" not in {job_column["name"] for job_column in columns}:
+        return
+    job_table = table("Job", column("id", Integer), column("logs", PickleType))
+    mappings = [
+        {
+            "job_id": job_id,
+            "runtime": runtime,
+            "success": result.get("success") if isinstance(result, dict) else None,
+            "result": result,
+        }
+        for job_id, logs in db.session.execute(
+            select([job_table.c.id, job_table.c.logs]).where(
+                job_table.c.logs.isnot(None)
+            )
+        )
+        for runtime, result in sorted((logs or {}).items())
+    ]
+    db.session.bulk_insert_mappings(JobResult, mappings)
+    db.session.execute(job_table.update().values(logs=None))
+    db.session.commit()
+    if mappings:
+        info(f"{len(mappings)} job runs moved from Job.logs to JobResult")
+
+
+class JobRun(Base):
+
+    __tablename__ = type = "JobRun"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True)
+    status = Column(String, default="Pending")
+    success = Column(Boolean)
+    runtime = Column(String)
+    number_of_targets = Column(Integer, default=0)
+    creation_time = Column(String)
+    start_time = Column(String)
+    end_time = Column(String)
+    job_id = Column(Integer, ForeignKey("Job.id"), index=True)
+    job = relationship("Job", back_populates="runs")
+    job_name = association_proxy("job", "name")
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.creation_time = str(datetime.now())
+
+    def get_progress(self) -> dict:
+        live_state = self.job.get_live_state()
+        running = self.status == "Running" and live_state["status"] == "Running"
+        devices = (live_state["state"] or {}).get("devices", {}) if running else {}
+        return {
+            "status": self.status,
+            "number_of_targets": self.number_of_targets,
+            "devices_done": len(devices),
+            "devices_failed": list(devices.values()).count(False),
+            "state": live_state["state"] if running else {},
+        }
+
+    def get_result(self) -> Optional[dict]:
+        result = self.job.results.filter_by(runtime=self.runtime).first()
+        return result.result if result else None
+
+
 class Service(Job):
 
     __tablename__ = "Service"
@@ -209,37 +509,71 @@ class Service(Job):
             else (device.username, device.password)
         )
 
-    def netmiko_connection(self, device: Device) -> ConnectHandler:
+    @contextmanager
+    def netmiko_connection(self, device: Device) -> Iterator[ConnectHandler]:
         username, password = self.get_credentials(device)
-        return ConnectHandler(
-            device_type=(
-                device.netmiko_driver if self.use_device_driver else self.driver
+        driver = device.netmiko_driver if self.use_device_driver else self.driver
+        digest = credentials_digest(password, device.enable_password)
+        with connection_pool.connection(
+            (device.id, "netmiko", driver, username, digest),
+            lambda: ConnectHandler(
+                device_type=driver,
+                ip=device.ip_address,
+                username=username,
+                password=password,
+                secret=device.enable_password,
+                fast_cli=self.fast_cli,
+                timeout=self.timeout,
+                global_delay_factor=self.global_delay_factor,
             ),
-            ip=device.ip_address,
-            username=username,
-            password=password,
-            secret=device.enable_password,
-            fast_cli=self.fast_cli,
-            timeout=self.timeout,
-            global_delay_factor=self.global_delay_factor,
-        )
-
-    def napalm_connection(self, device: Device) -> NetworkDriver:
-        username, password = self.get_credentials(device)
-        optional_args = self.optional_args
-        if not optional_args:
-            optional_args = {}
+            lambda connection: connection.is_alive(),
+            lambda connection: connection.disconnect(),
+        ) as netmiko_handler:
+            netmiko_handler.fast_cli = self.fast_cli
+            netmiko_handler.timeout = self.timeout
+            netmiko_handler.global_delay_factor = self.global_delay_factor
+            yield netmiko_handler
+
+    def napalm_optional_args(self, device: Device) -> dict:
+        optional_args = dict(self.optional_args or {})
         if "secret" not in optional_args:
             optional_args["secret"] = device.enable_password
-        driver = get_network_driver(
-            device.napalm_driver if self.use_device_driver else self.driver
-        )
-        return driver(
+        return optional_args
+
+    def create_napalm_driver(
+        self,
+        device: Device,
+        driver: str,
+        username: str,
+        password: str,
+        optional_args: dict,
+    ) -> NetworkDriver:
+        napalm_driver = get_network_driver(driver)(
             hostname=device.ip_address,
             username=username,
             password=password,
             optional_args=optional_args,
         )
+        napalm_driver.open()
+        return napalm_driver
+
+    @contextmanager
+    def napalm_connection(self, device: Device) -> Iterator[NetworkDriver]:
+        username, password = self.get_credentials(device)
+        driver = device.napalm_driver if self.use_device_driver else self.driver
+        optional_args = self.napalm_optional_args(device)
+        # sessions opened with other optional arguments (port, transport,
+        # secret...) are not reused
+        digest = credentials_digest(password, optional_args)
+        with connection_pool.connection(
+            (device.id, "napalm", driver, username, digest),
+            lambda: self.create_napalm_driver(
+                device, driver, username, password, optional_args
+            ),
+            lambda connection: connection.is_alive()["is_alive"],
+            lambda connection: connection.close(),
+        ) as napalm_driver:
+            yield napalm_driver
 
     def sub(self, data: str, variables: dict) -> str:
         r = compile("{{(.*?)}}")
@@ -315,13 +649,55 @@ class WorkflowEdge(Base):
     )
 
 
+class WorkflowPlan:
+    def __init__(self, workflow: "Workflow") -> None:
+        self.last_modified = workflow.last_modified
+        self.start, self.end = workflow.jobs[0].id, workflow.jobs[1].id
+        self.jobs = {job.id for job in workflow.jobs}
+        self.edges: Dict[str, Dict[int, List[int]]] = {
+            subtype: {} for subtype in ("success", "failure", "prerequisite")
+        }
+        self.sources: Dict[int, List[int]] = {}
+        for edge in workflow.edges:
+            source, destination = edge.source_id, edge.destination_id
+            if source not in self.jobs or destination not in self.jobs:
+                continue
+            self.edges[edge.subtype].setdefault(source, []).append(destination)
+            if edge.subtype == "prerequisite":
+                self.sources.setdefault(destination, []).append(source)
+        self.reachable = self.compute_reachable()
+        self.end_reachable = self.end in self.reachable
+
+    def compute_reachable(self) -> Set[int]:
+        reachable, queue = {self.start}, deque([self.start])
+        while queue:
+            job_id = queue.popleft()
+            for subtype in ("success", "failure"):
+                for successor in self.successors(job_id, subtype):
+                    if successor not in reachable:
+                        reachable.add(successor)
+                        queue.append(successor)
+        return reachable
+
+    def successors(self, job_id: int, subtype: str) -> List[int]:
+        return self.edges[subtype].get(job_id, [])
+
+    def prerequisites(self, job_id: int) -> List[int]:
+        return self.sources.get(job_id, [])
+
+
+workflow_plans: Dict[int, WorkflowPlan] = {}
+
+
 class Workflow(Job):
 
     __tablename__ = "Workflow"
     __mapper_args__ = {"polymorphic_identity": "Workflow"}
     id = Column(Integer, ForeignKey("Job.id"), primary_key=True)
     use_workflow_targets = Column(Boolean, default=True)
+    max_parallel_jobs = Column(Integer, default=1)
     last_modified = Column(String)
+    execution_engines = {**Job.execution_engines, "pipeline": "pipeline_run"}
     jobs = relationship("Job", secondary=job_workflow_table, back_populates="workflows")
     edges = relationship("WorkflowEdge", back_populates="workflow")
 
@@ -333,42 +709,201 @@ class Workflow(Job):
         if self.name not in end.positions:
             end.positions[self.name] = (500, 0)
 
+    @property
+    def plan(self) -> "WorkflowPlan":
+        plan = workflow_plans.get(self.id)
+        if not plan or plan.last_modified != self.last_modified:
+            plan = workflow_plans[self.id] = WorkflowPlan(self)
+        return plan
+
+    def job_map(self) -> Dict[int, Job]:
+        return {job.id: job for job in self.jobs}
+
     def job(self, payload: dict, device: Optional[Device] = None) -> dict:
         if not self.multiprocessing:
-            self.state = {"jobs": {}}
+            run_states.update(self.id, "jobs", {})
             if device:
-                self.state["current_device"] = device.name
-            db.session.commit()
-        jobs: List[Job] = [self.jobs[0]]
-        visited: Set = set()
+                run_states.update(self.id, "current_device", device.name)
+        if (self.max_parallel_jobs or 1) > 1:
+            return self.parallel_job(device)
+        plan, jobs = self.plan, self.job_map()
+        pending, visited = [plan.start], set()
         results: dict = {"success": False}
-        while jobs:
-            job = jobs.pop()
-            if any(
-                node not in visited for node in job.job_sources(self, "prerequisite")
+        while True:
+            job_id = self.next_job(plan, pending, visited)
+            if job_id is None:
+                break
+            job = jobs[job_id]
+            self.job_started(job)
+            job_results = self.run_job(job, results, device)
+            for successor in self.job_done(plan, job, job_results, results):
+                if successor not in visited:
+                    pending.append(successor)
+        return results
+
+    def next_job(
+        self, plan: "WorkflowPlan", pending: List[int], visited: Set[int]
+    ) -> Optional[int]:
+        while pending:
+            job_id = pending.pop()
+            if job_id in visited or any(
+                source not in visited for source in plan.prerequisites(job_id)
             ):
                 continue
-            visited.add(job)
-            if not self.multiprocessing:
-                self.state["current_job"] = job.get_properties()
-                db.session.commit()
-            log = f"Workflow {self.name}: job {job.name}"
-            if device:
-                log += f" on {device.name}"
-            info(log)
-            job_results, _ = job.try_run(
-                results, {device} if device else None, from_workflow=True
-            )
-            success = job_results["success"]
-            if not self.multiprocessing:
-                self.state["jobs"][job.id] = success
+            visited.add(job_id)
+            return job_id
+        return None
+
+    def pipeline_run(
+        self, processes: int, arguments: List[Tuple[Device, dict, dict]]
+    ) -> None:
+        app, plan = current_app._get_current_object(), self.plan
+        run_states.update(self.id, "devices", {})
+        with ThreadPoolExecutor(max_workers=processes) as executor:
+            walks = {
+                executor.submit(self.run_walk, app, plan, device.id): (device, results)
+                for device, results, _ in arguments
+            }
+            for walk in as_completed(walks):
+                device, results = walks[walk]
+                results["result"]["devices"][device.name] = walk.result()
+                self.device_done(device, walk.result())
+
+    def run_walk(self, app: Flask, plan: "WorkflowPlan", device_id: int) -> dict:
+        # a device walks the workflow in its own application context: the
+        # workflow and the device are reloaded in the session of the thread,
+        # which commits the changes made by the jobs
+        with app.app_context():
+            try:
+                workflow = fetch("Workflow", id=self.id)
+                device = fetch("Device", id=device_id)
+                results = workflow.device_walk(plan, workflow.job_map(), device)
                 db.session.commit()
-            edge_type_to_follow = "success" if success else "failure"
-            for successor in job.job_successors(self, edge_type_to_follow):
+                return results
+            finally:
+                db.session.remove()
+
+    def device_walk(
+        self, plan: "WorkflowPlan", jobs: Dict[int, Job], device: Device
+    ) -> dict:
+        pending, visited = [plan.start], set()
+        results: dict = {"success": False}
+        while True:
+            job_id = self.next_job(plan, pending, visited)
+            if job_id is None:
+                return results
+            job = jobs[job_id]
+            job_results = self.device_step(job, results, device)
+            for successor in self.job_done(plan, job, job_results, results):
                 if successor not in visited:
-                    jobs.append(successor)
-                if successor == self.jobs[1]:
-                    results["success"] = True
-            results[job.name] = job_results
-            sleep(job.waiting_time)
+                    pending.append(successor)
+
+    def device_done(self, device: Device, device_results: dict) -> None:
+        run_states.record(self.id, "devices", device.name, device_results["success"])
+
+    def device_step(self, job: Job, payload: dict, device: Device) -> dict:
+        info(f"Workflow {self.name}: job {job.name} on {device.name}")
+        for attempt in range(job.number_of_retries + 1):
+            device_results = job.get_results(payload, device)
+            if device_results["success"] or attempt == job.number_of_retries:
+                break
+            sleep(job.time_between_retries)
+        sleep(job.waiting_time)
+        return {
+            "success": device_results["success"],
+            "result": {"devices": {device.name: device_results}},
+        }
+
+    def parallel_job(self, device: Optional[Device] = None) -> dict:
+        app, plan, jobs = current_app._get_current_object(), self.plan, self.job_map()
+        device_id = device.id if device else None
+        pending, done = {plan.start}, set()
+        running: dict = {}
+        results: dict = {"success": False}
+        with ThreadPoolExecutor(max_workers=int(self.max_parallel_jobs)) as executor:
+            while pending or running:
+                for job_id in list(pending):
+                    if any(source not in done for source in plan.prerequisites(job_id)):
+                        continue
+                    pending.remove(job_id)
+                    job = jobs[job_id]
+                    self.job_started(job)
+                    future = executor.submit(
+                        self.run_branch, app, job.id, dict(results), device_id
+                    )
+                    running[future] = job
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    done.add(job.id)
+                    busy = done | {running_job.id for running_job in running.values()}
+                    for successor in self.job_done(plan, job, future.result(), results):
+                        if successor not in busy:
+                            pending.add(successor)
         return results
+
+    def run_branch(
+        self, app: Flask, job_id: int, payload: dict, device_id: Optional[int]
+    ) -> dict:
+        # a branch runs in its own application context: the job and the device
+        # are reloaded in the session of the thread, which commits the results
+        with app.app_context():
+            job = fetch("Job", id=job_id)
+            device = fetch("Device", id=device_id) if device_id else None
+            job_results = self.run_job(job, payload, device)
+            db.session.commit()
+            return job_results
+
+    def run_job(self, job: Job, payload: dict, device: Optional[Device]) -> dict:
+        log = f"Workflow {self.name}: job {job.name}"
+        if device:
+            log += f" on {device.name}"
+        info(log)
+        job_results, _ = job.try_run(
+            payload, {device} if device else None, from_workflow=True
+        )
+        sleep(job.waiting_time)
+        return job_results
+
+    def job_started(self, job: Job) -> None:
+        if not self.multiprocessing:
+            run_states.update(self.id, "current_job", job.get_properties())
+
+    def job_done(
+        self, plan: "WorkflowPlan", job: Job, job_results: dict, results: dict
+    ) -> List[int]:
+        success = job_results["success"]
+        if not self.multiprocessing:
+            run_states.record(self.id, "jobs", job.id, success)
+        results[job.name] = job_results
+        successors = plan.successors(job.id, "success" if success else "failure")
+        if plan.end in successors:
+            results["success"] = True
+        return successors
+
+    def clean_results(self) -> None:
+        super().clean_results()
+        for job in self.jobs:
+            if job != self:
+                job.clean_results()
+
+
+@event.listens_for(Session, "before_flush")
+def detect_workflow_changes(session: Session, *args: Any) -> None:
+    workflows = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, WorkflowEdge):
+            workflows.add(obj.workflow)
+        elif isinstance(obj, Job):
+            history = inspect(obj).attrs.workflows.history
+            workflows.update(history.added, history.deleted)
+            if obj in session.deleted:
+                workflows.update(obj.workflows)
+            if isinstance(obj, Workflow) and obj not in session.deleted:
+                if inspect(obj).attrs.jobs.history.has_changes():
+                    workflows.add(obj)
+    now = str(datetime.now())
+    for workflow in workflows - {None} - session.deleted:
+        workflow.last_modified = now
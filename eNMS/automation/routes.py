@@ -1,12 +1,12 @@
 from datetime import datetime
 from difflib import SequenceMatcher
-from flask import request, session
+from flask import request, Response, session
 from json import dumps
 from sqlalchemy.exc import DataError
-from typing import List
+from typing import List, Optional
 
 from eNMS.main import db, scheduler
-from eNMS.automation.helpers import scheduler_job
+from eNMS.automation.helpers import run_events, scheduler_job
 from eNMS.base.classes import service_classes
 from eNMS.base.helpers import (
     delete,
@@ -32,7 +32,9 @@ from eNMS.automation.forms import (
     CompareLogsForm,
     JobForm,
     WorkflowBuilderForm,
+    WorkflowForm,
 )
+from eNMS.automation.models import JobResult
 
 
 @get(bp, "/service_management", "View")
@@ -42,7 +44,7 @@ def service_management() -> dict:
         fields=service_table_properties,
         service_form=JobForm(request.form),
         services_classes=list(service_classes),
-        services=serialize("Service"),
+        services=serialize("Service", relation_ids=True),
     )
 
 
@@ -51,8 +53,8 @@ def workflow_management() -> dict:
     return dict(
         compare_logs_form=CompareLogsForm(request.form),
         fields=workflow_table_properties,
-        workflows=serialize("Workflow"),
-        workflow_creation_form=JobForm(request.form),
+        workflows=serialize("Workflow", relation_ids=True),
+        workflow_creation_form=WorkflowForm(request.form),
     )
 
 
@@ -63,7 +65,7 @@ def workflow_builder() -> dict:
         workflow=workflow.serialized if workflow else None,
         add_job_form=AddJobForm(request.form),
         workflow_builder_form=WorkflowBuilderForm(request.form),
-        workflow_creation_form=JobForm(request.form),
+        workflow_creation_form=WorkflowForm(request.form),
         compare_logs_form=CompareLogsForm(request.form),
         service_form=JobForm(request.form),
         services_classes=list(service_classes),
@@ -81,13 +83,33 @@ def logs(id: int, runtime: str) -> str:
     if not job:
         message = "The associated job has been deleted."
     else:
-        message = job.logs.get(runtime, "Logs have been removed")
+        message = job.get_result(runtime) or "Logs have been removed"
     return f"<pre>{dumps(message, indent=4)}</pre>"
 
 
 @post(bp, "/get_logs/<int:id>", "View")
 def get_logs(id: int) -> dict:
-    return fetch("Job", id=id).logs
+    job = fetch("Job", id=id)
+    runtimes = job.get_runtimes(int(request.args.get("page", 0)))
+    return {
+        "runtimes": runtimes,
+        "result": job.get_result(runtimes[0]) if runtimes else None,
+    }
+
+
+@get(bp, "/job_events/<int:id>", "View")
+def job_events(id: int) -> Response:
+    live_state = fetch("Job", id=id).get_live_state()
+    return Response(
+        run_events.stream(id, live_state),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@post(bp, "/get_result/<int:id>/<runtime>", "View")
+def get_result(id: int, runtime: str) -> Optional[dict]:
+    return fetch("Job", id=id).get_result(runtime)
 
 
 @post(bp, "/get_service/<id_or_cls>", "View")
@@ -171,7 +193,7 @@ def get_service(id_or_cls: str) -> dict:
 @post(bp, "/run_job/<int:job_id>", "Edit")
 def run_job(job_id: int) -> dict:
     job = fetch("Job", id=job_id)
-    if job.status == "Running":
+    if job.get_live_state()["status"] == "Running":
         return {"error": "Job is already running."}
     targets = job.compute_targets()
     if hasattr(job, "has_targets"):
@@ -185,6 +207,7 @@ def run_job(job_id: int) -> dict:
         run_date=datetime.now(),
         args=[job.id],
         trigger="date",
+        misfire_grace_time=None,
     )
     return job.serialized
 
@@ -192,15 +215,15 @@ def run_job(job_id: int) -> dict:
 @post(bp, "/get_diff/<int:job_id>/<v1>/<v2>", "View")
 def get_diff(job_id: int, v1: str, v2: str) -> dict:
     job = fetch("Job", id=job_id)
-    first = str_dict(job.logs[v1]).splitlines()
-    second = str_dict(job.logs[v2]).splitlines()
+    first = str_dict(job.get_result(v1)).splitlines()
+    second = str_dict(job.get_result(v2)).splitlines()
     opcodes = SequenceMatcher(None, first, second).get_opcodes()
     return {"first": first, "second": second, "opcodes": opcodes}
 
 
 @post(bp, "/clear_logs/<int:job_id>", "Edit")
 def clear_logs(job_id: int) -> bool:
-    fetch("Job", id=job_id).logs = {}
+    JobResult.query.filter_by(job_id=job_id).delete()
     db.session.commit()
     return True
 
@@ -241,6 +264,20 @@ def duplicate_workflow(workflow_id: int) -> dict:
     return new_workflow.serialized
 
 
+@post(bp, "/get_workflow_state/<int:workflow_id>", "View")
+def get_workflow_state(workflow_id: int) -> dict:
+    workflow = fetch("Workflow", id=workflow_id)
+    plan = workflow.plan
+    return {
+        "id": workflow.id,
+        "last_modified": workflow.last_modified,
+        **workflow.get_live_state(),
+        "jobs": sorted(plan.jobs),
+        "unreachable": sorted(plan.jobs - plan.reachable),
+        "end_reachable": plan.end_reachable,
+    }
+
+
 @post(bp, "/reset_workflow_logs/<int:workflow_id>", "Edit")
 def reset_workflow_logs(workflow_id: int) -> bool:
     fetch("Workflow", id=workflow_id).state = {}
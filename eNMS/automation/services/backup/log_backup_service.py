@@ -35,8 +35,9 @@ class LogBackupService(Service):
         source = path_backup / f"logs_{now}.tgz"
         makedirs(path_dir)
         for job in fetch_all("Job"):
+            results = {result.runtime: result.result for result in job.results}
             with open(path_dir / f"{job.name}.json", "w") as log_file:
-                dump(job.logs, log_file)
+                dump(results, log_file)
         with open_tar(source, "w:gz") as tar:
             tar.add(path_dir, arcname="/")
         ssh_client = SSHClient()
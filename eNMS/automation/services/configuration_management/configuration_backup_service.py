@@ -29,31 +29,27 @@ class ConfigurationBackupService(Service):
     def job(self, payload: dict, device: Device) -> dict:
         now = datetime.now()
         path_configurations = Path.cwd() / "git" / "configurations"
-        netmiko_handler = self.netmiko_connection(device)
         try:
-            netmiko_handler.enable()
-        except Exception:
-            pass
-        try:
-            config = netmiko_handler.send_command(self.configuration_command)
+            with self.netmiko_connection(device) as netmiko_handler:
+                try:
+                    netmiko_handler.enable()
+                except Exception:
+                    pass
+                config = netmiko_handler.send_command(self.configuration_command)
             device.last_status = "Success"
             device.last_runtime = (datetime.now() - now).total_seconds()
-            netmiko_handler.disconnect()
-            if device.configurations:
-                last_config = device.configurations[max(device.configurations)]
-                if config == last_config:
-                    return {"success": True, "result": "no change"}
-            device.configurations[now] = device.current_configuration = config
+            if not device.add_configuration(
+                str(now), config, self.number_of_configuration
+            ):
+                return {"success": True, "result": "no change"}
+            device.current_configuration = config
             with open(path_configurations / device.name, "w") as file:
                 file.write(config)
             device.last_update = now
         except Exception as e:
-            netmiko_handler.disconnect()
             device.last_status = "Failure"
             device.last_failure = now
             return {"success": False, "result": str(e)}
-        if len(device.configurations) > self.number_of_configuration:
-            device.configurations.pop(min(device.configurations))
         return {"success": True, "result": f"Command: {self.configuration_command}"}
 
 
@@ -22,8 +22,6 @@ class ConfigureBgpService(Service):
     __mapper_args__ = {"polymorphic_identity": "ConfigureBgpService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver = self.napalm_connection(device)
-        napalm_driver.open()
         config = f"""
             ip vrf {self.vrf_name}
             rd {self.local_as}:235
@@ -43,9 +41,9 @@ class ConfigureBgpService(Service):
             exit-address-family
         """
         config = "\n".join(config.splitlines())
-        getattr(napalm_driver, "load_merge_candidate")(config=config)
-        napalm_driver.commit_config()
-        napalm_driver.close()
+        with self.napalm_connection(device) as napalm_driver:
+            getattr(napalm_driver, "load_merge_candidate")(config=config)
+            napalm_driver.commit_config()
         return {"success": True, "result": f"Config push ({config})"}
 
 
@@ -10,10 +10,10 @@ from slackclient import SlackClient
 from sqlalchemy import Boolean, Column, ForeignKey, Integer
 from typing import Optional
 
-from eNMS.main import mail_client
+from eNMS.main import db, mail_client
 from eNMS.automation.models import Service
 from eNMS.base.classes import service_classes
-from eNMS.base.helpers import factory, fetch_all, get_one, str_dict
+from eNMS.base.helpers import fetch_all, get_one, str_dict
 from eNMS.inventory.models import Device
 
 
@@ -53,7 +53,7 @@ class SwissArmyKnifeService(Service):
         runtime = payload["runtime"].replace(".", "").replace(":", "")
         filename = f"logs-{name}-{runtime}.txt"
         with open(filename, "w") as file:
-            file.write(str_dict(payload["logs"][payload["runtime"]]))
+            file.write(str_dict(payload["logs"]))
         with open(filename, "r") as file:
             message.attach(filename, "text/plain", file.read())
         remove(filename)
@@ -85,13 +85,15 @@ class SwissArmyKnifeService(Service):
         parameters = get_one("Parameters")
         protocol = parameters.cluster_scan_protocol
         for instance in fetch_all("Instance"):
-            factory(
-                "Instance",
-                **get(
+            try:
+                heartbeat = get(
                     f"{protocol}://{instance.ip_address}/rest/is_alive",
                     timeout=parameters.cluster_scan_timeout,
-                ).json(),
-            )
+                ).json()
+                instance.status, instance.cpu_load = "Up", heartbeat["cpu_load"]
+            except Exception:
+                instance.status = "down"
+        db.session.commit()
         return {"success": True}
 
     def poller_service(self, payload: dict) -> dict:
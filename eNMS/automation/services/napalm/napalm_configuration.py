@@ -28,12 +28,10 @@ class NapalmConfigurationService(Service):
     __mapper_args__ = {"polymorphic_identity": "NapalmConfigurationService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver = self.napalm_connection(device)
-        napalm_driver.open()
         config = "\n".join(self.sub(self.content, locals()).splitlines())
-        getattr(napalm_driver, self.action)(config=config)
-        napalm_driver.commit_config()
-        napalm_driver.close()
+        with self.napalm_connection(device) as napalm_driver:
+            getattr(napalm_driver, self.action)(config=config)
+            napalm_driver.commit_config()
         return {"success": True, "result": f"Config push ({config})"}
 
 
@@ -57,20 +57,19 @@ class NapalmGettersService(Service):
     __mapper_args__ = {"polymorphic_identity": "NapalmGettersService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver, result = self.napalm_connection(device), {}
-        napalm_driver.open()
-        for getter in self.getters:
-            try:
-                result[getter] = getattr(napalm_driver, getter)()
-            except Exception as e:
-                result[getter] = f"{getter} failed because of {e}"
+        result = {}
+        with self.napalm_connection(device) as napalm_driver:
+            for getter in self.getters:
+                try:
+                    result[getter] = getattr(napalm_driver, getter)()
+                except Exception as e:
+                    result[getter] = f"{getter} failed because of {e}"
         if self.validation_method == "text":
             success = self.match_content(
                 str(result), self.sub(self.content_match, locals())
             )
         else:
             success = self.match_dictionnary(result)
-        napalm_driver.close()
         return {
             "negative_logic": self.negative_logic,
             "result": result,
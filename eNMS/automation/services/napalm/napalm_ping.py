@@ -27,18 +27,16 @@ class NapalmPingService(Service):
     __mapper_args__ = {"polymorphic_identity": "NapalmPingService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver = self.napalm_connection(device)
-        napalm_driver.open()
-        ping = napalm_driver.ping(
-            device.ip_address,
-            source=self.source_ip,
-            vrf=self.vrf,
-            ttl=self.ttl or 255,
-            timeout=self.timeout or 2,
-            size=self.size or 100,
-            count=self.count or 5,
-        )
-        napalm_driver.close()
+        with self.napalm_connection(device) as napalm_driver:
+            ping = napalm_driver.ping(
+                device.ip_address,
+                source=self.source_ip,
+                vrf=self.vrf,
+                ttl=self.ttl or 255,
+                timeout=self.timeout or 2,
+                size=self.size or 100,
+                count=self.count or 5,
+            )
         return {"success": "success" in ping, "result": ping}
 
 
@@ -21,10 +21,8 @@ class NapalmRollbackService(Service):
     __mapper_args__ = {"polymorphic_identity": "NapalmRollbackService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver = self.napalm_connection(device)
-        napalm_driver.open()
-        napalm_driver.rollback()
-        napalm_driver.close()
+        with self.napalm_connection(device) as napalm_driver:
+            napalm_driver.rollback()
         return {"success": True, "result": "Rollback successful"}
 
 
@@ -25,16 +25,14 @@ class NapalmTracerouteService(Service):
     __mapper_args__ = {"polymorphic_identity": "NapalmTracerouteService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        napalm_driver = self.napalm_connection(device)
-        napalm_driver.open()
-        traceroute = napalm_driver.traceroute(
-            device.ip_address,
-            source=self.source,
-            vrf=self.vrf,
-            ttl=self.ttl or 255,
-            timeout=self.timeout or 2,
-        )
-        napalm_driver.close()
+        with self.napalm_connection(device) as napalm_driver:
+            traceroute = napalm_driver.traceroute(
+                device.ip_address,
+                source=self.source,
+                vrf=self.vrf,
+                ttl=self.ttl or 255,
+                timeout=self.timeout or 2,
+            )
         return {"success": "success" in traceroute, "result": traceroute}
 
 
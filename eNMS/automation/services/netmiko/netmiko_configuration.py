@@ -25,12 +25,11 @@ class NetmikoConfigurationService(Service):
     __mapper_args__ = {"polymorphic_identity": "NetmikoConfigurationService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        netmiko_handler = self.netmiko_connection(device)
-        if self.enable_mode:
-            netmiko_handler.enable()
         config = self.sub(self.content, locals())
-        netmiko_handler.send_config_set(config.splitlines())
-        netmiko_handler.disconnect()
+        with self.netmiko_connection(device) as netmiko_handler:
+            if self.enable_mode:
+                netmiko_handler.enable()
+            netmiko_handler.send_config_set(config.splitlines())
         return {"success": True, "result": f"configuration OK {config}"}
 
 
@@ -31,18 +31,17 @@ class NetmikoFileTransferService(Service):
     __mapper_args__ = {"polymorphic_identity": "NetmikoFileTransferService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        netmiko_handler = self.netmiko_connection(device)
-        transfer_dict = file_transfer(
-            netmiko_handler,
-            source_file=self.source_file,
-            dest_file=self.dest_file,
-            file_system=self.file_system,
-            direction=self.direction,
-            overwrite_file=self.overwrite_file,
-            disable_md5=self.disable_md5,
-            inline_transfer=self.inline_transfer,
-        )
-        netmiko_handler.disconnect()
+        with self.netmiko_connection(device) as netmiko_handler:
+            transfer_dict = file_transfer(
+                netmiko_handler,
+                source_file=self.source_file,
+                dest_file=self.dest_file,
+                file_system=self.file_system,
+                direction=self.direction,
+                overwrite_file=self.overwrite_file,
+                disable_md5=self.disable_md5,
+                inline_transfer=self.inline_transfer,
+            )
         return {"success": True, "result": transfer_dict}
 
 
@@ -35,23 +35,22 @@ class NetmikoPromptsService(Service):
     __mapper_args__ = {"polymorphic_identity": "NetmikoPromptsService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        netmiko_handler = self.netmiko_connection(device)
         command = self.sub(self.command, locals())
-        result = netmiko_handler.send_command_timing(command, delay_factor=2)
-        if self.response1 and self.confirmation1 in result:
-            result = netmiko_handler.send_command_timing(
-                self.response1, delay_factor=self.delay_factor
-            )
-            if self.response2 and self.confirmation2 in result:
+        with self.netmiko_connection(device) as netmiko_handler:
+            result = netmiko_handler.send_command_timing(command, delay_factor=2)
+            if self.response1 and self.confirmation1 in result:
                 result = netmiko_handler.send_command_timing(
-                    self.response2, delay_factor=self.delay_factor
+                    self.response1, delay_factor=self.delay_factor
                 )
-                if self.response3 and self.confirmation3 in result:
+                if self.response2 and self.confirmation2 in result:
                     result = netmiko_handler.send_command_timing(
-                        self.response3, delay_factor=self.delay_factor
+                        self.response2, delay_factor=self.delay_factor
                     )
+                    if self.response3 and self.confirmation3 in result:
+                        result = netmiko_handler.send_command_timing(
+                            self.response3, delay_factor=self.delay_factor
+                        )
         match = self.sub(self.content_match, locals())
-        netmiko_handler.disconnect()
         return {
             "expected": match,
             "negative_logic": self.negative_logic,
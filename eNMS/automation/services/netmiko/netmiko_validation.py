@@ -28,11 +28,10 @@ class NetmikoValidationService(Service):
     __mapper_args__ = {"polymorphic_identity": "NetmikoValidationService"}
 
     def job(self, payload: dict, device: Device) -> dict:
-        netmiko_handler = self.netmiko_connection(device)
         command = self.sub(self.command, locals())
-        result = netmiko_handler.send_command(command)
+        with self.netmiko_connection(device) as netmiko_handler:
+            result = netmiko_handler.send_command(command)
         match = self.sub(self.content_match, locals())
-        netmiko_handler.disconnect()
         return {
             "expected": match,
             "negative_logic": self.negative_logic,
@@ -9,11 +9,50 @@ getWorkflowState: false
 
 let jobId;
 let refresh;
+let logEvents;
 
 $('#logs-modal').on('hidden.bs.modal', function() {
   refresh = false;
+  if (logEvents) {
+    logEvents.close();
+  }
 });
 
+/**
+ * Stream the live state of a job.
+ * @param {id} id - Job id.
+ * @param {callback} callback - Called with the live state of the job and
+ * the type of event every time the server pushes an event.
+ * @return {EventSource}.
+ */
+function streamJobEvents(id, callback) {
+  const source = new EventSource(`/automation/job_events/${id}`);
+  let liveState = {status: 'Idle', state: {}};
+  const handlers = {
+    state: (data) => {
+      liveState = data;
+    },
+    status: (data) => {
+      liveState = {status: data.status, state: {}};
+    },
+    update: (data) => {
+      liveState.state[data.key] = data.value;
+    },
+    record: (data) => {
+      liveState.state[data.key] = liveState.state[data.key] || {};
+      liveState.state[data.key][data.entry] = data.value;
+    },
+    results: () => {},
+  };
+  $.each(handlers, (event, handler) => {
+    source.addEventListener(event, (message) => {
+      handler(JSON.parse(message.data));
+      callback(liveState, event);
+    });
+  });
+  return source;
+}
+
 /**
  * Open smart wizard.
  * @param {type} type - Service or Workflow.
@@ -34,17 +73,15 @@ function openWizard(type) { // eslint-disable-line no-unused-vars
 function displayLogs() { // eslint-disable-line no-unused-vars
   call(`/automation/get_logs/${jobId}`, (logs) => {
     $('#display,#compare_with').empty();
-    const times = Object.keys(logs);
-    times.forEach((option) => {
+    logs.runtimes.forEach((option) => {
       $('#display,#compare_with').append(
         $('<option></option>').attr('value', option).text(option)
       );
     });
-    $('#display,#compare_with').val(times[times.length - 1]);
-    const firstLogs = logs[$('#display').val()];
-    if (firstLogs) {
+    $('#display,#compare_with').val(logs.runtimes[0]);
+    if (logs.result) {
       $('#logs').text(
-        JSON.stringify(firstLogs, null, 2).replace(
+        JSON.stringify(logs.result, null, 2).replace(
           /(?:\\[rn]|[\r\n]+)+/g, '\n'
         )
       );
@@ -60,12 +97,18 @@ function refreshLogs(firstTime=false) { // eslint-disable-line no-unused-vars
   if (firstTime) {
     refresh = !refresh;
     $('#refresh-logs-button').text(
-      refresh ? 'Stop periodic Refresh' : 'Trigger periodic Refresh'
+      refresh ? 'Stop automatic Refresh' : 'Trigger automatic Refresh'
     );
   }
   if (refresh) {
     displayLogs();
-    setTimeout(refreshLogs, 5000);
+    logEvents = streamJobEvents(jobId, (liveState, event) => {
+      if (event == 'results') {
+        displayLogs();
+      }
+    });
+  } else if (logEvents) {
+    logEvents.close();
   }
 }
 
@@ -105,8 +148,7 @@ function detachWindow() { // eslint-disable-line no-unused-vars
 }
 
 $('#display').on('change', function() {
-  call(`/automation/get_logs/${jobId}`, (logs) => {
-    const log = logs[$('#display').val()];
+  call(`/automation/get_result/${jobId}/${$('#display').val()}`, (log) => {
     $('#logs').text(
       JSON.stringify(log, null, 2).replace(/(?:\\[rnt])+/g, '\n')
     );
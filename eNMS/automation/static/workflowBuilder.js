@@ -12,6 +12,7 @@ runJob: false
 showLogs: false
 showModal: false
 showTypeModal: false
+streamJobEvents: false
 vis: false
 workflow: true
 */
@@ -20,6 +21,7 @@ workflow: true
   doc('https://enms.readthedocs.io/en/latest/workflows/index.html');
   convertSelect('#add_jobs', '#workflow-devices', '#workflow-pools');
   getWorkflowState();
+  setInterval(getWorkflowState, 15000);
 })();
 
 const workflowBuilder = true; // eslint-disable-line no-unused-vars
@@ -57,6 +59,8 @@ let graph;
 let selectedNode;
 let edgeType;
 let lastModified;
+let workflowEvents;
+let workflowState;
 
 /**
  * Display a workflow.
@@ -114,6 +118,7 @@ function switchToWorkflow(workflowId) {
   call(`/get/workflow/${workflowId}`, function(result) {
     workflow = result;
     graph = displayWorkflow(result);
+    getWorkflowState();
     alertify.notify(`Workflow '${workflow.name}' displayed.`, 'success', 5);
   });
 }
@@ -360,16 +365,20 @@ function colorJob(id, color) {
  * @param {id} id - Job Id.
  */
 function getJobState(id) { // eslint-disable-line no-unused-vars
-  call(`/get/service/${id}`, function(service) {
-    if (service.status == 'Running') {
+  let running = false;
+  const jobEvents = streamJobEvents(id, (liveState, event) => {
+    if (liveState.status == 'Running') {
+      running = true;
       colorJob(id, '#89CFF0');
       $('#status').text('Status: Running.');
-      $('#current-job').text(`Current job: ${service.name}.`);
-      setTimeout(partial(getJobState, id), 1500);
+      $('#current-job').text(`Current job: ${nodes.get(id).label}.`);
     } else {
       $('#status').text('Status: Idle.');
       $('#current-job').empty();
       colorJob(id, '#D2E5FF');
+      if (running || event == 'results') {
+        jobEvents.close();
+      }
     }
   });
 }
@@ -379,41 +388,81 @@ function getJobState(id) { // eslint-disable-line no-unused-vars
  */
 function getWorkflowState() {
   if (workflow && workflow.id) {
-    call(`/get/workflow/${workflow.id}`, function(wf) {
+    call(`/automation/get_workflow_state/${workflow.id}`, function(wf) {
       if (wf.last_modified !== lastModified) {
-        displayWorkflow(wf);
-      }
-      $('#status').text(`Status: ${wf.status}.`);
-      if (wf.id == workflow.id) {
-        if (Object.keys(wf.state).length !== 0) {
-          if (wf.state.current_device) {
-            $('#current-device').text(
-              `Current device: ${wf.state.current_device}.`
-            );
-          }
-          if (wf.state.current_job) {
-            colorJob(wf.state.current_job.id, '#89CFF0');
-            $('#current-job').text(
-              `Current job: ${wf.state.current_job.name}.`
-            );
-          } else {
-            $('#current-device,#current-job').empty();
-          }
-          if (wf.state.jobs) {
-            $.each(wf.state.jobs, (id, success) => {
-              colorJob(id, success ? '#32cd32' : '#FF6666');
-            });
-          }
-        } else {
-          $('#current-device,#current-job').empty();
-          wf.jobs.forEach((job) => colorJob(job.id, '#D2E5FF'));
-        }
-        setTimeout(getWorkflowState, wf.status == 'Running' ? 700 : 15000);
+        call(`/get/workflow/${wf.id}`, function(result) {
+          workflow = result;
+          displayWorkflow(result);
+          streamWorkflowState(wf);
+        });
+      } else {
+        streamWorkflowState(wf);
       }
     });
   }
 }
 
+/**
+ * Display the state of a workflow, and keep it updated with the events
+ * pushed by the server while the workflow is displayed.
+ * @param {wf} wf - Workflow state.
+ */
+function streamWorkflowState(wf) {
+  workflowState = wf;
+  displayWorkflowState(wf);
+  if (workflowEvents) {
+    if (workflowEvents.workflowId == wf.id) {
+      return;
+    }
+    workflowEvents.close();
+  }
+  workflowEvents = streamJobEvents(wf.id, (liveState) => {
+    if (workflowState.id == wf.id) {
+      Object.assign(workflowState, liveState);
+      displayWorkflowState(workflowState);
+    }
+  });
+  workflowEvents.workflowId = wf.id;
+}
+
+/**
+ * Display Workflow State.
+ * @param {wf} wf - Workflow state.
+ */
+function displayWorkflowState(wf) {
+  let status = `Status: ${wf.status}.`;
+  if (!wf.end_reachable) {
+    status += ' The End job cannot be reached from the Start job.';
+  }
+  $('#status').text(status);
+  if (wf.id == workflow.id) {
+    if (Object.keys(wf.state).length !== 0) {
+      if (wf.state.current_device) {
+        $('#current-device').text(
+          `Current device: ${wf.state.current_device}.`
+        );
+      }
+      if (wf.state.current_job) {
+        colorJob(wf.state.current_job.id, '#89CFF0');
+        $('#current-job').text(
+          `Current job: ${wf.state.current_job.name}.`
+        );
+      } else {
+        $('#current-device,#current-job').empty();
+      }
+      if (wf.state.jobs) {
+        $.each(wf.state.jobs, (id, success) => {
+          colorJob(id, success ? '#32cd32' : '#FF6666');
+        });
+      }
+    } else {
+      $('#current-device,#current-job').empty();
+      wf.jobs.forEach((id) => colorJob(id, '#D2E5FF'));
+      wf.unreachable.forEach((id) => colorJob(id, '#D3D3D3'));
+    }
+  }
+}
+
 $(window).bind('beforeunload', function() {
   savePositions();
 });
@@ -1,26 +1,94 @@
-from flask import abort, Blueprint, jsonify, request, render_template
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import (
+    abort,
+    Blueprint,
+    has_app_context,
+    jsonify,
+    request,
+    render_template,
+)
 from flask.wrappers import Response
 from flask_login import current_user, login_required
 from functools import wraps
+from itertools import islice
 from logging import info
-from sqlalchemy import exc
+from multiprocessing.pool import ThreadPool
+from sqlalchemy import (
+    Column,
+    event,
+    exc,
+    Float,
+    func,
+    Index,
+    Integer,
+    or_,
+    select,
+    String,
+    Text,
+)
+from sqlalchemy.orm import selectinload, Session
 from string import punctuation
-from typing import Any, Callable, List, Optional, Tuple
+from threading import local, Lock
+from time import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from eNMS.main import db
+from eNMS.main import db, vault_client
 from eNMS.base.classes import classes
-from eNMS.base.properties import pretty_names, property_types
+from eNMS.base.properties import (
+    pretty_names,
+    property_types,
+    relationships,
+    table_properties,
+)
 
 
 def add_classes(*models: db.Model) -> None:
     for model in models:
         classes.update({model.__tablename__: model, model.__tablename__.lower(): model})
+        add_table_indexes(model)
+
+
+# indexes on the columns displayed in the tables of the web UI
+table_indexes: List[Index] = []
+
+
+def add_table_indexes(model: db.Model) -> None:
+    table = model.__tablename__.lower()
+    if table == "pool":
+        return
+    for property in table_properties.get(table, []):
+        column = model.__mapper__.columns.get(property)
+        if (
+            not isinstance(column, Column)
+            or not isinstance(column.type, (Float, Integer, String))
+            or isinstance(column.type, Text)
+            or column.primary_key
+            or column.index
+            or column.unique
+        ):
+            continue
+        if any(index.columns.contains_column(column) for index in column.table.indexes):
+            continue
+        table_indexes.append(Index(f"ix_{column.table.name}_{column.name}", column))
+
+
+def create_table_indexes() -> None:
+    # create_all only creates the indexes of the tables that do not exist yet
+    for index in table_indexes:
+        index.create(db.engine, checkfirst=True)
 
 
 def fetch(model: str, **kwargs: Any) -> db.Model:
     return db.session.query(classes[model]).filter_by(**kwargs).first()
 
 
+def fetch_by_id(model: str, id: Any) -> Optional[db.Model]:
+    # Query.get looks up the session first: no query is sent to the database
+    # for the objects that are already loaded.
+    return db.session.query(classes[model]).get(id) if id else None
+
+
 def fetch_all(model: str) -> List[db.Model]:
     return classes[model].query.all()
 
@@ -29,8 +97,55 @@ def fetch_all_visible(model: str) -> List[db.Model]:
     return [instance for instance in classes[model].query.all() if instance.visible]
 
 
+def count(model: str, **kwargs: Any) -> int:
+    def compute() -> int:
+        query = db.session.query(func.count()).select_from(classes[model])
+        return query.filter_by(**kwargs).scalar()
+
+    return counters.get(("count", model, *sorted(kwargs.items())), compute)
+
+
+def count_visible() -> Dict[str, int]:
+    def compute() -> Dict[str, int]:
+        # one GROUP BY query per class hierarchy (e.g. all services at once)
+        counts: Dict[Any, Counter] = {}
+        for mapper in {model.__mapper__.base_mapper for model in classes.values()}:
+            model, discriminator = mapper.class_, mapper.polymorphic_on
+            query = db.session.query(func.count()).select_from(model)
+            if hasattr(model, "hidden"):
+                query = query.filter(model.hidden.isnot(True))
+            if discriminator is None:
+                counts[mapper] = Counter({None: query.scalar()})
+            else:
+                rows = query.add_columns(discriminator).group_by(discriminator)
+                counts[mapper] = Counter({type: number for number, type in rows})
+        return {
+            name: sum(
+                counts[model.__mapper__.base_mapper][mapper.polymorphic_identity]
+                for mapper in model.__mapper__.self_and_descendants
+            )
+            for name, model in classes.items()
+        }
+
+    return counters.get(("count_visible",), compute)
+
+
+def count_by(model: str, property: str) -> Counter:
+    def compute() -> Counter:
+        cls = classes[model]
+        if property not in cls.__mapper__.columns:
+            return Counter(str(getattr(obj, property)) for obj in cls.query.all())
+        column, result = getattr(cls, property), Counter()
+        query = db.session.query(column, func.count()).select_from(cls)
+        for value, number in query.group_by(column):
+            result[str(value)] += number
+        return result
+
+    return counters.get(("count_by", model, property), compute)
+
+
 def objectify(model: str, object_list: List[int]) -> List[db.Model]:
-    return [fetch(model, id=object_id) for object_id in object_list]
+    return [fetch_by_id(model, object_id) for object_id in object_list]
 
 
 def delete(model: str, **kwargs: Any) -> dict:
@@ -50,8 +165,8 @@ def delete_all(*models: str) -> None:
     db.session.commit()
 
 
-def serialize(model: str) -> List[dict]:
-    return classes[model].serialize()
+def serialize(model: str, relation_ids: bool = False) -> List[dict]:
+    return classes[model].serialize(relation_ids)
 
 
 def choices(model: str) -> List[Tuple[int, str]]:
@@ -66,6 +181,28 @@ def get_one(model: str) -> db.Model:
     return classes[model].query.one()
 
 
+# objects created or updated within a pool_batch block are matched against
+# the pools when the block exits, with the pools loaded once for all of them
+pool_batches = local()
+
+
+@contextmanager
+def pool_batch() -> Iterator[None]:
+    pool_batches.objects = objects = []
+    try:
+        yield
+    finally:
+        del pool_batches.objects
+    objects = [obj for obj in objects if obj in db.session]
+    if objects:
+        # the parameters may not exist yet, e.g. during a migration import
+        parameters = classes["Parameters"].query.first()
+        pools = fetch_all("Pool")
+        pool_filter = parameters and fetch("Pool", name=parameters.pool_filter)
+        for obj in objects:
+            obj.compute_pools(pools, pool_filter)
+
+
 def factory(cls_name: str, **kwargs: Any) -> db.Model:
     if "id" in kwargs:
         if kwargs["id"]:
@@ -83,6 +220,123 @@ def factory(cls_name: str, **kwargs: Any) -> db.Model:
     return instance
 
 
+def reference(serial: Dict[str, str], property: str) -> Optional[Tuple[str, str, bool]]:
+    # (related model, property to update, whether it is a list of objects)
+    if property in serial:
+        return serial[property], property, False
+    elif property.endswith("_name") and property[:-5] in serial:
+        return serial[property[:-5]], property[:-5], False
+    elif property[:-1] in serial:
+        return serial[property[:-1]], property, True
+    return None
+
+
+def resolve_references(
+    cls_name: str, items: List[dict]
+) -> Tuple[List[dict], List[db.Model]]:
+    serial = relationships.get(cls_name, relationships["Service"])
+    requested: Dict[str, set] = defaultdict(set)
+    for item in items:
+        for property, value in item.items():
+            related = reference(serial, property)
+            if related and value not in (None, ""):
+                requested[related[0]].update(value if related[2] else [value])
+    # the related objects are loaded with one query per model, and kept in the
+    # session (hence the list) so that the coercers find them without a query
+    loaded, ids = [], {}
+    for model, values in requested.items():
+        cls, names = classes[model], {value for value in values if type(value) == str}
+        criteria = [cls.name.in_(names)] if names else []
+        if values - names:
+            criteria.append(cls.id.in_(values - names))
+        for obj in cls.query.filter(or_(*criteria)):
+            loaded.append(obj)
+            ids[(model, obj.id)] = ids[(model, obj.name)] = obj.id
+    resolved_items = []
+    for item in items:
+        resolved = {}
+        for property, value in item.items():
+            related = reference(serial, property)
+            if not related or value in (None, ""):
+                resolved[property] = value
+                continue
+            model, related_property, many = related
+            for object_id in value if many else [value]:
+                if (model, object_id) not in ids:
+                    raise ValueError(f"Unknown {model}: {object_id}")
+            resolved[related_property] = (
+                [ids[(model, object_id)] for object_id in value]
+                if many
+                else ids[(model, value)]
+            )
+        resolved_items.append(resolved)
+    return resolved_items, loaded
+
+
+def upsert_instances(cls_name: str, items: List[dict]) -> List[dict]:
+    model = classes[cls_name]
+    items, loaded = resolve_references(cls_name, items)
+    names = {item.get("name") for item in items}
+    query = model.query.filter(model.name.in_(names))
+    if issubclass(model, classes["Object"]) and hasattr(model, "pools"):
+        # the pools of the objects are matched once for the whole batch
+        query = query.options(selectinload(model.pools))
+    existing = {obj.name: obj for obj in query}
+    instances = []
+    with pool_batch():
+        for item in items:
+            if not item.get("name"):
+                raise ValueError("no name")
+            instance = existing.get(item["name"])
+            if instance:
+                instance.update(**item)
+                instances.append((instance, "updated"))
+            else:
+                instance = existing[item["name"]] = model(**item)
+                db.session.add(instance)
+                instances.append((instance, "created"))
+    db.session.commit()
+    return [
+        {"name": instance.name, "id": instance.id, "status": status}
+        for instance, status in instances
+    ]
+
+
+def delete_instances(cls_name: str, names: List[str]) -> List[dict]:
+    model = classes[cls_name]
+    instances = {obj.name: obj for obj in model.query.filter(model.name.in_(names))}
+    for instance in instances.values():
+        if instance.type == "Task":
+            instance.delete_task()
+        db.session.delete(instance)
+    db.session.commit()
+    return [
+        {"name": name, "status": "deleted" if name in instances else "not found"}
+        for name in names
+    ]
+
+
+def batch_write(
+    function: Callable, cls_name: str, items: Iterable, batch_size: int
+) -> List[dict]:
+    results, items = [], iter(items)
+    for batch in iter(lambda: list(islice(items, batch_size)), []):
+        try:
+            results.extend(function(cls_name, batch))
+        except Exception:
+            db.session.rollback()
+            # an object made the transaction fail: the objects of the batch
+            # are written one by one to find out which one.
+            for item in batch:
+                try:
+                    results.extend(function(cls_name, [item]))
+                except Exception as e:
+                    db.session.rollback()
+                    name = item.get("name") if isinstance(item, dict) else item
+                    results.append({"name": name, "status": "error", "error": str(e)})
+    return results
+
+
 def integrity_rollback(function: Callable) -> Callable:
     def wrapper(*a: Any, **kw: Any) -> None:
         try:
@@ -211,3 +465,142 @@ def str_dict(input: Any, depth: int = 0) -> str:
 
 def strip_all(input: str) -> str:
     return input.translate(str.maketrans("", "", f"{punctuation} "))
+
+
+class SecretCache:
+    def __init__(
+        self,
+        ttl: float = 300,
+        prefetch_threads: int = 10,
+        synchronization_interval: float = 1,
+    ) -> None:
+        self.ttl = ttl
+        self.prefetch_threads = prefetch_threads
+        self.synchronization_interval = synchronization_interval
+        self.lock = Lock()
+        # Vault path -> (secret, expiration time)
+        self.secrets: Dict[str, Tuple[Any, float]] = {}
+        # version of the secrets in the database when they were cached
+        self.version: Optional[int] = None
+        self.last_synchronization = 0.0
+
+    def get(self, path: str) -> Optional[Any]:
+        with self.lock:
+            secret, expiration = self.secrets.get(path, (None, 0))
+            if expiration < time():
+                self.secrets.pop(path, None)
+                return None
+            return secret
+
+    def store(self, path: str, secret: Any) -> None:
+        if not self.ttl:
+            return
+        with self.lock:
+            self.secrets[path] = (secret, time() + self.ttl)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self.lock:
+            if path:
+                self.secrets.pop(path, None)
+            else:
+                self.secrets.clear()
+
+    def synchronize(self) -> None:
+        # secrets can be written to the Vault by another process: the cache is
+        # cleared when the version stored in the database has changed
+        parameters = classes["Parameters"].__table__
+        version = db.session.execute(select([parameters.c.secrets_version])).scalar()
+        with self.lock:
+            self.last_synchronization = time()
+            if version != self.version:
+                self.secrets.clear()
+                self.version = version
+
+    @staticmethod
+    def increment_version() -> None:
+        # committed along with the object whose secret was written
+        parameters = classes["Parameters"].__table__
+        version = parameters.c.secrets_version
+        db.session.execute(
+            parameters.update().values(secrets_version=func.coalesce(version, 0) + 1)
+        )
+
+    def read(self, path: str, cached: bool = True) -> Any:
+        if (
+            cached
+            and has_app_context()
+            and time() - self.last_synchronization > self.synchronization_interval
+        ):
+            self.synchronize()
+        secret = self.get(path) if cached else None
+        if secret is None:
+            data = vault_client.read(path)
+            secret = data["data"]["data"][path.rsplit("/", 1)[1]] if data else ""
+            if cached:
+                self.store(path, secret)
+        return secret
+
+    def write(self, path: str, secret: Any, cached: bool = True) -> None:
+        self.invalidate(path)
+        vault_client.write(path, data={path.rsplit("/", 1)[1]: secret})
+        self.increment_version()
+        if cached:
+            self.store(path, secret)
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        # each secret is stored at its own path in the Vault, which has no
+        # bulk read: the missing secrets are read with one request each, in
+        # parallel, so that the run does not wait for them one by one
+        self.synchronize()
+        missing = [path for path in set(paths) if self.get(path) is None]
+        if not self.ttl or not missing:
+            return
+        pool = ThreadPool(processes=min(len(missing), self.prefetch_threads))
+        pool.map(self.try_read, missing)
+        pool.close()
+        pool.join()
+
+    def try_read(self, path: str) -> None:
+        try:
+            self.read(path)
+        except Exception as e:
+            info(f"Vault prefetch failed for {path} ({str(e)})")
+
+
+secret_cache = SecretCache()
+
+
+class CounterCache:
+    def __init__(self, ttl: float = 5) -> None:
+        self.ttl = ttl
+        self.lock = Lock()
+        # the generation is incremented whenever the cache is invalidated, so
+        # that a value computed before a write is not stored after it
+        self.generation = 0
+        # key -> (value, expiration time)
+        self.values: Dict[tuple, Tuple[Any, float]] = {}
+
+    def get(self, key: tuple, compute: Callable) -> Any:
+        with self.lock:
+            value, expiration = self.values.get(key, (None, 0))
+            generation = self.generation
+        if expiration >= time():
+            return value
+        value = compute()
+        with self.lock:
+            if self.ttl and generation == self.generation:
+                self.values[key] = (value, time() + self.ttl)
+        return value
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.values.clear()
+
+
+counters = CounterCache()
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_counters(session: Session) -> None:
+    counters.invalidate()
@@ -1,9 +1,11 @@
 from wtforms import SelectField, SelectMultipleField
 from json import dumps, loads
-from typing import Any, List, Tuple
+from sqlalchemy import Boolean, Float, Integer, String
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Any, Callable, Dict, List, Tuple
 
-from eNMS.main import db, USE_VAULT, vault_client
-from eNMS.base.helpers import fetch, objectify, choices
+from eNMS.main import db, USE_VAULT
+from eNMS.base.helpers import fetch_by_id, objectify, choices, secret_cache
 from eNMS.base.properties import (
     cls_to_properties,
     dont_migrate,
@@ -13,10 +15,23 @@ from eNMS.base.properties import (
     private_properties,
 )
 
+# The serializers (per model) and coercers (per model and property) are
+# compiled on first use rather than when the models are registered, as the
+# property definitions are extended afterwards (custom properties, services).
+serializers: Dict[type, Callable] = {}
+coercers: Dict[Tuple[type, str, bool], Callable] = {}
+json_types = (Boolean, Float, Integer, String)
+
+# The loader options (per model) used to fetch all the relationships that are
+# serialized alongside the objects in a constant number of queries.
+loaders: Dict[type, list] = {}
+
 
 class Base(db.Model):
 
     __abstract__ = True
+    # whether the private properties read from the Vault are cached
+    cache_secrets = True
 
     def __init__(self, **kwargs: Any) -> None:
         self.update(**kwargs)
@@ -29,9 +44,7 @@ class Base(db.Model):
 
     def __getattribute__(self, property: str) -> Any:
         if property in private_properties and USE_VAULT:
-            path = f"secret/data/{self.__tablename__}/{self.name}/{property}"
-            data = vault_client.read(path)
-            return data["data"]["data"][property] if data else ""
+            return secret_cache.read(self.secret_path(property), self.cache_secrets)
         else:
             return super().__getattribute__(property)
 
@@ -39,49 +52,106 @@ class Base(db.Model):
         if property in private_properties and USE_VAULT:
             if not value:
                 return
-            vault_client.write(
-                f"secret/data/{self.__tablename__}/{self.name}/{property}",
-                data={property: value},
-            )
+            secret_cache.write(self.secret_path(property), value, self.cache_secrets)
         else:
             super().__setattr__(property, value)
 
+    def secret_path(self, property: str) -> str:
+        return f"secret/data/{self.__tablename__}/{self.name}/{property}"
+
     def update(self, **kwargs: Any) -> None:
-        serial = rel.get(self.__tablename__, rel["Service"])
         for property, value in kwargs.items():
-            property_type = property_types.get(property, None)
-            if property in serial:
-                value = fetch(serial[property], id=value)
-            elif property[:-1] in serial:
-                value = objectify(serial[property[:-1]], value)
-            elif property in boolean_properties:
-                value = kwargs[property] not in (None, False)
-            elif "regex" in property:
-                value = property in kwargs
-            elif property_type == "dict" and type(value) == str:
-                value = loads(value) if value else {}
-            elif property_type in ["float", "int"]:
-                default_value = getattr(self.__table__.c, property).default
-                if default_value and not value:
-                    value = default_value.arg
-                value = {"float": float, "int": int}[property_type](value or 0)
-            setattr(self, property, value)
+            setattr(self, property, self.coercer(property, relationships=True)(value))
+
+    @classmethod
+    def coerce(cls, property: str, value: Any) -> Any:
+        return cls.coercer(property)(value)
+
+    @classmethod
+    def coercer(cls, property: str, relationships: bool = False) -> Callable:
+        key = (cls, property, relationships)
+        if key not in coercers:
+            coercers[key] = cls.compile_coercer(property, relationships)
+        return coercers[key]
+
+    @classmethod
+    def compile_coercer(cls, property: str, relationships: bool) -> Callable:
+        serial = rel.get(cls.__tablename__, rel["Service"])
+        property_type = property_types.get(property, None)
+        if relationships and property in serial:
+            model = serial[property]
+            return lambda value: fetch_by_id(model, value)
+        elif relationships and property[:-1] in serial:
+            model = serial[property[:-1]]
+            return lambda value: objectify(model, value)
+        elif property in boolean_properties:
+            return lambda value: value not in (None, False)
+        elif "regex" in property:
+            return lambda value: True
+        elif property_type == "dict":
+            return lambda value: (
+                (loads(value) if value else {}) if type(value) == str else value
+            )
+        elif property_type in ["float", "int"]:
+            cast = {"float": float, "int": int}[property_type]
+            column = cls.__table__.c.get(property)
+            default = column.default if column is not None else None
+            if default:
+                return lambda value: cast((value or default.arg) or 0)
+            return lambda value: cast(value or 0)
+        return lambda value: value
 
     def get_properties(self, export: bool = False) -> dict:
-        result = {}
+        if type(self) not in serializers:
+            serializers[type(self)] = self.compile_serializer()
+        return serializers[type(self)](self)
+
+    def compile_serializer(self) -> Callable:
+        columns = self.__mapper__.columns
+        native, other = [], []
         for property in cls_to_properties[self.type]:
             if property in private_properties:
                 continue
-            try:
-                dumps(getattr(self, property))
-                result[property] = getattr(self, property)
-            except TypeError:
-                result[property] = str(getattr(self, property))
-        return result
-
-    def to_dict(self, export: bool = False) -> dict:
+            column = columns.get(property)
+            if column is not None and isinstance(column.type, json_types):
+                native.append(property)
+            else:
+                other.append(property)
+
+        def serialize(obj: Base) -> dict:
+            result = {property: getattr(obj, property) for property in native}
+            for property in other:
+                value = getattr(obj, property)
+                try:
+                    dumps(value)
+                except TypeError:
+                    value = str(value)
+                result[property] = value
+            return result
+
+        return serialize
+
+    @classmethod
+    def loader_options(cls) -> list:
+        if cls not in loaders:
+            loaders[cls] = cls.compile_loader_options()
+        return loaders[cls]
+
+    @classmethod
+    def compile_loader_options(cls) -> list:
+        relations, options = cls.__mapper__.relationships, []
+        for property in rel.get(cls.__tablename__, rel["Service"]):
+            for name in (property, f"{property}s"):
+                if name not in relations:
+                    continue
+                strategy = selectinload if relations[name].uselist else joinedload
+                options.append(strategy(getattr(cls, name)))
+        return options
+
+    def to_dict(self, export: bool = False, relation_ids: bool = False) -> dict:
         properties = self.get_properties(export)
         no_migrate = dont_migrate.get(self.type, dont_migrate["Service"])
+        relation_ids |= export
         for property in rel.get(self.type, rel["Service"]):
             if export and property in no_migrate:
                 continue
@@ -89,7 +159,7 @@ class Base(db.Model):
                 if hasattr(getattr(self, property), "get_properties"):
                     properties[property] = (
                         getattr(self, property).id
-                        if export
+                        if relation_ids
                         else getattr(self, property).get_properties()
                     )
             if hasattr(self, f"{property}s"):
@@ -97,7 +167,7 @@ class Base(db.Model):
                 # properties, but also the properties of its source and
                 # destination: we need the serialized edge.
                 properties[f"{property}s"] = [
-                    obj.id if export else obj.get_properties()
+                    obj.id if relation_ids else obj.get_properties()
                     for obj in getattr(self, f"{property}s")
                 ]
         if export:
@@ -113,17 +183,29 @@ class Base(db.Model):
     def visible(self) -> bool:
         return not (hasattr(self, "hidden") and self.hidden)
 
+    @classmethod
+    def prefetch(cls, objects: List["Base"]) -> None:
+        # hook to fetch the properties stored outside of the database (e.g the
+        # next run time of tasks) for all serialized objects at once
+        pass
+
     @classmethod
     def export(cls) -> List[dict]:
-        return [obj.to_dict(export=True) for obj in cls.query.all()]
+        objects = cls.query.options(*cls.loader_options()).all()
+        cls.prefetch(objects)
+        return [obj.to_dict(export=True) for obj in objects]
 
     @classmethod
     def choices(cls) -> List[Tuple[int, str]]:
         return [(obj.id, obj.name) for obj in cls.query.all() if obj.visible]
 
     @classmethod
-    def serialize(cls) -> List[dict]:
-        return [obj.serialized for obj in cls.query.all() if obj.visible]
+    def serialize(cls, relation_ids: bool = False) -> List[dict]:
+        objects = [
+            obj for obj in cls.query.options(*cls.loader_options()) if obj.visible
+        ]
+        cls.prefetch(objects)
+        return [obj.to_dict(relation_ids=relation_ids) for obj in objects]
 
 
 class ObjectField(SelectField):
@@ -163,6 +163,7 @@ job_public_properties: List[str] = base_properties + [
     "mail_recipient",
     "max_processes",
     "multiprocessing",
+    "execution_engine",
     "vendor",
     "operating_system",
     "type",
@@ -184,6 +185,7 @@ service_public_properties: List[str] = job_public_properties
 workflow_public_properties: List[str] = job_public_properties + [
     "last_modified",
     "use_workflow_targets",
+    "max_parallel_jobs",
 ]
 
 service_table_properties: List[str] = [
@@ -283,6 +285,19 @@ task_serialized_properties: List[str] = [
 
 task_table_properties: List[str] = task_serialized_properties[1:-2]
 
+job_run_properties: List[str] = [
+    "id",
+    "name",
+    "job_name",
+    "status",
+    "success",
+    "runtime",
+    "number_of_targets",
+    "creation_time",
+    "start_time",
+    "end_time",
+]
+
 cls_to_properties: Dict[str, List[str]] = {
     "Instance": instance_public_properties,
     "Device": device_public_properties,
@@ -296,6 +311,7 @@ cls_to_properties: Dict[str, List[str]] = {
     "Log": log_public_properties,
     "LogRule": log_rule_public_properties,
     "Task": task_serialized_properties,
+    "JobRun": job_run_properties,
 }
 
 table_properties: Dict[str, List[str]] = {
@@ -502,6 +518,7 @@ pretty_names: Dict[str, str] = {
     "enable_mode": 'Enter "Enable" mode',
     "enable_password": "Enable password",
     "end_date": "End date",
+    "execution_engine": "Execution engine",
     "fast_cli": "Fast CLI",
     "file": "File",
     "file_system": "File system",
@@ -519,6 +536,7 @@ pretty_names: Dict[str, str] = {
     "load_known_host_keys": "Load known host keys",
     "location": "Location",
     "look_for_keys": "Look for keys",
+    "max_parallel_jobs": "Maximum number of jobs running in parallel",
     "missing_host_key_policy": "Missing Host Key Policy",
     "model": "Model",
     "name": "Name",
@@ -669,7 +687,7 @@ export_properties: Dict[str, List[str]] = {
 
 dont_migrate: Dict[str, List[str]] = {
     "Device": ["jobs"],
-    "Service": ["logs", "state", "tasks", "workflows", "creator_name"],
+    "Service": ["results", "state", "tasks", "workflows", "creator_name"],
     "Task": [
         "job_name",
         "next_run_time",
@@ -677,5 +695,5 @@ dont_migrate: Dict[str, List[str]] = {
         "time_before_next_run",
         "status",
     ],
-    "Workflow": ["last_modified", "logs", "state", "status", "creator_name"],
+    "Workflow": ["last_modified", "results", "state", "status", "creator_name"],
 }
@@ -1,17 +1,39 @@
 from datetime import datetime
-from flask import current_app, Flask, jsonify, make_response, request
+from flask import (
+    current_app,
+    Flask,
+    jsonify,
+    make_response,
+    request,
+    stream_with_context,
+)
 from flask_restful import Api, Resource
 from flask.wrappers import Response
+from json import loads
 from logging import info
 from psutil import cpu_percent
-from uuid import getnode
-from typing import Union
+from uuid import getnode, uuid4
+from typing import Iterator, List, Union
 
-from eNMS.main import auth, scheduler
+from eNMS.main import auth, db, scheduler
 from eNMS.admin.helpers import migrate_export, migrate_import
-from eNMS.automation.helpers import scheduler_job
-from eNMS.base.helpers import delete, factory, fetch
-from eNMS.inventory.helpers import object_export, object_import
+from eNMS.automation.helpers import execute_run, fetch_targets, scheduler_job
+from eNMS.automation.models import JobRun
+from eNMS.base.helpers import (
+    batch_write,
+    delete,
+    delete_instances,
+    factory,
+    fetch,
+    serialize,
+    upsert_instances,
+)
+from eNMS.inventory.helpers import (
+    export_mimetypes,
+    object_export,
+    object_import,
+    topology_stream,
+)
 
 
 @auth.get_password
@@ -30,6 +52,7 @@ class Heartbeat(Resource):
             "name": getnode(),
             "cluster_id": current_app.config["CLUSTER_ID"],
             "cpu_load": cpu_percent(),
+            "status": "Up",
         }
 
 
@@ -41,29 +64,51 @@ class RestAutomation(Resource):
         job = fetch("Job", name=payload["name"])
         handle_asynchronously = payload.get("async", False)
         try:
-            targets = {
-                fetch("Device", name=device_name)
-                for device_name in payload.get("devices", "")
-            } | {
-                fetch("Device", ip_address=ip_address)
-                for ip_address in payload.get("ip_addresses", "")
-            }
-            for pool_name in payload.get("pools", ""):
-                targets |= {d for d in fetch("Pool", name=pool_name).devices}
+            targets = fetch_targets(payload)
         except Exception as e:
             info(f"REST API run_job endpoint failed ({str(e)})")
             return str(e)
-        if handle_asynchronously:
-            scheduler.add_job(
-                id=str(datetime.now()),
-                func=scheduler_job,
-                run_date=datetime.now(),
-                args=[job.id, None, [d.id for d in targets]],
-                trigger="date",
-            )
-            return job.serialized
-        else:
-            return job.try_run(targets=targets)[0]
+        run = JobRun(
+            name=str(uuid4()),
+            job=job,
+            number_of_targets=len(targets or job.compute_targets()),
+        )
+        db.session.add(run)
+        db.session.commit()
+        cluster = payload.get("cluster", False)
+        if not handle_asynchronously:
+            # the job runs in the request, which responds with its results
+            return execute_run(job, targets, run, cluster)
+        scheduler.add_job(
+            id=run.name,
+            func=scheduler_job,
+            run_date=datetime.now(),
+            args=[job.id, None, [d.id for d in targets], run.name, cluster],
+            trigger="date",
+            misfire_grace_time=None,
+        )
+        return run.get_properties()
+
+
+class RunStatus(Resource):
+    decorators = [auth.login_required]
+
+    def get(self, run_id: str, detail: str = "status") -> Union[dict, Response]:
+        run = fetch("JobRun", name=run_id)
+        if not run:
+            return make_response(jsonify({"error": "Unknown run"}), 404)
+        if detail == "status":
+            return run.get_properties()
+        elif detail == "progress":
+            return run.get_progress()
+        elif detail != "result":
+            return make_response(jsonify({"error": "Unknown endpoint"}), 404)
+        elif run.status != "Completed":
+            return make_response(jsonify({"error": f"The run is {run.status}"}), 409)
+        result = run.get_result()
+        if result is None:
+            return make_response(jsonify({"error": "The result has expired"}), 404)
+        return result
 
 
 class GetInstance(Resource):
@@ -80,8 +125,7 @@ class GetConfiguration(Resource):
     decorators = [auth.login_required]
 
     def get(self, name: str) -> str:
-        device = fetch("Device", name=name)
-        return device.configurations[max(device.configurations)]
+        return fetch("Device", name=name).get_configuration()
 
 
 class UpdateInstance(Resource):
@@ -91,6 +135,34 @@ class UpdateInstance(Resource):
         return factory(cls, **request.get_json()).serialized
 
 
+def request_objects() -> Iterator:
+    if request.mimetype == export_mimetypes["jsonl"]:
+        # NDJSON streams are read line by line, and written batch by batch
+        for line in request.stream:
+            if line.strip():
+                yield loads(line)
+    else:
+        yield from request.get_json()
+
+
+class BulkInstances(Resource):
+    decorators = [auth.login_required]
+
+    def get(self, cls: str) -> List[dict]:
+        return serialize(cls, relation_ids=True)
+
+    def post(self, cls: str) -> List[dict]:
+        batch_size = current_app.config["REST_BATCH_SIZE"]
+        return batch_write(upsert_instances, cls, request_objects(), batch_size)
+
+    def delete(self, cls: str) -> List[dict]:
+        batch_size = current_app.config["REST_BATCH_SIZE"]
+        names = (
+            obj["name"] if isinstance(obj, dict) else obj for obj in request_objects()
+        )
+        return batch_write(delete_instances, cls, names, batch_size)
+
+
 class Migrate(Resource):
     decorators = [auth.login_required]
 
@@ -102,11 +174,30 @@ class Migrate(Resource):
 class Topology(Resource):
     decorators = [auth.login_required]
 
+    def get(self, direction: str) -> Response:
+        if direction != "export":
+            return make_response(jsonify({"error": "Unsupported direction"}), 400)
+        export_format = request.args.get("format", "csv")
+        default_types = ["Device"] if export_format == "csv" else ["Device", "Link"]
+        obj_types = request.args.getlist("type") or default_types
+        try:
+            stream = topology_stream(export_format, obj_types)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+        return Response(
+            stream_with_context(stream),
+            mimetype=export_mimetypes[export_format],
+            headers={
+                "Content-Disposition": f"attachment; filename=topology.{export_format}"
+            },
+        )
+
     def post(self, direction: str) -> Union[bool, str]:
         if direction == "import":
             data = request.form.to_dict()
             for property in ("replace", "update_pools"):
                 data[property] = True if data[property] == "True" else False
+            data["bulk"] = data.get("bulk") == "True"
             return object_import(data, request.files["file"])
         else:
             return object_export(request.get_json(), current_app.path)
@@ -116,8 +207,14 @@ def configure_rest_api(app: Flask) -> None:
     api = Api(app)
     api.add_resource(Heartbeat, "/rest/is_alive")
     api.add_resource(RestAutomation, "/rest/run_job")
+    api.add_resource(
+        RunStatus,
+        "/rest/run/<string:run_id>",
+        "/rest/run/<string:run_id>/<string:detail>",
+    )
     api.add_resource(UpdateInstance, "/rest/instance/<string:cls>")
     api.add_resource(GetInstance, "/rest/instance/<string:cls>/<string:name>")
+    api.add_resource(BulkInstances, "/rest/instances/<string:cls>")
     api.add_resource(GetConfiguration, "/rest/configuration/<string:name>")
     api.add_resource(Migrate, "/rest/migrate/<string:direction>")
     api.add_resource(Topology, "/rest/topology/<string:direction>")
@@ -3,7 +3,7 @@ from json.decoder import JSONDecodeError
 from logging import info
 from flask import jsonify, redirect, request, url_for
 from flask_login import current_user
-from sqlalchemy import and_
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from werkzeug.wrappers import Response
 
@@ -11,11 +11,12 @@ from eNMS import db
 from eNMS.base import bp
 from eNMS.base.classes import classes
 from eNMS.base.helpers import (
+    count,
+    count_by,
+    count_visible,
     delete,
     factory,
     fetch,
-    fetch_all,
-    fetch_all_visible,
     get,
     post,
 )
@@ -36,35 +37,53 @@ def site_root() -> Response:
 @get(bp, "/server_side_processing/<cls>/<table>")
 def server_side_processing(cls: str, table: str) -> Response:
     model, properties = classes[cls], table_properties[table]
-    filtered = db.session.query(model).filter(
-        and_(
-            *[
-                getattr(model, property).contains(value)
-                for property, value in {
-                    property: request.args[f"columns[{i}][search][value]"]
-                    for i, property in enumerate(properties)
-                    if request.args[f"columns[{i}][search][value]"]
-                }.items()
-            ]
-        )
-    )
+    columns = model.__mapper__.columns
+    criteria = [
+        getattr(model, property).contains(value)
+        for property, value in {
+            property: request.args[f"columns[{i}][search][value]"]
+            for i, property in enumerate(properties)
+            if request.args[f"columns[{i}][search][value]"]
+        }.items()
+        if hasattr(getattr(model, property), "contains")
+    ]
     if table == "configuration":
         search_text = request.args["columns[5][search][value]"]
         if search_text:
-            filtered = filtered.filter(
-                model.current_configuration.contains(search_text)
-            )
+            criteria.append(model.current_configuration.contains(search_text))
+    order = [model.id]
+    order_index = int(request.args.get("order[0][column]", -1))
+    if 0 <= order_index < len(properties) and properties[order_index] in columns:
+        column = getattr(model, properties[order_index])
+        descending = request.args.get("order[0][dir]") == "desc"
+        order.insert(0, column.desc() if descending else column.asc())
+    count = db.session.query(func.count()).select_from(model)
+    total = count.scalar()
+    if all(property in columns for property in properties):
+        static_properties = [p for p in ("id", "name", "is_active") if p in columns]
+        entities = dict.fromkeys(properties + static_properties)
+        query = db.session.query(*(getattr(model, p) for p in entities))
+    else:
+        query = db.session.query(model)
+    page = (
+        query.select_from(model)
+        .filter(*criteria)
+        .order_by(*order)
+        .limit(int(request.args["length"]))
+        .offset(int(request.args["start"]))
+        .all()
+    )
+    if page and isinstance(page[0], model):
+        model.prefetch(page)
     return jsonify(
         {
             "draw": int(request.args["draw"]),
-            "recordsTotal": len(model.query.all()),
-            "recordsFiltered": len(filtered.all()),
+            "recordsTotal": total,
+            "recordsFiltered": count.filter(*criteria).scalar() if criteria else total,
             "data": [
-                [getattr(obj, property) for property in properties]
-                + table_static_entries(table, obj)
-                for obj in filtered.limit(int(request.args["length"]))
-                .offset(int(request.args["start"]))
-                .all()
+                [getattr(row, property) for property in properties]
+                + table_static_entries(table, row)
+                for row in page
             ],
         }
     )
@@ -73,33 +92,22 @@ def server_side_processing(cls: str, table: str) -> Response:
 @get(bp, "/dashboard")
 def dashboard() -> dict:
     on_going = {
-        "Running services": len(
-            [service for service in fetch_all("Service") if service.status == "Running"]
-        ),
-        "Running workflows": len(
-            [
-                workflow
-                for workflow in fetch_all("Workflow")
-                if workflow.status == "Running"
-            ]
-        ),
-        "Scheduled tasks": len(
-            [task for task in fetch_all("Task") if task.status == "Active"]
-        ),
+        "Running services": count("Service", status="Running"),
+        "Running workflows": count("Workflow", status="Running"),
+        "Scheduled tasks": count("Task", is_active=True),
     }
     return dict(
         properties=type_to_diagram_properties,
         default_properties=default_diagrams_properties,
-        counters={**{cls: len(fetch_all_visible(cls)) for cls in classes}, **on_going},
+        counters={**count_visible(), **on_going},
     )
 
 
 @post(bp, "/counters/<property>/<type>")
 def get_counters(property: str, type: str) -> Counter:
-    objects = fetch_all(type)
     if property in reverse_pretty_names:
         property = reverse_pretty_names[property]
-    return Counter(map(lambda o: str(getattr(o, property)), objects))
+    return count_by(type, property)
 
 
 @post(bp, "/get/<cls>/<id>", "View")
@@ -125,6 +125,7 @@ function fCall(url, form, callback) { // eslint-disable-line no-unused-vars
  * @return {table}
  */
 function initTable(cls, type, toExclude) { // eslint-disable-line
+  const unorderable = [];
   $('#table thead tr').clone(true).appendTo('#table thead');
   $('#table thead tr:eq(1) th').each(function(i) {
     const title = $(this).text();
@@ -139,11 +140,14 @@ function initTable(cls, type, toExclude) { // eslint-disable-line
         }
       });
     } else {
+      unorderable.push(i);
       $(this).empty();
     }
   });
   const table = $('#table').DataTable({ // eslint-disable-line
-    ordering: false,
+    order: [],
+    orderCellsTop: true,
+    columnDefs: [{orderable: false, targets: unorderable}],
     fixedHeader: true,
     serverSide: true,
     ajax: `/server_side_processing/${cls}/${type}`,
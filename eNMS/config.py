@@ -19,6 +19,9 @@ class Config(object):
 
     # Vault
     USE_VAULT = int(environ.get("USE_VAULT", False))
+    # Secrets read from the Vault are cached in memory for VAULT_CACHE_TTL
+    # seconds (0 disables the cache).
+    VAULT_CACHE_TTL = float(environ.get("VAULT_CACHE_TTL", 300))
 
     # LDAP
     LDAP_SERVER = environ.get("LDAP_SERVER")
@@ -35,10 +38,67 @@ class Config(object):
     USE_SYSLOG = int(environ.get("USE_SYSLOG", False))
     SYSLOG_ADDR = environ.get("SYSLOG_ADDR", "0.0.0.0")
     SYSLOG_PORT = int(environ.get("SYSLOG_PORT", 514))
+    # Received messages are kept in a buffer of SYSLOG_BUFFER_SIZE messages (the
+    # oldest messages are dropped when it is full), and processed and stored
+    # every SYSLOG_BATCH_SIZE messages or every SYSLOG_BATCH_INTERVAL ms.
+    SYSLOG_BUFFER_SIZE = int(environ.get("SYSLOG_BUFFER_SIZE", 10000))
+    SYSLOG_BATCH_SIZE = int(environ.get("SYSLOG_BATCH_SIZE", 500))
+    SYSLOG_BATCH_INTERVAL = int(environ.get("SYSLOG_BATCH_INTERVAL", 200))
 
     # Examples
     CREATE_EXAMPLES = int(environ.get("CREATE_EXAMPLES", True))
 
+    # Connection pool
+    # Netmiko and Napalm sessions are kept open for CONNECTION_POOL_IDLE_TIMEOUT
+    # seconds after a service is done with them, so that successive services
+    # and workflow steps reuse the same session (0 disables connection reuse).
+    CONNECTION_POOL_IDLE_TIMEOUT = float(
+        environ.get("CONNECTION_POOL_IDLE_TIMEOUT", 60)
+    )
+    CONNECTION_POOL_MAX_PER_DEVICE = int(
+        environ.get("CONNECTION_POOL_MAX_PER_DEVICE", 5)
+    )
+    CONNECTION_POOL_MAX_SIZE = int(environ.get("CONNECTION_POOL_MAX_SIZE", 1000))
+
+    # Job results
+    # Number of results kept per job (0 to keep all results), and number of
+    # runtimes displayed per page in the logs window.
+    JOB_RESULTS_RETENTION = int(environ.get("JOB_RESULTS_RETENTION", 100))
+    JOB_RESULTS_PAGE_SIZE = int(environ.get("JOB_RESULTS_PAGE_SIZE", 100))
+
+    # Job status
+    # The status and live state of running jobs are kept in memory, and written
+    # to the database every RUN_STATE_FLUSH_INTERVAL seconds.
+    RUN_STATE_FLUSH_INTERVAL = float(environ.get("RUN_STATE_FLUSH_INTERVAL", 1))
+    # The Workflow Builder and the logs window receive the progress of jobs as
+    # server-sent events: jobs running in another eNMS process are watched in
+    # the database every RUN_STATE_FLUSH_INTERVAL seconds, and a keepalive is
+    # sent to idle streams every JOB_EVENTS_KEEPALIVE seconds.
+    JOB_EVENTS_KEEPALIVE = float(environ.get("JOB_EVENTS_KEEPALIVE", 15))
+
+    # Scheduler
+    # Jobs are run by a single eNMS process, the holder of a lease stored in the
+    # database: the lease lasts SCHEDULER_LEASE_DURATION seconds and is renewed
+    # every third of that time. The other processes add jobs to the job store,
+    # and the leader checks it every SCHEDULER_POLL_INTERVAL seconds.
+    SCHEDULER_LEASE_DURATION = float(environ.get("SCHEDULER_LEASE_DURATION", 15))
+    SCHEDULER_POLL_INTERVAL = float(environ.get("SCHEDULER_POLL_INTERVAL", 1))
+
+    # Dashboard
+    # The counters of the dashboard are cached for COUNTER_CACHE_TTL seconds,
+    # or until the next write to the database.
+    COUNTER_CACHE_TTL = float(environ.get("COUNTER_CACHE_TTL", 5))
+
+    # Topology import / export
+    # Number of objects written per transaction by the bulk topology import,
+    # and number of rows fetched per database round trip by the export.
+    TOPOLOGY_IMPORT_BATCH_SIZE = int(environ.get("TOPOLOGY_IMPORT_BATCH_SIZE", 1000))
+    TOPOLOGY_EXPORT_BATCH_SIZE = int(environ.get("TOPOLOGY_EXPORT_BATCH_SIZE", 1000))
+
+    # REST API
+    # Number of objects written per transaction by the bulk endpoints.
+    REST_BATCH_SIZE = int(environ.get("REST_BATCH_SIZE", 1000))
+
     # Custom Services
     CUSTOM_SERVICES_PATH = environ.get("CUSTOM_SERVICES_PATH")
 
@@ -74,6 +134,13 @@ class Config(object):
     CLUSTER_SCAN_SUBNET = environ.get("CLUSTER_SCAN_SUBNET", "192.168.105.0/24")
     CLUSTER_SCAN_PROTOCOL = environ.get("CLUSTER_SCAN_PROTOCOL", "http")
     CLUSTER_SCAN_TIMEOUT = float(environ.get("CLUSTER_SCAN_TIMEOUT", 0.05))
+    # Jobs started with {"cluster": true} through /rest/run_job are split across
+    # the instances of the cluster that answer the heartbeat, in proportion to
+    # their weight and CPU load: each instance runs its share through its own
+    # REST API (with these credentials), for at most CLUSTER_RUN_TIMEOUT seconds.
+    CLUSTER_REST_USERNAME = environ.get("CLUSTER_REST_USERNAME", "admin")
+    CLUSTER_REST_PASSWORD = environ.get("CLUSTER_REST_PASSWORD")
+    CLUSTER_RUN_TIMEOUT = float(environ.get("CLUSTER_RUN_TIMEOUT", 3600))
 
     # Geographical Parameters
     DEFAULT_LONGITUDE = float(environ.get("DEFAULT_LONGITUDE", -96.0))
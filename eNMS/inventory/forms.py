@@ -100,10 +100,11 @@ class PoolObjectsForm(FlaskForm):
 
 
 class ImportExportForm(FlaskForm):
-    boolean_fields = HiddenField(default="update_pools,replace")
+    boolean_fields = HiddenField(default="update_pools,replace,bulk")
     export_filename = StringField()
     update_pools = BooleanField()
     replace = BooleanField()
+    bulk = BooleanField()
 
 
 class OpenNmsForm(FlaskForm):
@@ -1,19 +1,42 @@
+from csv import writer
+from flask import current_app
+from functools import lru_cache
+from io import StringIO
+from itertools import chain
+from json import dumps
 from logging import info
+from os import remove
 from pathlib import PosixPath
-from typing import Set
+from re import compile
+from sqlalchemy.orm import aliased
+from tempfile import mkstemp
+from typing import Dict, Iterator, List, Pattern, Sequence, Set, Tuple
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
-from xlrd import open_workbook
+from xlrd import Book, open_workbook
 from xlrd.biffh import XLRDError
+from xlsxwriter import Workbook as XlsxWorkbook
 from xlwt import Workbook
 
-from eNMS.main import db
-from eNMS.base.helpers import delete_all, factory, fetch_all, serialize
-from eNMS.base.properties import export_properties
+from eNMS.main import db, USE_VAULT
+from eNMS.base.classes import classes
+from eNMS.base.helpers import (
+    delete_all,
+    factory,
+    fetch_all,
+    pool_batch,
+    secret_cache,
+)
+from eNMS.base.properties import export_properties, private_properties
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> Pattern:
+    return compile(pattern)
 
 
 def database_filtering(pool: db.Model) -> None:
-    pool_objects = {"Device": pool.devices, "Link": pool.links}
+    pool_objects = {"Device": set(pool.devices), "Link": set(pool.links)}
     for obj_type in ("Device", "Link"):
         for obj in fetch_all(obj_type):
             setattr(obj, "hidden", obj not in pool_objects[obj_type])
@@ -26,40 +49,251 @@ def allowed_file(name: str, allowed_extensions: Set[str]) -> bool:
     return allowed_syntax and allowed_extension
 
 
-def object_import(request: dict, file: FileStorage) -> str:
-    if request["replace"]:
-        delete_all("Device")
-    result = "Topology successfully imported."
-    if allowed_file(secure_filename(file.filename), {"xls", "xlsx"}):
-        book = open_workbook(file_contents=file.read())
-        for obj_type in ("Device", "Link"):
+def bulk_mapping(
+    obj_type: str, row: dict, existing: Dict[str, Tuple[int, str]]
+) -> dict:
+    model = classes[obj_type]
+    name = row.get("name")
+    if not name:
+        raise ValueError("no name")
+    if obj_type == "Link":
+        for endpoint in ("source", "destination"):
+            if f"{endpoint}_name" in row:
+                device_id, device_type = existing.get(
+                    row.pop(f"{endpoint}_name"), (None, None)
+                )
+                if device_type != "Device":
+                    raise ValueError(f"unknown {endpoint} device")
+                row[f"{endpoint}_id"] = device_id
+            elif endpoint in row:
+                row[f"{endpoint}_id"] = int(row.pop(endpoint))
+    mapping = {"type": obj_type}
+    for property, value in row.items():
+        if property in ("id", "type") or property not in model.__mapper__.columns:
+            continue
+        if property in private_properties and USE_VAULT:
+            if value:
+                secret_cache.write(
+                    f"secret/data/{model.__tablename__}/{name}/{property}", value
+                )
+            continue
+        mapping[property] = model.coerce(property, value)
+    if name in existing:
+        mapping["id"], existing_type = existing[name]
+        if existing_type != obj_type:
+            raise ValueError(f"an object of type {existing_type} has the same name")
+    return mapping
+
+
+def write_mappings(
+    obj_type: str,
+    inserts: List[dict],
+    updates: List[dict],
+    existing: Dict[str, Tuple[int, str]],
+) -> None:
+    model = classes[obj_type]
+    db.session.bulk_insert_mappings(model, inserts, return_defaults=True)
+    db.session.bulk_update_mappings(model, updates)
+    db.session.commit()
+    existing.update({mapping["name"]: (mapping["id"], obj_type) for mapping in inserts})
+
+
+def bulk_write(
+    obj_type: str,
+    inserts: List[dict],
+    updates: List[dict],
+    existing: Dict[str, Tuple[int, str]],
+) -> List[str]:
+    try:
+        write_mappings(obj_type, inserts, updates, existing)
+        return []
+    except Exception:
+        db.session.rollback()
+    # a row made the transaction fail: the rows of the batch are written one
+    # by one to find out which one.
+    errors = []
+    for mapping in inserts:
+        mapping.pop("id", None)
+    rows = chain(
+        (([mapping], []) for mapping in inserts),
+        (([], [mapping]) for mapping in updates),
+    )
+    for row_inserts, row_updates in rows:
+        try:
+            write_mappings(obj_type, row_inserts, row_updates, existing)
+        except Exception as e:
+            db.session.rollback()
+            name = (row_inserts or row_updates)[0]["name"]
+            errors.append(f"{obj_type} {name} ({str(e)})")
+    return errors
+
+
+def bulk_object_import(book: Book) -> List[str]:
+    batch_size = current_app.config["TOPOLOGY_IMPORT_BATCH_SIZE"]
+    object_class = classes["Object"]
+    existing = {
+        name: (id, type)
+        for name, id, type in db.session.query(
+            object_class.name, object_class.id, object_class.type
+        )
+    }
+    errors = []
+    for obj_type in ("Device", "Link"):
+        try:
+            sheet = book.sheet_by_name(obj_type)
+        except XLRDError:
+            continue
+        properties, names = sheet.row_values(0), set()
+        inserts: List[dict] = []
+        updates: List[dict] = []
+        for row_index in range(1, sheet.nrows):
+            row = dict(zip(properties, sheet.row_values(row_index)))
             try:
-                sheet = book.sheet_by_name(obj_type)
-            except XLRDError:
+                if row.get("name") in names:
+                    raise ValueError("duplicated name")
+                mapping = bulk_mapping(obj_type, row, existing)
+            except Exception as e:
+                errors.append(f"{obj_type} row {row_index} ({str(e)})")
                 continue
-            properties = sheet.row_values(0)
+            names.add(mapping["name"])
+            (updates if "id" in mapping else inserts).append(mapping)
+            if len(inserts) + len(updates) == batch_size:
+                errors.extend(bulk_write(obj_type, inserts, updates, existing))
+                inserts, updates = [], []
+        errors.extend(bulk_write(obj_type, inserts, updates, existing))
+    # the objects are written without the ORM: their pools are computed once,
+    # after the import
+    for pool in fetch_all("Pool"):
+        pool.compute_pool()
+    db.session.commit()
+    return errors
+
+
+def row_object_import(book: Book) -> List[str]:
+    errors = []
+    for obj_type in ("Device", "Link"):
+        try:
+            sheet = book.sheet_by_name(obj_type)
+        except XLRDError:
+            continue
+        properties = sheet.row_values(0)
+        with pool_batch():
             for row_index in range(1, sheet.nrows):
                 prop = dict(zip(properties, sheet.row_values(row_index)))
                 try:
-                    factory(obj_type, **prop).serialized
+                    factory(obj_type, **prop)
                 except Exception as e:
-                    info(f"{str(prop)} could not be imported ({str(e)})")
-                    result = "Partial import (see logs)."
-            db.session.commit()
-    if request["update_pools"]:
+                    errors.append(f"{str(prop)} ({str(e)})")
+        db.session.commit()
+    return errors
+
+
+def object_import(request: dict, file: FileStorage) -> str:
+    if request["replace"]:
+        delete_all("Device")
+    result = "Topology successfully imported."
+    if allowed_file(secure_filename(file.filename), {"xls", "xlsx"}):
+        book = open_workbook(file_contents=file.read())
+        if request.get("bulk"):
+            errors = bulk_object_import(book)
+        else:
+            errors = row_object_import(book)
+        for error in errors:
+            info(f"{error} could not be imported")
+        if errors:
+            result = f"Partial import: {len(errors)} objects not imported (see logs)."
+    if request["update_pools"] and not request.get("bulk"):
         for pool in fetch_all("Pool"):
             pool.compute_pool()
         db.session.commit()
     return result
 
 
+export_mimetypes = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def export_rows(obj_type: str) -> Iterator[tuple]:
+    model, columns = classes[obj_type], {}
+    query = db.session.query(model).filter(model.hidden.isnot(True))
+    if obj_type == "Link":
+        for endpoint in ("source", "destination"):
+            device = aliased(classes["Device"])
+            endpoint_id = getattr(model, f"{endpoint}_id")
+            query = query.outerjoin(device, endpoint_id == device.id)
+            columns[f"{endpoint}_name"] = device.name
+    query = query.with_entities(
+        *(
+            columns.get(property, getattr(model, property))
+            for property in export_properties[obj_type]
+        )
+    )
+    return query.yield_per(current_app.config["TOPOLOGY_EXPORT_BATCH_SIZE"])
+
+
+def export_csv(obj_type: str) -> Iterator[str]:
+    buffer = StringIO()
+    csv_writer = writer(buffer)
+    csv_writer.writerow(export_properties[obj_type])
+    for index, row in enumerate(export_rows(obj_type), 1):
+        csv_writer.writerow(row)
+        if not index % current_app.config["TOPOLOGY_EXPORT_BATCH_SIZE"]:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(obj_types: Sequence[str]) -> Iterator[str]:
+    for obj_type in obj_types:
+        properties = export_properties[obj_type]
+        for row in export_rows(obj_type):
+            yield dumps({"type": obj_type, **dict(zip(properties, row))}) + "\n"
+
+
+def export_xlsx(obj_types: Sequence[str], path: str) -> None:
+    workbook = XlsxWorkbook(path, {"constant_memory": True})
+    for obj_type in obj_types:
+        sheet = workbook.add_worksheet(obj_type)
+        sheet.write_row(0, 0, export_properties[obj_type])
+        for index, row in enumerate(export_rows(obj_type), 1):
+            sheet.write_row(index, 0, row)
+    workbook.close()
+
+
+def export_xlsx_stream(obj_types: Sequence[str]) -> Iterator[bytes]:
+    file_descriptor, path = mkstemp(suffix=".xlsx")
+    try:
+        with open(file_descriptor, "rb") as file:
+            export_xlsx(obj_types, path)
+            yield from iter(lambda: file.read(65536), b"")
+    finally:
+        remove(path)
+
+
+def topology_stream(export_format: str, obj_types: Sequence[str]) -> Iterator:
+    if export_format == "csv":
+        if len(obj_types) != 1:
+            raise ValueError("A CSV export must have exactly one object type")
+        return export_csv(obj_types[0])
+    elif export_format == "jsonl":
+        return export_jsonl(obj_types)
+    elif export_format == "xlsx":
+        return export_xlsx_stream(obj_types)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
 def object_export(request: dict, path_app: PosixPath) -> bool:
     workbook = Workbook()
     for obj_type in ("Device", "Link"):
         sheet = workbook.add_sheet(obj_type)
         for index, property in enumerate(export_properties[obj_type]):
             sheet.write(0, index, property)
-            for obj_index, obj in enumerate(serialize(obj_type), 1):
-                sheet.write(obj_index, index, obj[property])
+        for obj_index, row in enumerate(export_rows(obj_type), 1):
+            for index, value in enumerate(row):
+                sheet.write(obj_index, index, value)
     workbook.save(path_app / "projects" / f'{request["export_filename"]}.xls')
     return True
@@ -1,26 +1,36 @@
-from re import search
+from hashlib import sha256
+from logging import info
 from sqlalchemy import (
     Boolean,
     Column,
+    event,
+    exists,
     ForeignKey,
+    inspect,
     Integer,
+    LargeBinary,
     PickleType,
+    select,
     String,
     Text,
     Float,
+    or_,
 )
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.ext.mutable import MutableDict
-from sqlalchemy.orm import backref, relationship
-from typing import Any, Dict, List, Union
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import backref, deferred, Mapper, object_session, relationship
+from sqlalchemy.sql import column, table
+from typing import Any, Dict, List, Optional, Tuple, Union
+from zlib import compress, decompress
 
+from eNMS.main import db
 from eNMS.base.associations import (
     pool_device_table,
     pool_link_table,
     job_device_table,
     job_pool_table,
 )
-from eNMS.base.helpers import fetch, get_one
+from eNMS.base.helpers import fetch, fetch_all, get_one, pool_batches
 from eNMS.base.models import Base
 from eNMS.base.properties import (
     custom_properties,
@@ -28,7 +38,7 @@ from eNMS.base.properties import (
     pool_device_properties,
     sql_types,
 )
-from eNMS.inventory.helpers import database_filtering
+from eNMS.inventory.helpers import compile_pattern, database_filtering
 
 
 class Object(Base):
@@ -45,6 +55,43 @@ class Object(Base):
     location = Column(String)
     vendor = Column(String)
 
+    def update(self, **kwargs: Any) -> None:
+        pool_properties = self.pool_properties()
+        super().update(**kwargs)
+        # the pools of an existing object only change with its pool properties
+        if inspect(self).has_identity and pool_properties == self.pool_properties():
+            return
+        batch = getattr(pool_batches, "objects", None)
+        if batch is None:
+            self.compute_pools()
+        else:
+            batch.append(self)
+
+    def pool_properties(self) -> tuple:
+        properties = (
+            pool_device_properties
+            if self.class_type == "device"
+            else pool_link_properties
+        )
+        return tuple(getattr(self, property) for property in properties)
+
+    def compute_pools(
+        self, pools: Optional[list] = None, pool_filter: Optional["Pool"] = None
+    ) -> None:
+        if pools is None:
+            pools = fetch_all("Pool")
+            pool_filter = fetch("Pool", name=get_one("Parameters").pool_filter)
+        for pool in pools:
+            if pool.never_update:
+                continue
+            match = pool.object_match(self)
+            if match and pool not in self.pools:
+                self.pools.append(pool)
+            elif not match and pool in self.pools:
+                self.pools.remove(pool)
+        if pool_filter:
+            self.hidden = pool_filter not in self.pools
+
 
 CustomDevice: Any = (
     type(
@@ -82,7 +129,12 @@ class Device(CustomDevice):
     enable_password = Column(String)
     netmiko_driver = Column(String)
     napalm_driver = Column(String)
-    configurations = Column(MutableDict.as_mutable(PickleType), default={})
+    configurations = relationship(
+        "Configuration",
+        back_populates="device",
+        cascade="all, delete-orphan",
+        lazy="dynamic",
+    )
     current_configuration = Column(Text)
     last_failure = Column(String, default="Never")
     last_status = Column(String, default="Never")
@@ -91,6 +143,132 @@ class Device(CustomDevice):
     jobs = relationship("Job", secondary=job_device_table, back_populates="devices")
     pools = relationship("Pool", secondary=pool_device_table, back_populates="devices")
 
+    def get_configuration(self, runtime: Optional[str] = None) -> Optional[str]:
+        configurations = self.configurations.order_by(Configuration.id.desc())
+        if runtime:
+            configurations = configurations.filter_by(runtime=runtime)
+        configuration = configurations.first()
+        return configuration.content.text if configuration else None
+
+    def get_configuration_runtimes(self) -> List[str]:
+        return [
+            configuration.runtime
+            for configuration in self.configurations.with_entities(
+                Configuration.runtime
+            ).order_by(Configuration.id.desc())
+        ]
+
+    def add_configuration(
+        self, runtime: str, text: str, number_of_configuration: int
+    ) -> bool:
+        content_hash = sha256(text.encode()).hexdigest()
+        configurations = self.configurations.order_by(Configuration.id.desc())
+        last = configurations.first()
+        if last and last.content.hash == content_hash:
+            return False
+        for configuration in configurations.offset(max(number_of_configuration - 1, 0)):
+            self.configurations.remove(configuration)
+        session = object_session(self)
+        content = (
+            session.query(ConfigurationContent).filter_by(hash=content_hash).first()
+        )
+        if not content:
+            content = ConfigurationContent(
+                hash=content_hash, data=compress(text.encode(), 9)
+            )
+        self.configurations.append(Configuration(runtime=runtime, content=content))
+        return True
+
+
+class ConfigurationContent(Base):
+
+    __tablename__ = type = "ConfigurationContent"
+    id = Column(Integer, primary_key=True)
+    hash = Column(String, index=True)
+    data = deferred(Column(LargeBinary))
+    configurations = relationship("Configuration", back_populates="content")
+
+    def __repr__(self) -> str:
+        return self.hash
+
+    @property
+    def text(self) -> str:
+        return decompress(self.data).decode()
+
+    @classmethod
+    def delete_orphans(cls) -> None:
+        cls.query.filter(~cls.configurations.any()).delete(synchronize_session=False)
+
+
+class Configuration(Base):
+
+    __tablename__ = type = "Configuration"
+    id = Column(Integer, primary_key=True)
+    runtime = Column(String, index=True)
+    device_id = Column(Integer, ForeignKey("Device.id"), index=True)
+    device = relationship("Device", back_populates="configurations")
+    content_id = Column(Integer, ForeignKey("ConfigurationContent.id"))
+    content = relationship("ConfigurationContent", back_populates="configurations")
+
+    def __repr__(self) -> str:
+        return self.runtime
+
+
+@event.listens_for(Configuration, "after_delete")
+def delete_configuration_content(
+    mapper: Mapper, connection: Connection, configuration: Configuration
+) -> None:
+    # a content is deleted along with the last configuration that uses it,
+    # whether it is removed by a backup (in a workflow or not) or a device deletion
+    contents = ConfigurationContent.__table__
+    configurations = Configuration.__table__
+    connection.execute(
+        contents.delete()
+        .where(contents.c.id == configuration.content_id)
+        .where(~exists().where(configurations.c.content_id == contents.c.id))
+    )
+
+
+def migrate_device_configurations() -> None:
+    # databases created before the Configuration table keep the configurations
+    # of each device in a pickled "configurations" column of the Device table
+    columns = inspect(db.engine).get_columns("Device")
+    if "configurations" not in {device_column["name"] for device_column in columns}:
+        return
+    device_table = table(
+        "Device", column("id", Integer), column("configurations", PickleType)
+    )
+    contents: Dict[str, ConfigurationContent] = {}
+    number_of_configurations = 0
+    for device_id, configurations in db.session.execute(
+        select([device_table.c.id, device_table.c.configurations]).where(
+            device_table.c.configurations.isnot(None)
+        )
+    ):
+        for runtime, text in sorted((configurations or {}).items()):
+            content_hash = sha256(text.encode()).hexdigest()
+            if content_hash not in contents:
+                contents[content_hash] = ConfigurationContent.query.filter_by(
+                    hash=content_hash
+                ).first() or ConfigurationContent(
+                    hash=content_hash, data=compress(text.encode(), 9)
+                )
+            db.session.add(
+                Configuration(
+                    device_id=device_id,
+                    runtime=str(runtime),
+                    content=contents[content_hash],
+                )
+            )
+            number_of_configurations += 1
+    db.session.execute(device_table.update().values(configurations=None))
+    db.session.commit()
+    if number_of_configurations:
+        info(
+            f"{number_of_configurations} configurations moved from "
+            "Device.configurations to Configuration"
+        )
+
 
 class Link(Object):
 
@@ -167,27 +345,46 @@ class Pool(AbstractPool):
     def compute_pool(self) -> None:
         if self.never_update:
             return
-        self.devices = list(filter(self.object_match, Device.query.all()))
-        self.links = list(filter(self.object_match, Link.query.all()))
-        if get_one("Parameters").pool_filter == self:
+        self.devices = self.matching_objects(Device)
+        self.links = self.matching_objects(Link)
+        if get_one("Parameters").pool_filter == self.name:
             database_filtering(self)
 
-    def object_match(self, obj: Union[Device, Link]) -> bool:
+    def criteria(self, class_type: str) -> List[Tuple[str, str, bool]]:
         properties = (
-            pool_device_properties
-            if obj.class_type == "device"
-            else pool_link_properties
+            pool_device_properties if class_type == "device" else pool_link_properties
         )
-        return all(
-            getattr(self, f"{obj.class_type}_{property}") in str(getattr(obj, property))
-            if not getattr(self, f"{obj.class_type}_{property}_regex")
-            else search(
-                getattr(self, f"{obj.class_type}_{property}"),
-                str(getattr(obj, property)),
+        return [
+            (
+                property,
+                getattr(self, f"{class_type}_{property}"),
+                getattr(self, f"{class_type}_{property}_regex"),
             )
             for property in properties
-            if getattr(self, f"{obj.class_type}_{property}")
-        )
+            if getattr(self, f"{class_type}_{property}")
+        ]
+
+    def matching_objects(self, model: Union[Device, Link]) -> List[Object]:
+        query = model.query
+        for property, value, regex in self.criteria(model.class_type):
+            column = model.__mapper__.columns.get(property)
+            if regex or not isinstance(getattr(column, "type", None), String):
+                continue
+            condition = column.contains(value, autoescape=True)
+            if value in "None":
+                # object_match compares str(None) with the criteria
+                condition = or_(condition, column.is_(None))
+            query = query.filter(condition)
+        return list(filter(self.object_match, query))
+
+    def object_match(self, obj: Union[Device, Link]) -> bool:
+        for property, value, regex in self.criteria(obj.class_type):
+            obj_value = str(getattr(obj, property))
+            if regex and not compile_pattern(value).search(obj_value):
+                return False
+            elif not regex and value not in obj_value:
+                return False
+        return True
 
     def filter_objects(self) -> Dict[str, List[dict]]:
         return {
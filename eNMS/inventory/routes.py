@@ -1,4 +1,3 @@
-from datetime import datetime
 from difflib import SequenceMatcher
 from flask import current_app as app, jsonify, request, send_file
 from flask.wrappers import Response
@@ -6,7 +5,7 @@ from flask_login import current_user
 from pynetbox import api as netbox_api
 from requests import get as http_get
 from subprocess import Popen
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from eNMS.main import db
 from eNMS.base.helpers import factory, fetch, fetch_all, get, get_one, objectify, post
@@ -25,6 +24,7 @@ from eNMS.inventory.forms import (
     PoolObjectsForm,
 )
 from eNMS.inventory.helpers import object_export, object_import
+from eNMS.inventory.models import Configuration, ConfigurationContent
 from eNMS.base.properties import (
     device_configuration_properties,
     device_table_properties,
@@ -247,28 +247,36 @@ def query_librenms() -> bool:
 
 @post(bp, "/get_configurations/<int:device_id>", "View")
 def get_configurations(device_id: int) -> dict:
-    return {str(k): v for k, v in fetch("Device", id=device_id).configurations.items()}
+    device = fetch("Device", id=device_id)
+    return {
+        "runtimes": device.get_configuration_runtimes(),
+        "configuration": device.get_configuration(),
+    }
+
+
+@post(bp, "/get_configuration/<int:device_id>/<runtime>", "View")
+def get_configuration(device_id: int, runtime: str) -> Optional[str]:
+    return fetch("Device", id=device_id).get_configuration(runtime)
 
 
 @post(bp, "/get_diff/<int:device_id>/<v1>/<v2>", "View")
 def get_diff(device_id: int, v1: str, v2: str) -> dict:
     device = fetch("Device", id=device_id)
-    d1, d2 = [datetime.strptime(d, "%Y-%m-%d %H:%M:%S.%f") for d in (v1, v2)]
-    first = device.configurations[d1].splitlines()
-    second = device.configurations[d2].splitlines()
+    first = device.get_configuration(v1).splitlines()
+    second = device.get_configuration(v2).splitlines()
     opcodes = SequenceMatcher(None, first, second).get_opcodes()
     return {"first": first, "second": second, "opcodes": opcodes}
 
 
 @post(bp, "/clear_configurations/<int:device_id>", "Edit")
 def clear_configurations(device_id: int) -> bool:
-    fetch("Device", id=device_id).configurations = {}
+    Configuration.query.filter_by(device_id=device_id).delete()
+    ConfigurationContent.delete_orphans()
     db.session.commit()
     return True
 
 
 @get(bp, "/get_raw_logs/<int:device_id>/<version>", "Edit")
 def get_raw_logs(device_id: int, version: str) -> str:
-    device = fetch("Device", id=device_id)
-    configurations = {str(k): v for k, v in device.configurations.items()}
-    return f'<pre>{configurations.get(version, "")}</pre>'
+    configuration = fetch("Device", id=device_id).get_configuration(version)
+    return f'<pre>{configuration or ""}</pre>'
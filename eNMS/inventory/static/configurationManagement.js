@@ -20,17 +20,15 @@ let deviceId;
 function displayConfigurations() { // eslint-disable-line no-unused-vars
   call(`/inventory/get_configurations/${deviceId}`, (configurations) => {
     $('#display,#compare_with').empty();
-    const times = Object.keys(configurations);
-    times.forEach((option) => {
+    configurations.runtimes.forEach((option) => {
       $('#display,#compare_with').append(
         $('<option></option>').attr('value', option).text(option)
       );
     });
-    $('#display,#compare_with').val(times[times.length - 1]);
-    const firstConfigurations = configurations[$('#display').val()];
-    if (firstConfigurations) {
+    $('#display,#compare_with').val(configurations.runtimes[0]);
+    if (configurations.configuration) {
       $('#configurations').text(
-        JSON.stringify(firstConfigurations, null, 2).replace(
+        JSON.stringify(configurations.configuration, null, 2).replace(
           /(?:\\[rn]|[\r\n]+)+/g, '\n'
         )
       );
@@ -61,8 +59,8 @@ function clearConfigurations() { // eslint-disable-line no-unused-vars
 }
 
 $('#display').on('change', function() {
-  call(`/inventory/get_configurations/${deviceId}`, (configurations) => {
-    const log = configurations[$('#display').val()];
+  const runtime = $('#display').val();
+  call(`/inventory/get_configuration/${deviceId}/${runtime}`, (log) => {
     $('#configurations').text(
       JSON.stringify(log, null, 2).replace(/(?:\\[rn]|[\r\n]+)+/g, '\n')
     );
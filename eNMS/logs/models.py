@@ -1,11 +1,26 @@
-from re import search
-from sqlalchemy import Boolean, Column, Integer, String
-from sqlalchemy.orm import relationship
-from socketserver import BaseRequestHandler, UDPServer
-from threading import Thread
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from logging import info
+from re import compile, error, escape
+from sqlalchemy import (
+    Boolean,
+    Column,
+    event,
+    func,
+    inspect,
+    Integer,
+    select,
+    String,
+)
+from sqlalchemy.orm import relationship, Session
+from socket import AF_INET, SO_REUSEADDR, SOCK_DGRAM, socket, SOL_SOCKET
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Deque, List, Optional, Pattern, Set, Tuple
 
 from eNMS.main import db, scheduler
+from eNMS.automation.helpers import scheduler_job
 from eNMS.base.associations import job_log_rule_table, log_rule_log_table
+from eNMS.base.classes import classes
 from eNMS.base.models import Base
 
 
@@ -36,31 +51,143 @@ class LogRule(Base):
     jobs = relationship("Job", secondary=job_log_rule_table, back_populates="log_rules")
 
 
-class SyslogUDPHandler(BaseRequestHandler):
-    def handle(self) -> None:
+CompiledLogRule = Tuple[int, Callable, Callable, List[int]]
+
+
+class LogRuleMatcher:
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.rules: Optional[Tuple[List[CompiledLogRule], ...]] = None
+        self.prefilter: Optional[Pattern] = None
+        # version of the log rules in the database when they were compiled
+        self.version: Optional[int] = None
+        self.running_jobs: Set[int] = set()
+        # jobs triggered by a log run in the process that received the log
+        self.executor = ThreadPoolExecutor(max_workers=50)
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.rules = None
+
+    def refresh(self) -> None:
+        # log rules can be modified by another process: the version stored
+        # in the database is checked once per batch of syslog messages
+        parameters = classes["Parameters"].__table__
+        with scheduler.app.app_context():
+            version = db.session.execute(
+                select([parameters.c.log_rules_version])
+            ).scalar()
+        with self.lock:
+            if version != self.version:
+                self.rules, self.version = None, version
+
+    @staticmethod
+    def compile_property(value: Optional[str], regex: bool) -> Callable:
+        if not value:
+            return lambda text: True
+        elif regex:
+            return compile(value).search
+        else:
+            return lambda text: value in text
+
+    @staticmethod
+    def prefilter_pattern(log_rule: "LogRule") -> Optional[str]:
+        if not log_rule.content:
+            return None
+        elif not log_rule.content_regex:
+            return escape(log_rule.content)
+        pattern = compile(log_rule.content)
+        if pattern.groups or pattern.flags != compile("").flags:
+            return None
+        return log_rule.content
+
+    def compile(self) -> None:
+        prefiltered_rules, rules, patterns = [], [], []
         with scheduler.app.app_context():
-            data = str(bytes.decode(self.request[0].strip()))
-            source, _ = self.client_address
-            log_rules = []
             for log_rule in LogRule.query.all():
-                source_match = (
-                    search(log_rule.source_ip, source)
-                    if log_rule.source_ip_regex
-                    else log_rule.source_ip in source
-                )
-                content_match = (
-                    search(log_rule.content, data)
-                    if log_rule.content_regex
-                    else log_rule.content in data
+                try:
+                    rule = (
+                        log_rule.id,
+                        self.compile_property(
+                            log_rule.source_ip, log_rule.source_ip_regex
+                        ),
+                        self.compile_property(log_rule.content, log_rule.content_regex),
+                        [job.id for job in log_rule.jobs],
+                    )
+                    pattern = self.prefilter_pattern(log_rule)
+                except error as exc:
+                    info(f"Log rule {log_rule.name} ignored (invalid regex: {exc})")
+                    continue
+                if pattern is None:
+                    rules.append(rule)
+                else:
+                    prefiltered_rules.append(rule)
+                    patterns.append(pattern)
+        self.rules = (prefiltered_rules, rules)
+        self.prefilter = (
+            compile("|".join(f"(?:{pattern})" for pattern in patterns))
+            if patterns
+            else None
+        )
+
+    def match(self, source: str, content: str) -> List[CompiledLogRule]:
+        with self.lock:
+            if self.rules is None:
+                self.compile()
+            (prefiltered_rules, rules), prefilter = self.rules, self.prefilter
+        if prefilter and prefilter.search(content):
+            rules = prefiltered_rules + rules
+        return [rule for rule in rules if rule[1](source) and rule[2](content)]
+
+    def dispatch(self, job_ids: List[int]) -> None:
+        for job_id in job_ids:
+            with self.lock:
+                if job_id in self.running_jobs:
+                    continue
+                self.running_jobs.add(job_id)
+            self.executor.submit(log_rule_job, job_id)
+
+    def job_done(self, job_id: int) -> None:
+        with self.lock:
+            self.running_jobs.discard(job_id)
+
+
+log_rule_matcher = LogRuleMatcher()
+
+
+def log_rule_job(job_id: int) -> None:
+    try:
+        scheduler_job(job_id)
+    finally:
+        log_rule_matcher.job_done(job_id)
+
+
+@event.listens_for(Session, "before_flush")
+def detect_log_rule_changes(session: Session, *args: Any) -> None:
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, LogRule) or (
+            not isinstance(obj, Log)
+            and hasattr(obj, "log_rules")
+            and (
+                obj in session.deleted
+                or inspect(obj).attrs.log_rules.history.has_changes()
+            )
+        ):
+            session.info["log_rules_changed"] = True
+            parameters = classes["Parameters"].__table__
+            version = parameters.c.log_rules_version
+            session.execute(
+                parameters.update().values(
+                    log_rules_version=func.coalesce(version, 0) + 1
                 )
-                if source_match and content_match:
-                    log_rules.append(log_rule)
-                    for job in log_rule.jobs:
-                        job.try_run()
-            if log_rules:
-                log = Log(**{"source": source, "date": data, "log_rules": log_rules})
-                db.session.add(log)
-                db.session.commit()
+            )
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_log_rules(session: Session) -> None:
+    if session.info.pop("log_rules_changed", False):
+        log_rule_matcher.invalidate()
 
 
 class SyslogServer(Base):
@@ -73,14 +200,81 @@ class SyslogServer(Base):
     def __init__(self, ip_address: str, port: int) -> None:
         self.ip_address = ip_address
         self.port = port
-        self.start()
 
     def __repr__(self) -> str:
         return self.ip_address
 
-    def start(self) -> None:
-        UDPServer.allow_reuse_address = True
-        self.server = UDPServer((self.ip_address, self.port), SyslogUDPHandler)
-        th = Thread(target=self.server.serve_forever)
-        th.daemon = True
-        th.start()
+    def start(
+        self, buffer_size: int = 10000, batch_size: int = 500, batch_interval: int = 200
+    ) -> None:
+        self.buffer: Deque[Tuple[str, bytes]] = deque(maxlen=buffer_size)
+        self.batch_size, self.batch_interval = batch_size, batch_interval
+        self.condition = Condition()
+        self.counters: Counter = Counter()
+        self.socket = socket(AF_INET, SOCK_DGRAM)
+        self.socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.socket.bind((self.ip_address, self.port))
+        for target in (self.receive, self.process):
+            Thread(target=target, daemon=True).start()
+
+    def receive(self) -> None:
+        while True:
+            data, (source, _) = self.socket.recvfrom(65535)
+            with self.condition:
+                self.counters["received"] += 1
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.counters["dropped"] += 1
+                self.buffer.append((source, data))
+                if len(self.buffer) >= self.batch_size:
+                    self.condition.notify()
+
+    def process(self) -> None:
+        while True:
+            with self.condition:
+                if len(self.buffer) < self.batch_size:
+                    self.condition.wait(self.batch_interval / 1000)
+                messages = list(self.buffer)
+                self.buffer.clear()
+            if messages:
+                self.process_batch(messages)
+
+    def process_batch(self, messages: List[Tuple[str, bytes]]) -> None:
+        logs, job_ids = [], set()
+        try:
+            log_rule_matcher.refresh()
+        except Exception as exc:
+            info(f"Log rules version could not be checked ({exc})")
+        for source, data in messages:
+            content = data.decode(errors="replace").strip()
+            rules = log_rule_matcher.match(source, content)
+            if rules:
+                logs.append((source, content, [rule[0] for rule in rules]))
+                job_ids.update(job_id for rule in rules for job_id in rule[3])
+        with self.condition:
+            self.counters["matched"] += len(logs)
+        log_rule_matcher.dispatch(sorted(job_ids))
+        if logs:
+            self.store(logs)
+
+    def store(self, logs: List[Tuple[str, str, List[int]]]) -> None:
+        with scheduler.app.app_context():
+            try:
+                mappings = [
+                    {"source_ip": source, "content": content}
+                    for source, content, _ in logs
+                ]
+                db.session.bulk_insert_mappings(Log, mappings, return_defaults=True)
+                db.session.execute(
+                    log_rule_log_table.insert(),
+                    [
+                        {"log_id": mapping["id"], "log_rule_id": rule_id}
+                        for mapping, (_, _, rule_ids) in zip(mappings, logs)
+                        for rule_id in rule_ids
+                    ],
+                )
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                info(f"{len(logs)} syslog messages could not be stored ({exc})")
+                with self.condition:
+                    self.counters["failed"] += len(logs)
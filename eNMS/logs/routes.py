@@ -1,6 +1,6 @@
-from flask import request
+from flask import current_app, request
 
-from eNMS.base.helpers import get, serialize
+from eNMS.base.helpers import get, post, serialize
 from eNMS.base.properties import log_public_properties, log_rule_table_properties
 from eNMS.logs import bp
 from eNMS.logs.forms import LogAutomationForm
@@ -8,7 +8,7 @@ from eNMS.logs.forms import LogAutomationForm
 
 @get(bp, "/log_management", "View")
 def log_management() -> dict:
-    return dict(fields=log_public_properties, logs=serialize("Log"))
+    return dict(fields=log_public_properties, logs=serialize("Log", relation_ids=True))
 
 
 @get(bp, "/log_automation", "View")
@@ -16,5 +16,14 @@ def log_automation() -> dict:
     return dict(
         log_automation_form=LogAutomationForm(request.form),
         fields=log_rule_table_properties,
-        log_rules=serialize("LogRule"),
+        log_rules=serialize("LogRule", relation_ids=True),
     )
+
+
+@post(bp, "/syslog_counters", "View")
+def syslog_counters() -> dict:
+    server = getattr(current_app, "syslog_server", None)
+    if not server:
+        return {"error": "The syslog server is not enabled."}
+    with server.condition:
+        return {**server.counters, "buffered": len(server.buffer)}
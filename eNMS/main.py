@@ -1,3 +1,4 @@
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask_httpauth import HTTPBasicAuth
 from flask_login import LoginManager
@@ -24,12 +25,12 @@ login_manager.session_protection = "strong"
 
 mail_client = Mail()
 
+# the job store is kept to read the next run times of all tasks in one query
+job_store = SQLAlchemyJobStore(url="sqlite:///jobs.sqlite")
+
 scheduler = BackgroundScheduler(
     {
-        "apscheduler.jobstores.default": {
-            "type": "sqlalchemy",
-            "url": "sqlite:///jobs.sqlite",
-        },
+        "apscheduler.jobstores.default": job_store,
         "apscheduler.executors.default": {
             "class": "apscheduler.executors.pool:ThreadPoolExecutor",
             "max_workers": "50",
@@ -39,7 +40,9 @@ scheduler = BackgroundScheduler(
         "apscheduler.job_defaults.max_instances": "3",
     }
 )
-scheduler.start()
+# jobs can be added to the job store by every eNMS process, but they are only
+# run by the process that holds the scheduler lease (see eNMS.scheduling)
+scheduler.start(paused=True)
 
 tacacs_client = (
     TACACSClient(environ.get("TACACS_ADDR"), 49, environ.get("TACACS_PASSWORD"))
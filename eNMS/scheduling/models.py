@@ -1,15 +1,63 @@
+from atexit import register
 from datetime import datetime
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from flask import Flask, g
+from logging import info
+from os import getpid
+from pathlib import Path
+from socket import gethostname
+from sqlalchemy import (
+    and_,
+    Boolean,
+    Column,
+    Float,
+    ForeignKey,
+    Integer,
+    or_,
+    select,
+    String,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
-from typing import Any, Optional, Tuple
+from threading import Thread
+from time import sleep, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import getnode, uuid4
 
-from eNMS.main import db, scheduler
+from eNMS.main import db, job_store, scheduler
 from eNMS.automation.helpers import scheduler_job
 from eNMS.base.models import Base
 
 
+# above this number of tasks, the whole job store is read instead of using an
+# IN clause (SQLite limits the number of parameters of a query)
+MAX_JOB_STORE_IDS = 500
+
+
+def next_run_times() -> Dict[str, Optional[datetime]]:
+    # next run times read from the job store, cached for the current request
+    if "next_run_times" not in g:
+        g.next_run_times = {}
+    return g.next_run_times
+
+
+def fetch_next_run_times(aps_job_ids: Iterable[str]) -> None:
+    snapshot = next_run_times()
+    missing = set(aps_job_ids) - set(snapshot)
+    if not missing:
+        return
+    jobs = job_store.jobs_t
+    query = select([jobs.c.id, jobs.c.next_run_time])
+    if len(missing) <= MAX_JOB_STORE_IDS:
+        query = query.where(jobs.c.id.in_(sorted(missing)))
+    snapshot.update(dict.fromkeys(missing))
+    with job_store.engine.connect() as connection:
+        for aps_job_id, timestamp in connection.execute(query):
+            if timestamp is not None:
+                snapshot[aps_job_id] = datetime.fromtimestamp(timestamp)
+
+
 class Task(Base):
 
     __tablename__ = "Task"
@@ -50,18 +98,21 @@ class Task(Base):
 
     def pause(self) -> None:
         scheduler.pause_job(self.aps_job_id)
+        next_run_times().pop(self.aps_job_id, None)
         self.is_active = False
         db.session.commit()
 
     def resume(self) -> None:
         self.schedule()
         scheduler.resume_job(self.aps_job_id)
+        next_run_times().pop(self.aps_job_id, None)
         self.is_active = True
         db.session.commit()
 
     def delete_task(self) -> None:
         if scheduler.get_job(self.aps_job_id):
             scheduler.remove_job(self.aps_job_id)
+        next_run_times().pop(self.aps_job_id, None)
         db.session.commit()
 
     def kwargs(self) -> Tuple[dict, dict]:
@@ -81,6 +132,9 @@ class Task(Base):
             }
         else:
             self.periodic = False
+            # a one-off run is delayed, not dropped, when no process holds the
+            # scheduler lease at its run date
+            default["misfire_grace_time"] = None
             trigger = {"trigger": "date", "run_date": self.aps_date("start_date")}
         return default, trigger
 
@@ -90,24 +144,139 @@ class Task(Base):
             scheduler.add_job(**{**default, **trigger})
         else:
             scheduler.reschedule_job(default.pop("id"), **trigger)
+        next_run_times().pop(self.aps_job_id, None)
 
     @hybrid_property
     def status(self) -> str:
         return "Active" if self.is_active else "Inactive"
 
-    @hybrid_property
+    @classmethod
+    def prefetch(cls, tasks: List["Task"]) -> None:
+        fetch_next_run_times(task.aps_job_id for task in tasks)
+
+    @property
+    def next_run(self) -> Optional[datetime]:
+        fetch_next_run_times([self.aps_job_id])
+        return next_run_times()[self.aps_job_id]
+
+    @property
     def next_run_time(self) -> Optional[str]:
-        job = scheduler.get_job(self.aps_job_id)
-        if job and job.next_run_time:
-            return job.next_run_time.strftime("%Y-%m-%d %H:%M:%S")
-        return None
+        next_run = self.next_run
+        return next_run.strftime("%Y-%m-%d %H:%M:%S") if next_run else None
 
-    @hybrid_property
+    @property
     def time_before_next_run(self) -> Optional[str]:
-        job = scheduler.get_job(self.aps_job_id)
-        if job and job.next_run_time:
-            delta = job.next_run_time.replace(tzinfo=None) - datetime.now()
+        next_run = self.next_run
+        if next_run:
+            delta = next_run - datetime.now()
             hours, remainder = divmod(delta.seconds, 3600)
             minutes, seconds = divmod(remainder, 60)
             return f"{hours}h:{minutes}m:{seconds}s"
         return None
+
+
+class SchedulerLease(Base):
+
+    __tablename__ = type = "SchedulerLease"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True)
+    holder = Column(String)
+    expiration = Column(Float)
+
+
+class SchedulerElection:
+    def __init__(self, lease_duration: float = 15, poll_interval: float = 1) -> None:
+        self.lease_duration = lease_duration
+        self.poll_interval = poll_interval
+        self.holder: Optional[str] = None
+        # there is one lease per job store: the processes that share a lease
+        # are those that share the sqlite job store of the scheduler
+        self.name = f"{gethostname()}:{Path.cwd()}"
+        self.is_leader = False
+        # the lease is renewed (or claimed, by the other processes) every third
+        # of its duration, and the leader steps down when it cannot renew it
+        self.expiration = self.renewal = 0.0
+        self.app: Optional[Flask] = None
+        self.elector: Optional[Thread] = None
+
+    def start(self, app: Flask) -> None:
+        self.app = app
+        if self.elector:
+            return
+        self.holder = f"{getnode()}-{getpid()}-{uuid4().hex[:8]}"
+        self.elector = Thread(target=self.elect_periodically)
+        self.elector.daemon = True
+        self.elector.start()
+        register(self.release)
+
+    def elect_periodically(self) -> None:
+        while True:
+            if time() >= self.renewal:
+                with self.app.app_context():
+                    try:
+                        self.elect()
+                    except Exception as e:
+                        info(f"Scheduler lease renewal failed ({str(e)})")
+                        db.session.rollback()
+                        if time() >= self.expiration - self.poll_interval:
+                            self.step(False)
+            if self.is_leader:
+                # pick up the jobs added to the job store by other processes
+                scheduler.wakeup()
+            sleep(self.poll_interval)
+
+    def elect(self) -> None:
+        now, lease = time(), SchedulerLease.__table__
+        expiration = now + self.lease_duration
+        claim = (
+            lease.update()
+            .where(
+                and_(
+                    lease.c.name == self.name,
+                    or_(lease.c.holder == self.holder, lease.c.expiration < now),
+                )
+            )
+            .values(holder=self.holder, expiration=expiration)
+        )
+        leader = bool(db.session.execute(claim).rowcount)
+        if not leader and not SchedulerLease.query.filter_by(name=self.name).count():
+            values = {"holder": self.holder, "expiration": expiration}
+            db.session.add(SchedulerLease(name=self.name, **values))
+            leader = True
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another process created the lease first
+            db.session.rollback()
+            leader = False
+        if leader:
+            self.expiration = expiration
+        self.renewal = now + self.lease_duration / 3
+        self.step(leader)
+
+    def step(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            info(f"Process {self.holder} is now running the scheduled jobs")
+            scheduler.resume()
+        else:
+            info(f"Process {self.holder} is no longer running the scheduled jobs")
+            scheduler.pause()
+
+    def release(self) -> None:
+        if not self.is_leader:
+            return
+        self.step(False)
+        try:
+            with self.app.app_context():
+                SchedulerLease.query.filter_by(holder=self.holder).update(
+                    {"expiration": 0}, synchronize_session=False
+                )
+                db.session.commit()
+        except Exception as e:
+            info(f"Scheduler lease release failed ({str(e)})")
+
+
+scheduler_election = SchedulerElection()
@@ -6,6 +6,7 @@ from eNMS.base.helpers import fetch, fetch_all, get, post
 from eNMS.base.properties import task_table_properties
 from eNMS.scheduling import bp
 from eNMS.scheduling.forms import SchedulingForm
+from eNMS.scheduling.models import Task
 
 
 @get(bp, "/task_management", "View")
@@ -17,8 +18,9 @@ def task_management() -> dict:
 
 @get(bp, "/calendar", "View")
 def calendar() -> dict:
-    tasks = {}
-    for task in fetch_all("Task"):
+    tasks, all_tasks = {}, fetch_all("Task")
+    Task.prefetch(all_tasks)
+    for task in all_tasks:
         # javascript dates range from 0 to 11, we must account for that by
         # substracting 1 to the month for the date to be properly displayed in
         # the calendar
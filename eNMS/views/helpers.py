@@ -0,0 +1,138 @@
+from collections import defaultdict
+from math import floor
+from sqlalchemy import and_, or_, select
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from eNMS.main import db
+from eNMS.base.associations import pool_device_table, pool_link_table
+from eNMS.base.classes import classes
+
+# Width of a cluster cell, in pixels of a 256 pixels map tile.
+CLUSTER_CELL_SIZE = 64
+
+BoundingBox = Tuple[float, float, float, float]
+
+device_columns = ("id", "name", "subtype", "latitude", "longitude")
+link_columns = (
+    "id",
+    "name",
+    "subtype",
+    "source",
+    "destination",
+    "source_latitude",
+    "source_longitude",
+    "destination_latitude",
+    "destination_longitude",
+)
+cluster_columns = ("latitude", "longitude", "count")
+
+
+def columnar(columns: Sequence[str], rows: Sequence[tuple]) -> Dict[str, list]:
+    values = zip(*rows) if rows else [()] * len(columns)
+    return {column: list(value) for column, value in zip(columns, values)}
+
+
+def in_bounding_box(latitude: Any, longitude: Any, box: BoundingBox) -> Any:
+    south, west, north, east = box
+    if west <= east:
+        longitude_criteria = longitude.between(west, east)
+    else:
+        # the bounding box crosses the antimeridian
+        longitude_criteria = or_(longitude >= west, longitude <= east)
+    return and_(latitude.between(south, north), longitude_criteria)
+
+
+def cluster_topology(
+    devices: List[tuple], links: List[tuple], zoom: int
+) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    size = 360 * CLUSTER_CELL_SIZE / (256 * 2 ** zoom)
+    cells: Dict[Tuple[int, int], List[tuple]] = defaultdict(list)
+    isolated_devices, clusters, device_cluster = [], [], {}
+    for device in devices:
+        *_, latitude, longitude = device
+        if latitude is None or longitude is None:
+            isolated_devices.append(device)
+        else:
+            cells[(floor(latitude / size), floor(longitude / size))].append(device)
+    for members in cells.values():
+        if len(members) == 1:
+            isolated_devices.extend(members)
+            continue
+        latitude = sum(device[-2] for device in members) / len(members)
+        longitude = sum(device[-1] for device in members) / len(members)
+        for device in members:
+            device_cluster[device[0]] = (len(clusters), latitude, longitude)
+        clusters.append((latitude, longitude, len(members)))
+    clustered_links = []
+    for link in links:
+        source, destination = (device_cluster.get(link[index]) for index in (3, 4))
+        if source and destination and source[0] == destination[0]:
+            continue
+        source_position = source[1:] if source else link[5:7]
+        destination_position = destination[1:] if destination else link[7:9]
+        clustered_links.append((*link[:5], *source_position, *destination_position))
+    return isolated_devices, clustered_links, clusters
+
+
+def topology(
+    bounding_box: Optional[BoundingBox], zoom: Optional[int], pool: Optional[int] = None
+) -> dict:
+    device, link = classes["Device"], classes["Link"]
+    source, destination = device.__table__.alias(), device.__table__.alias()
+    devices = (
+        db.session.query(*(getattr(device, column) for column in device_columns))
+        .select_from(device)
+        .filter(device.hidden.isnot(True))
+    )
+    links = (
+        db.session.query(
+            link.id,
+            link.name,
+            link.subtype,
+            link.source_id,
+            link.destination_id,
+            source.c.latitude,
+            source.c.longitude,
+            destination.c.latitude,
+            destination.c.longitude,
+        )
+        .select_from(link)
+        .join(source, link.source_id == source.c.id)
+        .join(destination, link.destination_id == destination.c.id)
+        .filter(link.hidden.isnot(True))
+    )
+    if pool:
+        devices = devices.filter(
+            device.id.in_(
+                select([pool_device_table.c.device_id]).where(
+                    pool_device_table.c.pool_id == pool
+                )
+            )
+        )
+        links = links.filter(
+            link.id.in_(
+                select([pool_link_table.c.link_id]).where(
+                    pool_link_table.c.pool_id == pool
+                )
+            )
+        )
+    if bounding_box:
+        devices = devices.filter(
+            in_bounding_box(device.latitude, device.longitude, bounding_box)
+        )
+        links = links.filter(
+            or_(
+                in_bounding_box(source.c.latitude, source.c.longitude, bounding_box),
+                in_bounding_box(
+                    destination.c.latitude, destination.c.longitude, bounding_box
+                ),
+            )
+        )
+    devices, links, clusters = devices.all(), links.all(), []
+    if zoom is not None:
+        devices, links, clusters = cluster_topology(devices, links, zoom)
+    return {
+        "devices": columnar(device_columns, devices),
+        "links": columnar(link_columns, links),
+        "clusters": columnar(cluster_columns, clusters),
+    }
@@ -1,4 +1,5 @@
-from flask import current_app as app, request
+from flask import current_app as app, jsonify, request
+from flask.wrappers import Response
 from simplekml import Kml
 from typing import Union
 
@@ -7,11 +8,19 @@ from eNMS.base.properties import device_subtypes, link_subtype_to_color
 from eNMS.inventory.forms import AddDevice, AddLink, GottyConnectionForm
 from eNMS.views import bp, styles
 from eNMS.views.forms import GoogleEarthForm
+from eNMS.views.helpers import topology
 
 
 @get(bp, "/<view_type>_view", "View", ["GET", "POST"])
 def view(view_type: str) -> dict:
-    devices, parameters = fetch_all("Device"), get_one("Parameters").serialized
+    parameters, objects = get_one("Parameters").serialized, {}
+    if view_type == "logical":
+        devices = fetch_all("Device")
+        objects = dict(
+            name_to_id={d.name: id for id, d in enumerate(devices)},
+            devices=serialize("Device", relation_ids=True),
+            links=serialize("Link"),
+        )
     return dict(
         template=f"{view_type}_view.html",
         pools=fetch_all("Pool"),
@@ -23,12 +32,25 @@ def view(view_type: str) -> dict:
         device_subtypes=device_subtypes,
         gotty_connection_form=GottyConnectionForm(request.form),
         link_colors=link_subtype_to_color,
-        name_to_id={d.name: id for id, d in enumerate(devices)},
-        devices=serialize("Device"),
-        links=serialize("Link"),
+        **objects,
     )
 
 
+@get(bp, "/topology", "View")
+def get_topology() -> Response:
+    bounding_box, zoom = request.args.get("bbox"), request.args.get("zoom")
+    response = jsonify(
+        topology(
+            tuple(map(float, bounding_box.split(","))) if bounding_box else None,
+            int(zoom) if zoom else None,
+            request.args.get("pool", type=int),
+        )
+    )
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @get(bp, "/export_to_google_earth", "View")
 def export_to_google_earth() -> bool:
     kml_file = Kml()
@@ -2,12 +2,11 @@
 global
 alertify: false
 call: false
+getTopology: false
 L: false
 layers: false
-links: false
 link_colors: false
 markersArray: true
-devices: false
 parameters: false
 partial: false
 polylinesArray: true
@@ -22,7 +21,13 @@ let markers;
 // hiddenMarkers contains all markers that were undisplayed because of a
 // pool filter. We keep track of them so that they are not selected by the
 // boxzoomend when they are hidden.
-let hiddenMarkers;
+let hiddenMarkers = [];
+// with clustering, only the part of the topology displayed on the map is
+// fetched: requestId is used to ignore the responses of outdated requests.
+let requestId = 0;
+// with clustering, the pool filter is applied by the server: poolFilter is
+// the id of the selected pool, sent with every request.
+let poolFilter;
 
 const map = L.map('mapid').setView(
   [parameters.default_latitude, parameters.default_longitude],
@@ -32,7 +37,7 @@ const osmLayer = L.tileLayer(layers['osm']);
 map.addLayer(osmLayer);
 let currentLayer = osmLayer;
 if (view == '2DC') {
-  markers = L.markerClusterGroup();
+  markers = L.layerGroup().addTo(map);
 }
 
 /**
@@ -61,25 +66,13 @@ Object.keys(device_subtypes).forEach(function(subtype) {
   });
 });
 
-// Create a new vector type with getLatLng and setLatLng methods.
-L.PolylineClusterable = L.Polyline.extend({
-  _originalInitialize: L.Polyline.prototype.initialize,
-  initialize: function(bounds, options) {
-    this._originalInitialize(bounds, options);
-    this._latlng = this.getBounds().getCenter();
-  },
-  getLatLng: function() {
-    return this._latlng;
-  },
-  setLatLng: function() {
-    // setter
-  },
-});
-
 const routerIcon = window['icon_router'];
 
-for (let i = 0; i < devices.length; i++) {
-  const device = devices[i];
+/**
+ * Display a device.
+ * @param {device} device - Device.
+ */
+function createMarker(device) {
   const marker = L.marker([
     device.latitude,
     device.longitude,
@@ -106,24 +99,26 @@ for (let i = 0; i < devices.length; i++) {
     marker.addTo(map);
   } else {
     markers.addLayer(marker);
-    map.addLayer(markers);
   }
 }
 
-for (let i = 0; i < links.length; i++) {
-  const link = links[i];
+/**
+ * Display a link.
+ * @param {link} link - Link.
+ */
+function createPolyline(link) {
   let pointA = new L.LatLng(
-    link.source.latitude,
-    link.source.longitude
+    link.source_latitude,
+    link.source_longitude
   );
   let pointB = new L.LatLng(
-    link.destination.latitude,
-    link.destination.longitude
+    link.destination_latitude,
+    link.destination_longitude
   );
 
   const pointList = [pointA, pointB];
-  const polyline = new L.PolylineClusterable(pointList, {
-    color: link_colors[links[i].subtype],
+  const polyline = new L.Polyline(pointList, {
+    color: link_colors[link.subtype],
     weight: 3,
     opacity: 1,
     smoothFactor: 1,
@@ -143,6 +138,73 @@ for (let i = 0; i < links.length; i++) {
   }
 }
 
+/**
+ * Display a cluster of devices: a click on the cluster zooms in.
+ * @param {cluster} cluster - Position and number of devices of the cluster.
+ */
+function createCluster(cluster) {
+  const size = cluster.count < 10 ? 'small'
+    : cluster.count < 100 ? 'medium' : 'large';
+  const marker = L.marker([cluster.latitude, cluster.longitude], {
+    icon: L.divIcon({
+      html: `<div><span>${cluster.count}</span></div>`,
+      className: `marker-cluster marker-cluster-${size}`,
+      iconSize: L.point(40, 40),
+    }),
+  });
+  marker.on('click', function(e) {
+    map.setView(e.latlng, map.getZoom() + 2);
+  });
+  markers.addLayer(marker);
+}
+
+/**
+ * Display the devices, links and clusters of the topology.
+ * @param {topology} topology - Topology.
+ */
+function displayTopology(topology) {
+  topology.links.forEach(createPolyline);
+  topology.devices.forEach(createMarker);
+  topology.clusters.forEach(createCluster);
+}
+
+/**
+ * Fetch and display the part of the topology shown on the map, clustered
+ * by the server according to the zoom level.
+ */
+function updateClusters() {
+  const bounds = map.getBounds();
+  // colocated devices can only be told apart once clustering stops
+  const params = map.getZoom() < map.getMaxZoom() ? {zoom: map.getZoom()} : {};
+  if (bounds.getEast() - bounds.getWest() < 360) {
+    params.bbox = [
+      bounds.getSouth(),
+      L.Util.wrapNum(bounds.getWest(), [-180, 180], true),
+      bounds.getNorth(),
+      L.Util.wrapNum(bounds.getEast(), [-180, 180], true),
+    ].join(',');
+  }
+  if (poolFilter) {
+    params.pool = poolFilter;
+  }
+  const currentRequest = ++requestId;
+  getTopology(params, function(topology) {
+    if (currentRequest != requestId) return;
+    markers.clearLayers();
+    markersArray = [];
+    polylinesArray = [];
+    hiddenMarkers = [];
+    displayTopology(topology);
+  });
+}
+
+if (view == '2D') {
+  getTopology({}, displayTopology);
+} else {
+  map.on('moveend', updateClusters);
+  updateClusters();
+}
+
 /**
  * Unselect all devices.
  */
@@ -172,6 +234,12 @@ map.on('click', function(e) {
 
 // when a filter is selected, apply it
 $('#select-filters').on('change', function() {
+  if (view == '2DC') {
+    poolFilter = this.value;
+    updateClusters();
+    alertify.notify('Filter applied.', 'success', 5);
+    return;
+  }
   call(`/inventory/pool_objects/${this.value}`, function(objects) {
     hiddenMarkers = [];
     const devicesId = objects.devices.map((n) => n.id);
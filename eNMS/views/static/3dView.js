@@ -2,10 +2,10 @@
 global
 alertify: false
 call: false
+getTopology: false
 layers: false
-links: false
+link_colors: false
 markersArray: true
-devices: false
 partial: false
 polylinesArray: true
 selection: true
@@ -30,8 +30,11 @@ function switchLayer(layer) {
   $('.dropdown-submenu a.menu-layer').next('ul').toggle();
 }
 
-for (let i = 0; i < devices.length; i++) {
-  const device = devices[i];
+/**
+ * Display a device.
+ * @param {device} device - Device.
+ */
+function createMarker(device) {
   const marker = WE.marker(
   [device.latitude, device.longitude],
   'static/images/3D/default/router.gif',
@@ -44,13 +47,13 @@ for (let i = 0; i < devices.length; i++) {
       'background-image',
       'url("static/images/3D/selection/router.gif")'
       );
-      selection.push(devices[i].id);
+      selection.push(device.id);
       $('#devices').val(selection);
     */
-    showTypeModal('device', devices[i].id);
+    showTypeModal('device', device.id);
   });
   marker.on('mouseover', function(e) {
-    $('#name-box').text(devices[i].name);
+    $('#name-box').text(device.name);
     $('#name-box').show();
   });
   marker.on('mouseout', function(e) {
@@ -59,13 +62,16 @@ for (let i = 0; i < devices.length; i++) {
   markersArray.push(marker);
 }
 
-for (let i = 0; i < links.length; i++) {
-  const link = links[i];
-  const sourceLatitude = link.source.latitude;
-  const sourceLongitude = link.source.longitude;
-  const destinationLatitude = link.destination.latitude;
-  const destinationLongitude = link.destination.longitude;
-  const color = link.color;
+/**
+ * Display a link.
+ * @param {link} link - Link.
+ */
+function createLink(link) {
+  const sourceLatitude = link.source_latitude;
+  const sourceLongitude = link.source_longitude;
+  const destinationLatitude = link.destination_latitude;
+  const destinationLongitude = link.destination_longitude;
+  const color = link_colors[link.subtype];
   const polygonSD = WE.polygon(
   [
     [sourceLatitude, sourceLongitude],
@@ -84,6 +90,11 @@ for (let i = 0; i < links.length; i++) {
   polylinesArray.push(polygonSD, polygonDS);
 }
 
+getTopology({}, function(topology) {
+  topology.devices.forEach(createMarker);
+  topology.links.forEach(createLink);
+});
+
 // when a filter is selected, apply it
 $('#select-filters').on('change', function() {
   call(`/inventory/pool_objects/${this.value}`, function(objects) {
@@ -15,6 +15,37 @@ let markersArray = []; // eslint-disable-line no-unused-vars
 let polylinesArray = []; // eslint-disable-line no-unused-vars
 let selection = []; // eslint-disable-line no-unused-vars
 
+/**
+ * Convert the columnar arrays returned by the server into objects.
+ * @param {columns} columns - Values of each property.
+ * @return {objects} List of objects.
+ */
+function toObjects(columns) {
+  const properties = Object.keys(columns);
+  return columns[properties[0]].map((_, index) => {
+    const object = {};
+    properties.forEach((property) => {
+      object[property] = columns[property][index];
+    });
+    return object;
+  });
+}
+
+/**
+ * Get the devices, links and clusters to display.
+ * @param {params} params - Bounding box and zoom level (for clustering).
+ * @param {callback} callback - Function to display the topology.
+ */
+function getTopology(params, callback) { // eslint-disable-line no-unused-vars
+  $.getJSON('/views/topology', params, function(topology) {
+    callback({
+      devices: toObjects(topology.devices),
+      links: toObjects(topology.links),
+      clusters: toObjects(topology.clusters),
+    });
+  });
+}
+
 /**
  * Export project to Google Earth (creation of a .kmz file).
  */
@@ -2,6 +2,8 @@ from os import environ
 
 bind = "0.0.0.0:5000"
 workers = 5
+# each job event stream (Workflow Builder, logs window) holds a thread open
+threads = int(environ.get("GUNICORN_THREADS", 20))
 accesslog = environ.get("GUNICORN_ACCESS_LOG", "-")
 loglevel = environ.get("GUNICORN_LOG_LEVEL", "debug").lower()
 capture_output = True
@@ -0,0 +1,64 @@
+from os import environ
+from pathlib import Path
+from sqlalchemy import event
+from time import perf_counter
+from typing import Any, Callable
+
+environ["CREATE_EXAMPLES"] = "0"
+
+from eNMS import create_app, db  # noqa: E402
+from eNMS.config import config_dict  # noqa: E402
+from eNMS.inventory.models import Device, Link  # noqa: E402
+
+PAGE_SIZES = (100, 1000, 10000)
+
+queries = 0
+
+
+def count_query(*args: Any) -> None:
+    global queries
+    queries += 1
+
+
+def legacy_serialize(model: db.Model) -> list:
+    return [obj.serialized for obj in model.query.all() if obj.visible]
+
+
+def benchmark(name: str, size: int, serialize: Callable) -> None:
+    global queries
+    db.session.expunge_all()
+    queries, start_time = 0, perf_counter()
+    serialize(Device), serialize(Link)
+    duration = perf_counter() - start_time
+    print(f"{name} ({size} devices): {queries} queries, {duration:.2f}s")
+
+
+app = create_app(Path.cwd(), config_dict["Debug"])
+with app.app_context():
+    for size in PAGE_SIZES:
+        db.drop_all()
+        app.test_client().get("/")
+        db.session.bulk_insert_mappings(
+            Device,
+            [
+                {"id": index, "type": "Device", "name": f"device{index}"}
+                for index in range(1, size + 1)
+            ],
+        )
+        db.session.bulk_insert_mappings(
+            Link,
+            [
+                {
+                    "type": "Link",
+                    "name": f"link{index}",
+                    "source_id": index,
+                    "destination_id": index % size + 1,
+                }
+                for index in range(1, size + 1)
+            ],
+        )
+        db.session.commit()
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        benchmark("object by object", size, legacy_serialize)
+        benchmark("bulk", size, lambda model: model.serialize())
+        event.remove(db.engine, "before_cursor_execute", count_query)
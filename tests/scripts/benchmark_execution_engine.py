@@ -0,0 +1,66 @@
+from asyncio import sleep as async_sleep
+from collections import namedtuple
+from time import perf_counter, sleep
+from tracemalloc import get_traced_memory, start, stop
+
+from eNMS.automation.models import Job
+
+FakeDevice = namedtuple("FakeDevice", "name")
+
+NUMBER_OF_DEVICES = 10000
+MAX_PROCESSES = 50
+DEVICE_LATENCY = 0.01
+
+
+class StubService:
+
+    id = 0
+    max_processes = MAX_PROCESSES
+    multiprocessing = True
+    use_workflow_targets = False
+    get_results = Job.get_results
+    device_run = Job.device_run
+    async_get_results = Job.async_get_results
+    async_device_run = Job.async_device_run
+    async_devices_run = Job.async_devices_run
+    threadpool_run = Job.threadpool_run
+    asyncio_run = Job.asyncio_run
+    execution_engines = Job.execution_engines
+    run = Job.run
+
+    def __init__(self, execution_engine: str) -> None:
+        self.execution_engine = execution_engine
+
+    def job(self, payload: dict, device: FakeDevice) -> dict:
+        sleep(DEVICE_LATENCY)
+        return {"success": True, "result": device.name}
+
+
+class AsyncStubService(StubService):
+    async def job(self, payload: dict, device: FakeDevice) -> dict:
+        await async_sleep(DEVICE_LATENCY)
+        return {"success": True, "result": device.name}
+
+
+def benchmark(service: StubService) -> None:
+    targets = {FakeDevice(f"device{i}") for i in range(NUMBER_OF_DEVICES)}
+    start()
+    start_time = perf_counter()
+    results, _ = service.run({}, targets)
+    duration = perf_counter() - start_time
+    _, peak = get_traced_memory()
+    stop()
+    assert results["success"]
+    print(
+        f"{type(service).__name__} ({service.execution_engine}): "
+        f"{NUMBER_OF_DEVICES / duration:.0f} devices/s, "
+        f"peak memory {peak / 1_000_000:.1f} MB"
+    )
+
+
+for service in (
+    StubService("threadpool"),
+    StubService("asyncio"),
+    AsyncStubService("asyncio"),
+):
+    benchmark(service)
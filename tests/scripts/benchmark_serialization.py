@@ -0,0 +1,91 @@
+from json import dumps
+from os import environ
+from pathlib import Path
+from time import perf_counter
+
+environ["CREATE_EXAMPLES"] = "0"
+
+from eNMS import create_app, db  # noqa: E402
+from eNMS.base.properties import (  # noqa: E402
+    boolean_properties,
+    cls_to_properties,
+    private_properties,
+    property_types,
+)
+from eNMS.config import config_dict  # noqa: E402
+from eNMS.inventory.models import Device  # noqa: E402
+
+NUMBER_OF_DEVICES = 50000
+
+form = {
+    "name": "device",
+    "subtype": "router",
+    "vendor": "Cisco",
+    "port": "22",
+    "longitude": "2.35",
+    "latitude": "",
+}
+
+
+def legacy_get_properties(obj: Device) -> dict:
+    result = {}
+    for property in cls_to_properties[obj.type]:
+        if property in private_properties:
+            continue
+        try:
+            dumps(getattr(obj, property))
+            result[property] = getattr(obj, property)
+        except TypeError:
+            result[property] = str(getattr(obj, property))
+    return result
+
+
+def legacy_coerce(property: str, value: str) -> object:
+    property_type = property_types.get(property, None)
+    if property in boolean_properties:
+        return value not in (None, False)
+    elif "regex" in property:
+        return True
+    elif property_type in ["float", "int"]:
+        default_value = getattr(Device.__table__.c, property, None)
+        default_value = default_value.default if default_value is not None else None
+        if default_value and not value:
+            value = default_value.arg
+        return {"float": float, "int": int}[property_type](value or 0)
+    return value
+
+
+def report(name: str, duration: float) -> None:
+    print(f"{name}: {NUMBER_OF_DEVICES / duration:.0f} devices/s")
+
+
+app = create_app(Path.cwd(), config_dict["Debug"])
+with app.app_context():
+    db.drop_all()
+    app.test_client().get("/")
+    db.session.bulk_insert_mappings(
+        Device,
+        [
+            {"type": "Device", "name": f"device{index}", "subtype": "router"}
+            for index in range(NUMBER_OF_DEVICES)
+        ],
+    )
+    db.session.commit()
+    devices = Device.query.all()
+    for name, serialize in (
+        ("legacy serialization", legacy_get_properties),
+        ("compiled serialization", Device.get_properties),
+    ):
+        start_time = perf_counter()
+        for device in devices:
+            serialize(device)
+        report(name, perf_counter() - start_time)
+    for name, coerce in (
+        ("legacy coercion", legacy_coerce),
+        ("compiled coercion", Device.coerce),
+    ):
+        start_time = perf_counter()
+        for _ in range(NUMBER_OF_DEVICES):
+            for property, value in form.items():
+                coerce(property, value)
+        report(name, perf_counter() - start_time)
@@ -0,0 +1,67 @@
+from os import environ
+from pathlib import Path
+from time import perf_counter
+
+environ["CREATE_EXAMPLES"] = "0"
+
+from eNMS import create_app, db  # noqa: E402
+from eNMS.base.properties import device_table_properties  # noqa: E402
+from eNMS.config import config_dict  # noqa: E402
+from eNMS.inventory.models import Device  # noqa: E402
+
+INVENTORY_SIZES = (1000, 10000, 50000)
+NUMBER_OF_REQUESTS = 20
+
+
+def page_request(search: str = "", order: str = "asc") -> dict:
+    parameters = {
+        "draw": 1,
+        "start": 500,
+        "length": 50,
+        "order[0][column]": 0,
+        "order[0][dir]": order,
+    }
+    for index, _ in enumerate(device_table_properties):
+        parameters[f"columns[{index}][search][value]"] = ""
+    parameters["columns[0][search][value]"] = search
+    return parameters
+
+
+app = create_app(Path.cwd(), config_dict["Debug"])
+client = app.test_client()
+with app.app_context():
+    db.drop_all()
+    client.get("/")
+    client.post(
+        "/admin/login",
+        data={
+            "name": "admin",
+            "password": "admin",
+            "authentication_method": "Local User",
+        },
+    )
+    number_of_devices = 0
+    for size in INVENTORY_SIZES:
+        db.session.bulk_insert_mappings(
+            Device,
+            [
+                {"type": "Device", "name": f"device{index}", "subtype": "router"}
+                for index in range(number_of_devices, size)
+            ],
+            return_defaults=True,
+        )
+        db.session.commit()
+        number_of_devices = size
+        for search, order in (("", "asc"), ("device1", "desc")):
+            start_time = perf_counter()
+            for _ in range(NUMBER_OF_REQUESTS):
+                response = client.get(
+                    "/server_side_processing/device/device",
+                    query_string=page_request(search, order),
+                )
+                assert response.json["recordsTotal"] == size
+            latency = (perf_counter() - start_time) / NUMBER_OF_REQUESTS
+            print(
+                f"{size} devices, search '{search}' ({order}): "
+                f"{1000 * latency:.1f} ms per page"
+            )
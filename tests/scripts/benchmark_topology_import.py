@@ -0,0 +1,67 @@
+from io import BytesIO
+from pathlib import Path
+from random import uniform
+from time import perf_counter
+from typing import Callable
+from xlrd import Book, open_workbook
+from xlwt import Workbook
+
+from eNMS import create_app, db
+from eNMS.base.default import create_default_parameters
+from eNMS.config import config_dict
+from eNMS.inventory.helpers import bulk_object_import, row_object_import
+
+NUMBER_OF_DEVICES = 30000
+NUMBER_OF_DEVICES_ROW_IMPORT = 1000
+
+
+def generate_topology(number_of_devices: int) -> Book:
+    workbook = Workbook()
+    devices, links = workbook.add_sheet("Device"), workbook.add_sheet("Link")
+    device_properties = ("name", "subtype", "ip_address", "longitude", "latitude")
+    link_properties = ("name", "subtype", "source_name", "destination_name")
+    for sheet, properties in ((devices, device_properties), (links, link_properties)):
+        for index, property in enumerate(properties):
+            sheet.write(0, index, property)
+    for i in range(1, number_of_devices + 1):
+        device_values = (
+            f"device{i}",
+            "router",
+            f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+            uniform(-40.0, 40.0),
+            uniform(-40.0, 40.0),
+        )
+        link_values = (
+            f"link{i}",
+            "ethernet_link",
+            f"device{i}",
+            f"device{i % number_of_devices + 1}",
+        )
+        for sheet, values in ((devices, device_values), (links, link_values)):
+            for index, value in enumerate(values):
+                sheet.write(i, index, value)
+    stream = BytesIO()
+    workbook.save(stream)
+    return open_workbook(file_contents=stream.getvalue())
+
+
+def benchmark(import_function: Callable, number_of_devices: int) -> None:
+    db.session.close()
+    db.drop_all()
+    db.create_all()
+    create_default_parameters(app)
+    book = generate_topology(number_of_devices)
+    start_time = perf_counter()
+    errors = import_function(book)
+    duration = perf_counter() - start_time
+    assert not errors
+    print(
+        f"{import_function.__name__}: {2 * number_of_devices} objects "
+        f"in {duration:.1f}s ({2 * number_of_devices / duration:.0f} objects/s)"
+    )
+
+
+app = create_app(Path.cwd(), config_dict["Debug"])
+with app.app_context():
+    benchmark(row_object_import, NUMBER_OF_DEVICES_ROW_IMPORT)
+    benchmark(bulk_object_import, NUMBER_OF_DEVICES)
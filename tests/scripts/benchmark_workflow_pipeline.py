@@ -0,0 +1,98 @@
+from collections import namedtuple
+from flask import Flask
+from random import Random
+from time import perf_counter, sleep
+
+from eNMS.automation.models import Job, Workflow, WorkflowPlan
+
+FakeDevice = namedtuple("FakeDevice", "id name")
+FakeEdge = namedtuple("FakeEdge", "subtype source_id destination_id")
+
+NUMBER_OF_DEVICES = 500
+NUMBER_OF_STEPS = 5
+MAX_PROCESSES = 50
+FAST_DEVICE_LATENCY = 0.01
+SLOW_DEVICE_LATENCY = 0.2
+SLOW_DEVICE_RATIO = 0.05
+
+
+class StubJob:
+
+    max_processes = MAX_PROCESSES
+    multiprocessing = True
+    execution_engine = "threadpool"
+    use_workflow_targets = False
+    number_of_retries = 0
+    time_between_retries = 0
+    waiting_time = 0
+    get_results = Job.get_results
+    device_run = Job.device_run
+    threadpool_run = Job.threadpool_run
+    execution_engines = Job.execution_engines
+    run = Job.run
+
+    def __init__(self, id: int, name: str) -> None:
+        self.id = id
+        self.name = name
+
+    def job(self, payload: dict, device: FakeDevice) -> dict:
+        slow = random.random() < SLOW_DEVICE_RATIO
+        sleep(SLOW_DEVICE_LATENCY if slow else FAST_DEVICE_LATENCY)
+        return {"success": True, "result": device.name}
+
+
+class StubWorkflow:
+
+    id = NUMBER_OF_STEPS + 1
+    name = "pipeline"
+    max_processes = MAX_PROCESSES
+    multiprocessing = True
+    execution_engine = "pipeline"
+    use_workflow_targets = True
+    last_modified = None
+    job_map = Workflow.job_map
+    next_job = Workflow.next_job
+    pipeline_run = Workflow.pipeline_run
+    device_walk = Workflow.device_walk
+    job_done = Workflow.job_done
+    device_step = Workflow.device_step
+    execution_engines = Workflow.execution_engines
+    run = Job.run
+
+    def __init__(self, steps: list) -> None:
+        start, end = StubJob(0, "Start"), StubJob(-1, "End")
+        chain = [start] + steps + [end]
+        self.jobs = [start, end] + steps
+        self.edges = [
+            FakeEdge("success", job.id, successor.id)
+            for job, successor in zip(chain, chain[1:])
+        ]
+        self.plan = WorkflowPlan(self)
+
+    def run_walk(self, app: Flask, plan: WorkflowPlan, device_id: int) -> dict:
+        return self.device_walk(plan, self.job_map(), devices[device_id])
+
+    def device_done(self, device: FakeDevice, device_results: dict) -> None:
+        pass
+
+
+def job_major(steps: list, targets: set) -> None:
+    for step in steps:
+        step.run({}, targets)
+
+
+def pipelined(steps: list, targets: set) -> None:
+    with Flask(__name__).app_context():
+        results, _ = StubWorkflow(steps).run({}, targets)
+    assert results["success"]
+
+
+random = Random(0)
+devices = [FakeDevice(i, f"device{i}") for i in range(NUMBER_OF_DEVICES)]
+targets = set(devices)
+for mode in (job_major, pipelined):
+    steps = [StubJob(i + 1, f"step{i}") for i in range(NUMBER_OF_STEPS)]
+    start_time = perf_counter()
+    mode(steps, targets)
+    duration = perf_counter() - start_time
+    print(f"{mode.__name__}: {NUMBER_OF_DEVICES / duration:.0f} devices/s")
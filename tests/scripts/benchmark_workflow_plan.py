@@ -0,0 +1,91 @@
+from collections import namedtuple
+from time import perf_counter
+
+from eNMS.automation.models import Job, Workflow, WorkflowPlan
+
+FakeEdge = namedtuple(
+    "FakeEdge", "workflow subtype source destination source_id destination_id"
+)
+
+NUMBER_OF_JOBS = 500
+NUMBER_OF_WORKFLOWS = 20
+NUMBER_OF_RUNS = 100
+
+
+class StubJob:
+
+    job_sources = Job.job_sources
+    job_successors = Job.job_successors
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.sources: list = []
+        self.destinations: list = []
+
+
+class StubWorkflow:
+
+    last_modified = None
+    next_job = Workflow.next_job
+
+    def __init__(self, jobs: list) -> None:
+        self.jobs = jobs
+        self.edges: list = []
+        start, end, *jobs = self.jobs
+        chain = [start] + jobs + [end]
+        for index, (job, successor) in enumerate(zip(chain, chain[1:])):
+            self.add_edge("success", job, successor)
+            self.add_edge("failure", job, end)
+            if index > 1:
+                self.add_edge("prerequisite", chain[index - 1], successor)
+
+    def add_edge(self, subtype: str, source: StubJob, destination: StubJob) -> None:
+        edge = FakeEdge(self, subtype, source, destination, source.id, destination.id)
+        source.destinations.append(edge)
+        destination.sources.append(edge)
+        self.edges.append(edge)
+
+
+def edge_scan(workflow: StubWorkflow) -> None:
+    pending, visited = [workflow.jobs[0]], set()
+    while pending:
+        job = pending.pop()
+        if any(
+            node not in visited for node in job.job_sources(workflow, "prerequisite")
+        ):
+            continue
+        visited.add(job)
+        for successor in job.job_successors(workflow, "success"):
+            if successor not in visited:
+                pending.append(successor)
+
+
+def compiled_plan(workflow: StubWorkflow, plan: WorkflowPlan) -> None:
+    pending, visited = [plan.start], set()
+    while True:
+        job_id = workflow.next_job(plan, pending, visited)
+        if job_id is None:
+            break
+        for successor in plan.successors(job_id, "success"):
+            if successor not in visited:
+                pending.append(successor)
+
+
+def report(name: str, duration: float, runs: int = NUMBER_OF_RUNS) -> None:
+    print(f"{name}: {duration / runs * 1000:.2f} ms")
+
+
+# jobs are shared between workflows, as Start and End are in eNMS
+jobs = [StubJob(i) for i in range(NUMBER_OF_JOBS + 2)]
+workflow, *_ = [StubWorkflow(jobs) for _ in range(NUMBER_OF_WORKFLOWS)]
+start_time = perf_counter()
+for _ in range(NUMBER_OF_RUNS):
+    edge_scan(workflow)
+report("edge scan (per run)", perf_counter() - start_time)
+start_time = perf_counter()
+plan = WorkflowPlan(workflow)
+report("plan compilation", perf_counter() - start_time, 1)
+start_time = perf_counter()
+for _ in range(NUMBER_OF_RUNS):
+    compiled_plan(workflow, plan)
+report("cached plan (per run)", perf_counter() - start_time)
@@ -1,6 +1,32 @@
 from logging import CRITICAL, disable
 from flask.testing import FlaskClient
-from typing import Callable, Dict
+from json import dumps, loads
+from sqlalchemy import event, inspect
+from time import sleep
+from typing import Any, Callable, Dict
+
+from eNMS import db
+from eNMS.base.classes import classes
+from eNMS.base.helpers import (
+    CounterCache,
+    create_table_indexes,
+    factory,
+    fetch,
+    fetch_all,
+    objectify,
+    SecretCache,
+    table_indexes,
+)
+from eNMS.base.models import Base
+from eNMS.base.properties import (
+    boolean_properties,
+    cls_to_properties,
+    device_table_properties,
+    private_properties,
+    property_types,
+    relationships,
+)
+from eNMS.inventory.models import Device
 
 disable(CRITICAL)
 
@@ -72,3 +98,206 @@ def test_urls(user_client: FlaskClient) -> None:
             assert r.status_code == 200
     r = user_client.get("/admin/logout", follow_redirects=True)
     test_authentication(user_client)
+
+
+def table_page(search: str = "", order_column: int = 0, order: str = "asc") -> dict:
+    parameters = {
+        "draw": 1,
+        "start": 0,
+        "length": 2,
+        "order[0][column]": order_column,
+        "order[0][dir]": order,
+    }
+    for index, _ in enumerate(device_table_properties):
+        parameters[f"columns[{index}][search][value]"] = ""
+    parameters["columns[0][search][value]"] = search
+    return parameters
+
+
+def test_server_side_processing(user_client: FlaskClient) -> None:
+    for index, vendor in enumerate(("Juniper", "Cisco", "Arista")):
+        factory("Device", name=f"table_device{index}", vendor=vendor)
+    db.session.commit()
+    url = "/server_side_processing/device/device"
+    page = user_client.get(url, query_string=table_page("table_device")).json
+    assert page["recordsTotal"] == Device.query.count()
+    assert page["recordsFiltered"] == 3
+    assert [row[0] for row in page["data"]] == ["table_device0", "table_device1"]
+    device = Device.query.filter_by(name="table_device0").one()
+    assert page["data"][0][: len(device_table_properties)] == [
+        getattr(device, property) for property in device_table_properties
+    ]
+    assert f"'{device.id}'" in "".join(page["data"][0][len(device_table_properties) :])
+    page = user_client.get(url, query_string=table_page("table_device", 0, "desc"))
+    assert [row[0] for row in page.json["data"]] == ["table_device2", "table_device1"]
+    vendor_column = device_table_properties.index("vendor")
+    page = user_client.get(url, query_string=table_page("table_device", vendor_column))
+    assert [row[0] for row in page.json["data"]] == ["table_device2", "table_device1"]
+    page = user_client.get(url, query_string=table_page("unknown_device")).json
+    assert page["recordsFiltered"] == 0 and not page["data"]
+
+
+def test_table_indexes(user_client: FlaskClient) -> None:
+    index = table_indexes[0]
+    index.drop(db.engine)
+    create_table_indexes()
+    create_table_indexes()
+    indexes = inspect(db.engine).get_indexes(index.table.name)
+    assert index.name in {table_index["name"] for table_index in indexes}
+
+
+def legacy_get_properties(obj: Base) -> dict:
+    result = {}
+    for property in cls_to_properties[obj.type]:
+        if property in private_properties:
+            continue
+        try:
+            dumps(getattr(obj, property))
+            result[property] = getattr(obj, property)
+        except TypeError:
+            result[property] = str(getattr(obj, property))
+    return result
+
+
+def legacy_coerce(model: Any, property: str, value: Any) -> Any:
+    serial = relationships.get(model.__tablename__, relationships["Service"])
+    property_type = property_types.get(property, None)
+    if property in serial:
+        return fetch(serial[property], id=value)
+    elif property[:-1] in serial:
+        return objectify(serial[property[:-1]], value)
+    elif property in boolean_properties:
+        return value not in (None, False)
+    elif "regex" in property:
+        return True
+    elif property_type == "dict" and type(value) == str:
+        return loads(value) if value else {}
+    elif property_type in ["float", "int"]:
+        default_value = getattr(model.__table__.c, property).default
+        if default_value and not value:
+            value = default_value.arg
+        return {"float": float, "int": int}[property_type](value or 0)
+    return value
+
+
+def test_compiled_serializers(user_client: FlaskClient) -> None:
+    device = factory("Device", name="serialized_device", port=23, longitude=1.5)
+    factory("Link", name="serialized_link", source=device.id, destination=device.id)
+    factory("Pool", name="serialized_pool", device_name="serialized")
+    for model in ("Device", "Link", "Pool", "Service", "Workflow", "Task", "User"):
+        for obj in fetch_all(model):
+            assert obj.get_properties() == legacy_get_properties(obj)
+
+
+def test_compiled_coercers(user_client: FlaskClient) -> None:
+    device = factory("Device", name="coerced_device")
+    user = fetch("User", name="admin")
+    for model, property, value in (
+        ("Device", "name", "router"),
+        ("Device", "port", ""),
+        ("Device", "port", "23"),
+        ("Device", "longitude", ""),
+        ("Device", "longitude", "2.35"),
+        ("Link", "source", device.id),
+        ("Pool", "never_update", None),
+        ("Pool", "never_update", "y"),
+        ("Pool", "device_name_regex", "y"),
+        ("Workflow", "multiprocessing", False),
+        ("Workflow", "max_parallel_jobs", ""),
+        ("Workflow", "devices", [device.id]),
+        ("Workflow", "creator", user.id),
+        ("ConfigurationBackupService", "number_of_configuration", ""),
+        ("ConfigurationBackupService", "global_delay_factor", "2"),
+        ("UpdateInventoryService", "update_dictionnary", '{"vendor": "Cisco"}'),
+        ("UpdateInventoryService", "update_dictionnary", ""),
+    ):
+        cls = classes[model]
+        coerced = cls.coercer(property, relationships=True)(value)
+        assert coerced == legacy_coerce(cls, property, value)
+        # the compiled coercers are reused
+        assert cls.coercer(property, relationships=True) is cls.coercer(
+            property, relationships=True
+        )
+
+
+def test_bulk_serialization(user_client: FlaskClient) -> None:
+    queries = []
+
+    def count_query(*args: Any) -> None:
+        queries.append(None)
+
+    def serialize_devices() -> int:
+        db.session.expire_all()
+        queries.clear()
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        classes["Device"].serialize(relation_ids=True)
+        event.remove(db.engine, "before_cursor_execute", count_query)
+        return len(queries)
+
+    service = fetch("Service", name="Start")
+    for index in range(6):
+        device = factory("Device", name=f"bulk_device{index}")
+        if index % 2:
+            service.devices.append(device)
+        link = {"source": device.id, "destination": device.id}
+        factory("Link", name=f"bulk_link{index}", **link)
+        if index == 2:
+            db.session.commit()
+            number_of_queries = serialize_devices()
+    db.session.commit()
+    # the relationships are loaded in a constant number of queries
+    assert serialize_devices() == number_of_queries
+    for model in ("Device", "Link", "Pool", "Service", "Workflow", "Task", "User"):
+        cls = classes[model]
+        db.session.expire_all()
+        objects = [obj for obj in cls.query.all() if obj.visible]
+        legacy = [obj.serialized for obj in objects]
+        legacy_ids = [obj.to_dict(relation_ids=True) for obj in objects]
+        db.session.expire_all()
+        assert cls.serialize() == legacy
+        db.session.expire_all()
+        assert cls.serialize(relation_ids=True) == legacy_ids
+    assert {
+        device["name"]: device["jobs"]
+        for device in classes["Device"].serialize(relation_ids=True)
+        if device["name"].startswith("bulk_device")
+    } == {f"bulk_device{index}": [service.id] * (index % 2) for index in range(6)}
+
+
+def test_secret_cache() -> None:
+    cache, path = SecretCache(ttl=0.1), "secret/data/Device/router1/password"
+    cache.store(path, "admin")
+    assert cache.get(path) == "admin"
+    cache.invalidate(path)
+    assert cache.get(path) is None
+    cache.store(path, "admin")
+    sleep(0.2)
+    assert cache.get(path) is None and not cache.secrets
+
+
+def test_secret_cache_synchronization(user_client: FlaskClient) -> None:
+    cache, path = SecretCache(), "secret/data/Device/router1/password"
+    cache.synchronize()
+    cache.store(path, "admin")
+    cache.synchronize()
+    assert cache.get(path) == "admin"
+    # a secret written to the Vault by another process
+    SecretCache.increment_version()
+    db.session.commit()
+    cache.synchronize()
+    assert cache.get(path) is None
+
+
+def test_counter_cache() -> None:
+    cache, computations = CounterCache(ttl=0.1), []
+
+    def compute() -> int:
+        computations.append(None)
+        return len(computations)
+
+    assert cache.get(("count", "Device"), compute) == 1
+    assert cache.get(("count", "Device"), compute) == 1
+    cache.invalidate()
+    assert cache.get(("count", "Device"), compute) == 2
+    sleep(0.2)
+    assert cache.get(("count", "Device"), compute) == 3
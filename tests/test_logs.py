@@ -1,8 +1,10 @@
 from flask.testing import FlaskClient
+from socket import AF_INET, SOCK_DGRAM, socket
+from time import sleep
 
 from eNMS import db
-from eNMS.base.helpers import fetch_all
-from eNMS.logs.models import Log
+from eNMS.base.helpers import fetch, fetch_all, get_one
+from eNMS.logs.models import Log, log_rule_matcher, SyslogServer
 
 from tests.test_base import check_blueprints
 
@@ -25,3 +27,56 @@ def test_create_logs(user_client: FlaskClient) -> None:
         db.session.add(log_object)
         db.session.commit()
     assert len(fetch_all("Log")) == 2
+
+
+@check_blueprints("", "/logs")
+def test_log_rule_matcher(user_client: FlaskClient) -> None:
+    rules = (
+        {"name": "up", "content": "changed state to up"},
+        {"name": "down", "content": "state to (down|up)", "content_regex": "y"},
+        {"name": "source", "source_ip": "192.168.1.1", "content": "LINEPROTO"},
+    )
+    for rule in rules:
+        user_client.post("/update/logrule", data=rule)
+    matches = {rule[0] for rule in log_rule_matcher.match("192.168.1.10", log1)}
+    names = ("up", "down", "source")
+    assert matches == {fetch("LogRule", name=name).id for name in names}
+    matches = {rule[0] for rule in log_rule_matcher.match("10.0.0.1", log2)}
+    assert matches == {fetch("LogRule", name="down").id}
+    user_client.post("/update/logrule", data={"name": "down", "content": "none"})
+    log_rule_matcher.refresh()
+    assert not log_rule_matcher.match("10.0.0.1", log2)
+    # a log rule modified by another process: no local invalidation, only
+    # the version stored in the database changes
+    log_rule_table = fetch("LogRule", name="down").__table__
+    db.session.execute(
+        log_rule_table.update()
+        .where(log_rule_table.c.name == "down")
+        .values(content="to down")
+    )
+    parameters = get_one("Parameters")
+    parameters.log_rules_version += 1
+    db.session.commit()
+    assert not log_rule_matcher.match("10.0.0.1", log2)
+    log_rule_matcher.refresh()
+    matches = {rule[0] for rule in log_rule_matcher.match("10.0.0.1", log2)}
+    assert matches == {fetch("LogRule", name="down").id}
+
+
+@check_blueprints("", "/logs")
+def test_syslog_ingestion(user_client: FlaskClient) -> None:
+    user_client.post("/update/logrule", data={"name": "up", "content": "to up"})
+    server = SyslogServer("127.0.0.1", 0)
+    server.start(batch_size=10, batch_interval=50)
+    client = socket(AF_INET, SOCK_DGRAM)
+    for _ in range(20):
+        for log in (log1, log2):
+            client.sendto(log.encode(), server.socket.getsockname())
+    for _ in range(50):
+        if len(fetch_all("Log")) == 20:
+            break
+        sleep(0.1)
+    assert len(fetch_all("Log")) == 20
+    assert server.counters["received"] == 40
+    assert server.counters["matched"] == 20
+    assert not server.counters["dropped"]
@@ -1,9 +1,19 @@
+from base64 import b64encode
 from flask.testing import FlaskClient
+from json import dumps, loads
+from sqlalchemy import Integer, PickleType
+from sqlalchemy.sql import column, table
 from typing import List
 from werkzeug.datastructures import ImmutableMultiDict
 
-from eNMS.base.helpers import fetch, fetch_all
+from eNMS import db
+from eNMS.base.helpers import delete, factory, fetch, fetch_all, pool_batch
 from eNMS.base.properties import device_subtypes, link_subtypes
+from eNMS.inventory.helpers import bulk_write
+from eNMS.inventory.models import (
+    ConfigurationContent,
+    migrate_device_configurations,
+)
 
 from tests.test_base import check_blueprints
 
@@ -57,9 +67,11 @@ def test_manual_object_creation(user_client: FlaskClient) -> None:
     assert len(fetch_all("Link")) == 82
 
 
-def create_from_file(client: FlaskClient, file: str) -> None:
+def create_from_file(client: FlaskClient, file: str, bulk: bool = False) -> None:
     with open(client.application.path / "projects" / file, "rb") as f:
         data = {"file": f, "replace": True, "update_pools": True}
+        if bulk:
+            data["bulk"] = True
         client.post("/inventory/import_topology", data=data)
 
 
@@ -70,6 +82,108 @@ def test_object_creation_europe(user_client: FlaskClient) -> None:
     assert len(fetch_all("Link")) == 49
 
 
+@check_blueprints("", "/inventory", "/views")
+def test_bulk_object_creation_europe(user_client: FlaskClient) -> None:
+    create_from_file(user_client, "europe.xls", bulk=True)
+    assert len(fetch_all("Device")) == 33
+    assert len(fetch_all("Link")) == 49
+    assert all(link.source and link.destination for link in fetch_all("Link"))
+
+
+def test_bulk_object_import_errors(user_client: FlaskClient) -> None:
+    factory("Device", name="existing_device")
+    db.session.commit()
+    inserts = [
+        {"type": "Device", "name": "new_device"},
+        {"type": "Device", "name": "existing_device"},
+    ]
+    existing: dict = {}
+    errors = bulk_write("Device", inserts, [], existing)
+    assert len(errors) == 1 and errors[0].startswith("Device existing_device")
+    assert fetch("Device", name="new_device").id == existing["new_device"][0]
+
+
+@check_blueprints("", "/inventory", "/views")
+def test_bulk_object_import_pools(user_client: FlaskClient) -> None:
+    user_client.post("/update/pool", data=pool2)
+    with open(user_client.application.path / "projects" / "europe.xls", "rb") as f:
+        data = {
+            "file": f,
+            "boolean_fields": "update_pools,replace,bulk",
+            "replace": True,
+            "bulk": True,
+        }
+        user_client.post("/inventory/import_topology", data=data)
+    pool = fetch("Pool", name="pool2")
+    assert len(pool.devices) == 12
+    assert len(pool.links) == 4
+
+
+def test_topology_stream_export(user_client: FlaskClient) -> None:
+    create_from_file(user_client, "europe.xls")
+    headers = {"Authorization": f"Basic {b64encode(b'admin:admin').decode()}"}
+    response = user_client.get("/rest/topology/export?format=jsonl", headers=headers)
+    objects = [loads(line) for line in response.data.decode().splitlines()]
+    assert len(objects) == 82
+    links = [obj for obj in objects if obj["type"] == "Link"]
+    assert len(links) == 49 and all(link["source_name"] for link in links)
+    response = user_client.get(
+        "/rest/topology/export?format=csv&type=Device", headers=headers
+    )
+    assert len(response.data.decode().splitlines()) == 34
+
+
+def test_bulk_rest_endpoints(user_client: FlaskClient) -> None:
+    headers = {"Authorization": f"Basic {b64encode(b'admin:admin').decode()}"}
+    devices = [{"name": f"router{i}", "vendor": "Cisco"} for i in range(3)]
+    links = [
+        {"name": "link0", "source_name": "router0", "destination": "router1"},
+        {"name": "link1", "source_name": "router0", "destination_name": "unknown"},
+    ]
+    response = user_client.post("/rest/instances/Device", json=devices, headers=headers)
+    assert [device["status"] for device in loads(response.data)] == ["created"] * 3
+    response = user_client.post(
+        "/rest/instances/Link",
+        data="\n".join(map(dumps, links)),
+        content_type="application/x-ndjson",
+        headers=headers,
+    )
+    assert [link["status"] for link in loads(response.data)] == ["created", "error"]
+    assert fetch("Link", name="link0").destination.name == "router1"
+    factory("Pool", name="juniper", device_vendor="Juniper")
+    devices[0]["vendor"] = "Juniper"
+    response = user_client.post("/rest/instances/Device", json=devices, headers=headers)
+    assert [device["status"] for device in loads(response.data)] == ["updated"] * 3
+    assert fetch("Device", name="router0").vendor == "Juniper"
+    pool = fetch("Pool", name="juniper")
+    assert {device.name for device in pool.devices} == {"router0"}
+    response = user_client.delete(
+        "/rest/instances/Device", json=["router2", "router3"], headers=headers
+    )
+    statuses = [device["status"] for device in loads(response.data)]
+    assert statuses == ["deleted", "not found"] and not fetch("Device", name="router2")
+
+
+def test_topology_view_data(user_client: FlaskClient) -> None:
+    create_from_file(user_client, "europe.xls")
+    response = user_client.get("/views/topology")
+    topology = loads(response.data)
+    assert len(topology["devices"]["id"]) == 33 and not topology["clusters"]["count"]
+    assert len(topology["links"]["source_latitude"]) == 49
+    etag = response.headers["ETag"]
+    response = user_client.get("/views/topology", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    topology = loads(user_client.get("/views/topology?zoom=0").data)
+    assert sum(topology["clusters"]["count"]) + len(topology["devices"]["id"]) == 33
+    topology = loads(user_client.get("/views/topology?bbox=0,0,1,1").data)
+    assert not topology["devices"]["id"] and not topology["links"]["id"]
+    user_client.post("/update/pool", data=pool2)
+    pool = fetch("Pool", name="pool2")
+    topology = loads(user_client.get(f"/views/topology?pool={pool.id}").data)
+    assert set(topology["devices"]["id"]) == {device.id for device in pool.devices}
+    assert set(topology["links"]["id"]) == {link.id for link in pool.links}
+
+
 @check_blueprints("", "/inventory", "/views")
 def test_object_creation_type(user_client: FlaskClient) -> None:
     create_from_file(user_client, "device_counters.xls")
@@ -91,6 +205,57 @@ def test_device_deletion(user_client: FlaskClient) -> None:
     assert len(fetch_all("Link")) == 18
 
 
+def test_configuration_storage(user_client: FlaskClient) -> None:
+    device = factory("Device", name="configuration_device")
+    other_device = factory("Device", name="other_configuration_device")
+    for runtime, text in (("1", "config A"), ("2", "config A"), ("3", "config B")):
+        device.add_configuration(runtime, text, 2)
+    other_device.add_configuration("1", "config B", 2)
+    db.session.commit()
+    assert device.get_configuration_runtimes() == ["3", "1"]
+    assert device.get_configuration() == "config B"
+    assert device.get_configuration("1") == "config A"
+    assert ConfigurationContent.query.count() == 2
+    device.add_configuration("4", "config C", 2)
+    db.session.commit()
+    assert device.get_configuration_runtimes() == ["4", "3"]
+    assert {content.text for content in ConfigurationContent.query} == {
+        "config B",
+        "config C",
+    }
+    delete("Device", id=device.id)
+    assert ConfigurationContent.query.count() == 1
+    assert other_device.get_configuration() == "config B"
+
+
+def test_configuration_migration(user_client: FlaskClient) -> None:
+    device = factory("Device", name="configuration_device")
+    configurations_type = PickleType().compile(dialect=db.engine.dialect)
+    db.session.execute(
+        f'ALTER TABLE "Device" ADD COLUMN configurations {configurations_type}'
+    )
+    device_table = table(
+        "Device", column("id", Integer), column("configurations", PickleType)
+    )
+    configurations = {
+        "2019-01-02 00:00:00": "config B",
+        "2019-01-01 00:00:00": "config A",
+        "2019-01-03 00:00:00": "config A",
+    }
+    db.session.execute(
+        device_table.update()
+        .where(device_table.c.id == device.id)
+        .values(configurations=configurations)
+    )
+    db.session.commit()
+    migrate_device_configurations()
+    assert device.get_configuration_runtimes() == sorted(configurations)[::-1]
+    assert device.get_configuration("2019-01-02 00:00:00") == "config B"
+    assert ConfigurationContent.query.count() == 2
+    migrate_device_configurations()
+    assert device.configurations.count() == 3
+
+
 @check_blueprints("", "/inventory", "/views")
 def test_link_deletion(user_client: FlaskClient) -> None:
     create_from_file(user_client, "europe.xls")
@@ -135,3 +300,27 @@ def test_pool_management(user_client: FlaskClient) -> None:
     user_client.post(f"/delete/pool/{p1.id}")
     user_client.post(f"/delete/pool/{p2.id}")
     assert len(fetch_all("Pool")) == 3
+
+
+@check_blueprints("", "/inventory", "/views")
+def test_pool_incremental_update(user_client: FlaskClient) -> None:
+    create_from_file(user_client, "europe.xls")
+    user_client.post("/update/pool", data=pool1)
+    user_client.post("/update/pool", data=pool2)
+    device = {"name": "incremental", "location": "france"}
+    user_client.post("/update/device", data=device)
+    p1, p2 = fetch("Pool", name="pool1"), fetch("Pool", name="pool2")
+    assert len(p1.devices) == 22
+    assert len(p2.devices) == 13
+    user_client.post("/update/device", data={**device, "location": "spain"})
+    assert len(p1.devices) == 22
+    assert len(p2.devices) == 12
+    user_client.post("/update/device", data={**device, "location": "paris"})
+    assert len(p1.devices) == 21
+    assert len(p2.devices) == 12
+    with pool_batch():
+        factory("Device", name="batch", location="france")
+        assert len(p2.devices) == 12
+    db.session.commit()
+    assert len(p1.devices) == 22
+    assert len(p2.devices) == 13
@@ -1,8 +1,25 @@
+from base64 import b64encode
+from collections import deque
 from flask.testing import FlaskClient
+from pytest import MonkeyPatch, raises
+from sqlalchemy import Integer, PickleType
+from sqlalchemy.sql import column, table
 from tests.test_base import check_blueprints
+from threading import Thread
+from time import sleep
+from typing import Any, Dict, List, Tuple
 from werkzeug.datastructures import ImmutableMultiDict
 
-from eNMS.base.helpers import fetch_all
+from eNMS import db
+from eNMS.automation.helpers import (
+    cluster_shards,
+    ConnectionPool,
+    run_events,
+    run_states,
+)
+from eNMS.automation.models import migrate_job_logs, Workflow, WorkflowPlan
+from eNMS.base.helpers import delete, factory, fetch, fetch_all
+from eNMS.inventory.models import Device
 
 
 netmiko_ping = ImmutableMultiDict(
@@ -40,6 +57,40 @@ file_transfer_service = ImmutableMultiDict(
 )
 
 
+parallel_edges = [
+    ("Start", "branch_a", "success"),
+    ("Start", "branch_b", "success"),
+    ("branch_a", "join", "success"),
+    ("branch_b", "join", "success"),
+    ("branch_a", "join", "prerequisite"),
+    ("branch_b", "join", "prerequisite"),
+    ("join", "End", "success"),
+]
+
+
+def create_workflow(
+    name: str,
+    commands: Dict[str, str],
+    edges: List[Tuple[str, str, str]],
+    **kwargs: Any,
+) -> Workflow:
+    jobs = {job: fetch("Service", name=job) for job in ("Start", "End")}
+    for job_name, command in commands.items():
+        jobs[job_name] = factory("UnixCommandService", name=job_name, command=command)
+    workflow = factory("Workflow", name=name, **kwargs)
+    workflow.jobs.extend(jobs[job_name] for job_name in commands)
+    for source, destination, subtype in edges:
+        factory(
+            "WorkflowEdge",
+            name=f"{name} {source} -> {destination} ({subtype})",
+            workflow=workflow.id,
+            subtype=subtype,
+            source=jobs[source].id,
+            destination=jobs[destination].id,
+        )
+    return workflow
+
+
 @check_blueprints("/automation")
 def test_base_services(user_client: FlaskClient) -> None:
     user_client.post("/update/NetmikoConfigurationService", data=netmiko_ping)
@@ -89,3 +140,340 @@ def test_ansible_services(user_client: FlaskClient) -> None:
     user_client.post("/update/AnsiblePlaybookService", data=ansible_service)
     assert len(fetch_all("AnsiblePlaybookService")) == 1
     assert len(fetch_all("Service")) == 25
+
+
+def test_run_state_store(user_client: FlaskClient) -> None:
+    job = fetch("Service", name="Start")
+    run_states.run_started(job.id)
+    run_states.record(job.id, "jobs", 1, True)
+    live_state = {"status": "Running", "state": {"jobs": {1: True}}}
+    assert job.get_live_state() == live_state
+    assert user_client.post(f"/get/service/{job.id}").json["status"] == "Running"
+    run_states.flush()
+    db.session.refresh(job)
+    assert job.status == "Running" and job.state == {"jobs": {1: True}}
+    run_states.run_done(job.id)
+    run_states.flush()
+    db.session.refresh(job)
+    assert job.status == "Idle" and run_states.get(job.id) is None
+
+
+def test_job_events(user_client: FlaskClient) -> None:
+    job = fetch("Service", name="Start")
+    response = user_client.get(f"/automation/job_events/{job.id}", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = response.iter_encoded()
+    assert next(events).startswith(b"event: state")
+    run_states.run_started(job.id)
+    run_states.record(job.id, "devices", "router1", False)
+    assert next(events) == b'event: status\ndata: {"status": "Running"}\n\n'
+    assert b'"entry": "router1", "value": false' in next(events)
+    run_states.run_done(job.id)
+    run_states.flush()
+    assert next(events).startswith(b"event: status")
+    response.close()
+    assert job.id not in run_events.subscribers
+
+
+def test_job_results(user_client: FlaskClient) -> None:
+    config = user_client.application.config
+    config["JOB_RESULTS_RETENTION"], config["JOB_RESULTS_PAGE_SIZE"] = 3, 2
+    job = fetch("Service", name="Start")
+    runtimes = [job.try_run()[1] for _ in range(4)]
+    assert job.results.count() == 3 and job.get_result(runtimes[0]) is None
+    assert job.get_result(runtimes[3])["success"]
+    page = user_client.post(f"/automation/get_logs/{job.id}").json
+    assert page["runtimes"] == [runtimes[3], runtimes[2]]
+    assert page["result"] == job.get_result(runtimes[3])
+    page = user_client.post(f"/automation/get_logs/{job.id}?page=1").json
+    assert page["runtimes"] == [runtimes[1]]
+    page = user_client.post(f"/automation/get_logs/{job.id}?page=2").json
+    assert page == {"runtimes": [], "result": None}
+
+
+def test_job_logs_migration(user_client: FlaskClient) -> None:
+    job = fetch("Service", name="Start")
+    logs_type = PickleType().compile(dialect=db.engine.dialect)
+    db.session.execute(f'ALTER TABLE "Job" ADD COLUMN logs {logs_type}')
+    job_table = table("Job", column("id", Integer), column("logs", PickleType))
+    logs = {
+        "2019-01-02-00:00:00": {"success": False, "result": "timeout"},
+        "2019-01-01-00:00:00": {"success": True},
+    }
+    db.session.execute(
+        job_table.update().where(job_table.c.id == job.id).values(logs=logs)
+    )
+    db.session.commit()
+    migrate_job_logs()
+    assert job.get_runtimes() == ["2019-01-02-00:00:00", "2019-01-01-00:00:00"]
+    assert job.get_result("2019-01-02-00:00:00") == logs["2019-01-02-00:00:00"]
+    assert job.results.filter_by(success=True).count() == 1
+    migrate_job_logs()
+    assert job.results.count() == 2
+
+
+def test_rest_job_run(user_client: FlaskClient) -> None:
+    headers = {"Authorization": f"Basic {b64encode(b'admin:admin').decode()}"}
+    payload = {"name": "Start", "devices": ["unknown"]}
+    response = user_client.post("/rest/run_job", json=payload, headers=headers)
+    assert "unknown" in response.json
+    results = user_client.post("/rest/run_job", json={"name": "Start"}, headers=headers)
+    assert results.json["success"] and "name" not in results.json
+    start = fetch("Job", name="Start")
+    assert fetch("JobRun", job_id=start.id).status == "Completed"
+    payload = {"name": "Start", "async": True}
+    run = user_client.post("/rest/run_job", json=payload, headers=headers).json
+    assert run["job_name"] == "Start" and run["status"] in ("Pending", "Running")
+    for _ in range(20):
+        status = user_client.get(f"/rest/run/{run['name']}", headers=headers).json
+        if status["status"] == "Completed":
+            break
+        sleep(0.5)
+    assert status["status"] == "Completed" and status["success"]
+    progress = user_client.get(f"/rest/run/{run['name']}/progress", headers=headers)
+    assert progress.json["status"] == "Completed"
+    result = user_client.get(f"/rest/run/{run['name']}/result", headers=headers)
+    assert result.json["success"]
+    assert user_client.get("/rest/run/unknown", headers=headers).status_code == 404
+
+
+def test_cluster_shards(user_client: FlaskClient) -> None:
+    instances = [
+        factory("Instance", name="instance1", weight=2, cpu_load=0),
+        factory("Instance", name="instance2", weight=2, cpu_load=50),
+        factory("Instance", name="instance3", weight=1, cpu_load=0),
+    ]
+    devices = {factory("Device", name=f"shard_device{i}") for i in range(10)}
+    shards = cluster_shards(devices, instances)
+    assert [len(shard) for _, shard in shards] == [5, 3, 2]
+    assert set().union(*(shard for _, shard in shards)) == devices
+    for instance in instances:
+        instance.weight = 0
+    with raises(ValueError):
+        cluster_shards(devices, instances)
+
+
+class RemoteResponse:
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+    def json(self) -> Any:
+        return self.data
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def test_cluster_run(user_client: FlaskClient, monkeypatch: MonkeyPatch) -> None:
+    instances = [
+        factory("Instance", name=f"remote{i}", ip_address=f"10.0.0.{i}", cpu_load=0)
+        for i in (1, 2)
+    ]
+    devices = {factory("Device", name=f"remote_device{i}") for i in range(4)}
+    runs: dict = {}
+
+    def remote_post(url: str, **kwargs: Any) -> RemoteResponse:
+        # a synchronous run responds with the results, which have no run ID
+        assert kwargs["json"]["async"]
+        run_id = f"run{len(runs)}"
+        # the run of the second instance fails
+        status = "Failed" if "10.0.0.2" in url else "Completed"
+        runs[run_id] = (kwargs["json"]["devices"], deque(["Running", status]))
+        return RemoteResponse({"name": run_id, "status": "Pending"})
+
+    def remote_get(url: str, **kwargs: Any) -> RemoteResponse:
+        run_id = url.split("/run/")[1].split("/")[0]
+        device_names, statuses = runs[run_id]
+        if url.endswith("/result"):
+            shard = {name: {"success": True} for name in device_names}
+            return RemoteResponse({"success": True, "result": {"devices": shard}})
+        return RemoteResponse({"status": statuses.popleft()})
+
+    monkeypatch.setattr("eNMS.automation.helpers.rest_post", remote_post)
+    monkeypatch.setattr("eNMS.automation.helpers.rest_get", remote_get)
+    monkeypatch.setattr("eNMS.automation.helpers.sleep", lambda seconds: None)
+    monkeypatch.setattr("eNMS.automation.models.cluster_instances", lambda: instances)
+    results, _ = fetch("Service", name="Start").cluster_run(devices)
+    assert not results["success"]
+    assert results["instances"] == {
+        "remote1": {"devices": 2, "success": True},
+        "remote2": {"devices": 2, "success": False},
+    }
+    device_results = results["result"]["devices"]
+    assert set(device_results) == {device.name for device in devices}
+    assert sum(result["success"] for result in device_results.values()) == 2
+    assert all(
+        result["success"] or "remote2 failed (Run run" in result["result"]
+        for result in device_results.values()
+    )
+
+
+def test_execution_engines(user_client: FlaskClient) -> None:
+    devices = [factory("Device", name=f"engine_device{i}") for i in range(5)]
+    service = fetch("Service", name="Start")
+    service.devices, service.multiprocessing = devices, True
+
+    def job(payload: dict, device: Device) -> dict:
+        if device.name == "engine_device0":
+            raise ValueError("unreachable")
+        return {"success": True, "result": device.name}
+
+    async def async_job(payload: dict, device: Device) -> dict:
+        return job(payload, device)
+
+    engine_results = []
+    for engine, function in (
+        ("threadpool", job),
+        ("asyncio", job),
+        ("asyncio", async_job),
+    ):
+        service.execution_engine, service.job = engine, function
+        engine_results.append(service.run({}))
+    results, remaining_targets = engine_results[0]
+    assert not results["success"] and remaining_targets == {devices[0]}
+    assert results["result"]["devices"]["engine_device0"] == {
+        "success": False,
+        "result": "unreachable",
+    }
+    assert all(result == engine_results[0] for result in engine_results)
+    service.execution_engine = "pipeline"
+    results, _ = service.run({})
+    assert results == {
+        "success": False,
+        "result": "Unknown execution engine: pipeline",
+    }
+
+
+def test_parallel_workflow(user_client: FlaskClient) -> None:
+    commands = {"branch_a": "echo a", "branch_b": "echo b", "join": "echo join"}
+    workflow = create_workflow("parallel_workflow", commands, parallel_edges)
+    plan, jobs = workflow.plan, workflow.job_map()
+    pending, visited, order = [plan.start], set(), []
+    while True:
+        job_id = workflow.next_job(plan, pending, visited)
+        if job_id is None:
+            break
+        order.append(jobs[job_id].name)
+        pending.extend(plan.successors(job_id, "success"))
+    # the join waits for both branches, whatever the order of the pending jobs
+    assert order == ["Start", "branch_b", "branch_a", "join", "End"]
+    sequential_results, _ = workflow.try_run()
+    workflow.max_parallel_jobs = 2
+    db.session.commit()
+    parallel_results, _ = workflow.try_run()
+    assert parallel_results["success"]
+    assert parallel_results["branch_a"]["result"] == "a\n"
+    assert parallel_results["branch_b"]["result"] == "b\n"
+    assert parallel_results["join"]["success"]
+    assert parallel_results == sequential_results
+    assert workflow.results.count() == 2
+
+
+def test_workflow_plan_cache(user_client: FlaskClient) -> None:
+    commands = {"plan_a": "echo a", "plan_b": "echo b"}
+    edges = [("Start", "plan_a", "success"), ("plan_a", "End", "success")]
+    workflow = create_workflow("plan_workflow", commands, edges)
+    job_a, job_b = fetch("Job", name="plan_a"), fetch("Job", name="plan_b")
+    plan = workflow.plan
+    assert workflow.plan is plan
+    assert plan.successors(job_a.id, "success") == [plan.end]
+    assert job_b.id not in plan.reachable and plan.end_reachable
+    edge = factory(
+        "WorkflowEdge",
+        name="plan_a -> plan_b",
+        workflow=workflow.id,
+        subtype="success",
+        source=job_a.id,
+        destination=job_b.id,
+    )
+    new_plan = workflow.plan
+    assert new_plan is not plan and workflow.plan is new_plan
+    assert new_plan.successors(job_a.id, "success") == [plan.end, job_b.id]
+    assert job_b.id in new_plan.reachable
+    assert new_plan.edges == WorkflowPlan(workflow).edges
+    delete("WorkflowEdge", id=edge.id)
+    # the next request loads the workflow from the database
+    db.session.expire_all()
+    assert workflow.plan.edges == plan.edges
+    workflow.jobs.remove(job_b)
+    db.session.commit()
+    assert job_b.id not in workflow.plan.jobs
+    assert workflow.plan.jobs == WorkflowPlan(workflow).jobs
+
+
+def test_pipeline_workflow(user_client: FlaskClient) -> None:
+    devices = [factory("Device", name=f"pipeline_device{i}") for i in range(3)]
+    commands = {
+        "pipeline_check": "test {{device.name}} != pipeline_device0",
+        "pipeline_echo": "echo {{device.name}}",
+    }
+    edges = [
+        ("Start", "pipeline_check", "success"),
+        ("pipeline_check", "pipeline_echo", "success"),
+        ("pipeline_echo", "End", "success"),
+    ]
+    workflow = create_workflow(
+        "pipeline_workflow",
+        commands,
+        edges,
+        multiprocessing=True,
+        execution_engine="pipeline",
+    )
+    workflow.devices = devices
+    db.session.commit()
+    results, _ = workflow.try_run()
+    assert not results["success"]
+    device_results = results["result"]["devices"]
+    assert set(device_results) == {device.name for device in devices}
+    for name in ("pipeline_device1", "pipeline_device2"):
+        assert device_results[name]["success"]
+        assert list(device_results[name]) == [
+            "success",
+            "Start",
+            "pipeline_check",
+            "pipeline_echo",
+            "End",
+        ]
+        echo = device_results[name]["pipeline_echo"]["result"]["devices"][name]
+        assert echo["result"] == f"{name}\n"
+    failed_device = device_results["pipeline_device0"]
+    assert not failed_device["success"]
+    assert list(failed_device) == ["success", "Start", "pipeline_check"]
+    assert not failed_device["pipeline_check"]["success"]
+
+
+def test_connection_pool() -> None:
+    pool = ConnectionPool(idle_timeout=0.2, max_per_device=2)
+    opened: list = []
+    closed: list = []
+
+    def create() -> dict:
+        opened.append({"alive": True})
+        return opened[-1]
+
+    key = (1, "netmiko", "cisco_ios", "admin", "digest")
+    callbacks = (create, lambda connection: connection["alive"], closed.append)
+    with pool.connection(key, *callbacks) as first:
+        pass
+    with pool.connection(key, *callbacks) as connection:
+        assert connection is first and len(opened) == 1
+    first["alive"] = False
+    with pool.connection(key, *callbacks) as connection:
+        assert connection is not first and closed == [first]
+    connections = [pool.acquire(key, *callbacks) for _ in range(2)]
+    assert pool.opened[1] == 2
+    waiter: list = []
+    thread = Thread(target=lambda: waiter.append(pool.acquire(key, *callbacks)))
+    thread.start()
+    sleep(0.1)
+    assert not waiter and len(opened) == 3
+    pool.release(key, connections[0], closed.append)
+    thread.join(1)
+    assert waiter == connections[:1]
+    for connection in connections:
+        pool.release(key, connection, closed.append)
+    sleep(0.3)
+    with pool.condition:
+        expired = pool.evict_expired()
+    pool.close_all(expired)
+    assert len(closed) == 3 and not pool.idle and not pool.opened
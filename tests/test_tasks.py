@@ -1,7 +1,16 @@
 from flask.testing import FlaskClient
+from time import time
 from werkzeug.datastructures import ImmutableMultiDict
 
-from eNMS.base.helpers import fetch_all
+from eNMS import db
+from eNMS.base.helpers import factory, fetch_all, serialize
+from eNMS.main import scheduler
+from eNMS.scheduling.models import (
+    next_run_times,
+    scheduler_election,
+    SchedulerLease,
+    Task,
+)
 
 from tests.test_base import check_blueprints
 from tests.test_objects import create_from_file
@@ -40,3 +49,38 @@ google_earth_dict = ImmutableMultiDict(
         ("netmiko_service", ""),
     ]
 )
+
+
+def test_scheduler_election(user_client: FlaskClient) -> None:
+    scheduler_election.elect()
+    lease = SchedulerLease.query.filter_by(name=scheduler_election.name).one()
+    assert scheduler_election.is_leader and lease.holder == scheduler_election.holder
+    lease.holder, lease.expiration = "other process", time() + 60
+    db.session.commit()
+    scheduler_election.elect()
+    assert not scheduler_election.is_leader
+    lease.expiration = time() - 1
+    db.session.commit()
+    scheduler_election.elect()
+    db.session.refresh(lease)
+    assert scheduler_election.is_leader and lease.holder == scheduler_election.holder
+
+
+def test_next_run_times(user_client: FlaskClient) -> None:
+    task = factory(
+        "Task",
+        name="future_task",
+        job=2,
+        start_date="01/01/2100 00:00:00",
+        frequency=3600,
+        is_active=True,
+    )
+    tasks = fetch_all("Task")
+    Task.prefetch(tasks)
+    assert set(next_run_times()) == {task.aps_job_id for task in tasks}
+    next_run_time = scheduler.get_job(task.aps_job_id).next_run_time
+    assert task.next_run_time == next_run_time.strftime("%Y-%m-%d %H:%M:%S")
+    serialized_task = next(t for t in serialize("Task") if t["name"] == "future_task")
+    assert serialized_task["next_run_time"] == task.next_run_time
+    task.pause()
+    assert task.next_run_time is None